@@ -1,14 +1,13 @@
 import logging
 
 import matplotlib.pyplot as plt
-import numpy as np
-from scipy.stats import uniform
 
 import backtester
 import data_loader
 import data_sources
 import init_logger
-from price_data import PriceData
+import parameter_sweep
+from price_panel import PricePanel
 import utils
 
 
@@ -28,9 +27,9 @@ def run():
 def _get_price_data(symbols, start_date=None, end_date=None):
     symbol_data = data_loader.load_price_data(data_sources.DATA_DIR, symbols)
 
-    price_data = PriceData(symbol_data)
-    return price_data.get_price_data_np(symbols, 'Adj Close', start_date,
-                                        end_date)
+    price_panel = PricePanel.from_price_data(symbol_data, symbols)
+    return price_panel.get_price_data_np(symbols, 'Adj Close', start_date,
+                                         end_date)
 
 
 def perform_backtests(symbols, close_price_data):
@@ -57,50 +56,41 @@ def run_backtest(np_close):
     return sharpe_ratio
 
 
-def perform_monte_carlo_simulation(symbols, close_price_data):
-
-    for symbol in symbols:
-        np_close = close_price_data[symbol]
-        run_monte_carlo_simulation(np_close)
+def perform_monte_carlo_simulation(symbols, close_price_data,
+                                   simulation_count=1000, workers=1):
 
+    parameters = parameter_sweep.sample_parameters(simulation_count)
+    results = parameter_sweep.run_sweep(
+        dict((symbol, close_price_data[symbol]) for symbol in symbols),
+        parameters, workers=workers)
 
-def run_monte_carlo_simulation(np_close, simulation_count=1000):
-
-    lookback_dist = uniform(2, 90)
-    entry_z_score_dist = uniform(0, 5)
-    exit_z_score_dist = uniform(-5, 5)
+    for symbol in symbols:
+        report_monte_carlo_results(results[symbol])
 
-    results = np.zeros((simulation_count, 4))
+    return results
 
-    for i in range(0, simulation_count):
-        lookback = lookback_dist.rvs()
-        entry_z_score = entry_z_score_dist.rvs()
-        exit_z_score = exit_z_score_dist.rvs()
 
-        try:
-            backtest = backtester.MovingAverageBacktest(
-                lookback=lookback,
-                entry_z_score=entry_z_score,
-                exit_z_score=exit_z_score)
-        except backtester.ParameterException as e:
-            logging.debug(e)
-            continue
+def run_monte_carlo_simulation(np_close, simulation_count=1000, workers=1):
 
-        sharpe_ratio = backtest.run(np_close)
+    parameters = parameter_sweep.sample_parameters(simulation_count)
+    results = parameter_sweep.run_sweep({'': np_close}, parameters,
+                                        workers=workers)['']
+    report_monte_carlo_results(results)
+    return results
 
-        results[i] = [sharpe_ratio, lookback, entry_z_score, exit_z_score]
 
+def report_monte_carlo_results(results):
+    """
+    :param results: (n x 4) array of Sharpe ratio, lookback, entry z score
+    & exit z score, with NaN Sharpe ratios for skipped parameter sets
+    """
     optimal = utils.get_max_vector(results)
 
-    plot_3d_params(
-        ['Sharpe Ratio', 'Lookback', 'Entry Z Score', 'Exit Z Score'],
-        results)
+    plot_3d_params(parameter_sweep.RESULT_COLUMNS, results)
 
     logging.info("Optimial result - Sharpe Ratio={} [lookback={}, "
                   "entry_z_score={}, exit_z_score={}]".format(*optimal))
 
-    return results
-
 
 def plot_3d_params(params, results):
     fig = plt.figure(figsize=(14,6))
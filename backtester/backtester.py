@@ -1,16 +1,20 @@
 from abc import abstractmethod
+import bisect
 import logging
 import math
 
 import matplotlib.pyplot as plt
 import numpy as np
-import talib
 from talib import MA_Type
 
+import indicator_cache
 import utils
 
 
 
+# Pairs of z scores evaluated together by evaluate_grid
+GRID_CHUNK_SIZE = 1000
+
 # We want to enable printing of full numpy arrays
 np.set_printoptions(threshold=np.nan)
 
@@ -24,8 +28,9 @@ class Side(object):
     NONE = 0
 
 
-def _calculate_sharpe_ratio(returns, duration=252):
-    return math.sqrt(duration) * np.mean(returns) / np.std(returns)
+def _calculate_sharpe_ratio(returns, duration=252, axis=None):
+    return math.sqrt(duration) * np.mean(returns, axis=axis) / \
+        np.std(returns, axis=axis)
 
 
 def _plot_series(close, upper, middle, lower, signals):
@@ -52,15 +57,60 @@ def _plot_series(close, upper, middle, lower, signals):
 
 
 def _print_results(np_close, positions, sharpe_ratio):
+    # Formatting the matrix is expensive, so skip it unless it will be logged
+    if not logging.getLogger().isEnabledFor(logging.DEBUG):
+        return
     logging.debug('Positions account: [Close, PnL]\n{}'
                  .format(np.matrix([np_close, positions]).T))
     logging.debug("Annualised Sharpe Ratio: {}".format(sharpe_ratio))
 
 
+def _upward_break_matrix(close, bands):
+    """
+    :param close: (time x 1) prices
+    :param bands: (time x n) bands
+    :return: (time x n) boolean array, true where close breaks upwards
+    through a band
+    """
+    breaks = np.zeros(bands.shape, dtype=bool)
+    breaks[1:] = (close[:-1] <= bands[:-1]) & (close[1:] > bands[1:])
+    return breaks
+
+
+def _downward_break_matrix(close, bands):
+    breaks = np.zeros(bands.shape, dtype=bool)
+    breaks[1:] = (close[:-1] >= bands[:-1]) & (close[1:] < bands[1:])
+    return breaks
+
+
+def _ffill(values):
+    """
+    Forward fill NaN along the first axis, as utils.ffill for each column
+    """
+    rows = np.arange(len(values))[:, np.newaxis]
+    last_valid = np.where(np.isnan(values), 0, rows)
+    np.maximum.accumulate(last_valid, axis=0, out=last_valid)
+    return values[last_valid, np.arange(values.shape[1])]
+
+
+def _next_event(events, start):
+    """
+    First of the sorted event indices at or after start
+    """
+    # bisect on a list is much cheaper than np.searchsorted for one value
+    return events[bisect.bisect_left(events, start)]
+
+
 class SharpeBacktest(object):
 
-    def __init__(self):
-        pass
+    def __init__(self, cache=None):
+        """
+        :param cache: IndicatorCache for moving averages, by default one
+        shared by all backtests
+        """
+        if cache is None:
+            cache = indicator_cache.DEFAULT_CACHE
+        self.cache = cache
 
     def run(self, np_close):
         self._validate_params()
@@ -71,6 +121,99 @@ class SharpeBacktest(object):
         _print_results(np_close, positions, sharpe_ratio)
         return sharpe_ratio
 
+    def evaluate_grid(self, np_close, lookback, entry_z_scores,
+                      exit_z_scores, start=0, end=None,
+                      chunk_size=GRID_CHUNK_SIZE):
+        """
+        Sharpe ratios of the strategy for every pair of entry & exit z score
+        at a single lookback. The moving average and std are calculated
+        once, and the signals for chunks of z score pairs are then found
+        together as (time x pairs) arrays, instead of running a backtest
+        for each pair.
+
+        :param start, end: limit trading to np_close[start:end], see
+        calculate_returns
+        :return: (entry_z_scores x exit_z_scores) array, matching run for
+        each pair and NaN where the pair is invalid
+        """
+        entry, exit = np.meshgrid(np.asarray(entry_z_scores, dtype=float),
+                                  np.asarray(exit_z_scores, dtype=float),
+                                  indexing='ij')
+        sharpe_ratios = np.zeros(entry.shape) + np.NAN
+        valid = np.flatnonzero(self._z_scores_valid(entry, exit))
+
+        for i in range(0, len(valid), chunk_size):
+            pairs = valid[i:i + chunk_size]
+            returns = self.calculate_returns(np_close, lookback,
+                                             entry.flat[pairs],
+                                             exit.flat[pairs], start, end)
+            sharpe_ratios.flat[pairs] = _calculate_sharpe_ratio(returns,
+                                                                axis=1)
+
+        return sharpe_ratios
+
+    def evaluate_parameters(self, np_close, parameters):
+        """
+        Sharpe ratios for arbitrary parameter sets, evaluated together for
+        each distinct lookback
+
+        :param parameters: (n x 3) array of lookback, entry_z_score &
+        exit_z_score
+        :return: (n,) Sharpe ratios, NaN where the z scores are invalid
+        """
+        parameters = np.asarray(parameters, dtype=np.float64)
+        sharpe_ratios = np.zeros(len(parameters)) + np.NAN
+        valid = self._z_scores_valid(parameters[:, 1], parameters[:, 2])
+
+        for lookback in np.unique(parameters[valid, 0]):
+            rows = np.flatnonzero(valid & (parameters[:, 0] == lookback))
+            returns = self.calculate_returns(np_close, int(lookback),
+                                             parameters[rows, 1],
+                                             parameters[rows, 2])
+            sharpe_ratios[rows] = _calculate_sharpe_ratio(returns, axis=1)
+
+        return sharpe_ratios
+
+    def calculate_returns(self, np_close, lookback, entry_z_scores,
+                          exit_z_scores, start=0, end=None):
+        """
+        Returns of the strategy for each pair of entry_z_scores[i] and
+        exit_z_scores[i], trading only over np_close[start:end]. The moving
+        average and std are taken over the whole of np_close, so a window
+        has no warm up period and shares the cached indicators with other
+        windows of the same prices.
+
+        :return: (pairs x time) returns
+        """
+        close = np.asarray(np_close, dtype=np.float64)
+        middle, moving_std = self.cache.get_moving_std(close, lookback,
+                                                       matype=MA_Type.SMA)
+        window = slice(start, end)
+        signals = self._grid_signals(close[window], middle[window],
+                                     moving_std[window],
+                                     np.asarray(entry_z_scores, dtype=float),
+                                     np.asarray(exit_z_scores, dtype=float))
+        positions = self._calculate_positions(close[window, np.newaxis],
+                                              signals)
+        # One contiguous row per pair, so each row reduces as in run
+        return utils.calculate_returns(np.ascontiguousarray(positions.T),
+                                       axis=1)
+
+    @staticmethod
+    def _z_scores_valid(entry_z_score, exit_z_score):
+        return np.ones(np.broadcast(entry_z_score, exit_z_score).shape,
+                       dtype=bool)
+
+    @abstractmethod
+    def _grid_signals(self, close, middle, moving_std, entry_z_scores,
+                      exit_z_scores):
+        """
+        :param close: (time,) prices
+        :param entry_z_scores: (pairs,) array
+        :return: (time x pairs) signals, one column for each z score pair
+        """
+        pass
+
     @abstractmethod
     def _validate_params(self):
         pass
@@ -94,8 +237,8 @@ class ParameterException(Exception):
 class MovingAverageBacktest(SharpeBacktest):
 
     def __init__(self, lookback=20, entry_z_score=2,
-                 exit_z_score=0):
-        super(MovingAverageBacktest, self).__init__()
+                 exit_z_score=0, cache=None):
+        super(MovingAverageBacktest, self).__init__(cache)
 
         self.lookback = lookback
         self.entry_z_score = entry_z_score
@@ -114,20 +257,13 @@ class MovingAverageBacktest(SharpeBacktest):
         3. We don't support multiple moving averages for crossovers
         """
 
-        signals = np.zeros(close.shape, dtype=np.int)
-        positions = np.empty(close.shape, dtype=np.float)
-        positions[:] = np.nan
+        middle, moving_std = self.cache.get_moving_std(
+            close, self.lookback, matype=MA_Type.SMA)
+        upper = middle + self.entry_z_score * moving_std
+        lower = middle - self.entry_z_score * moving_std
 
-        upper, middle, lower = talib.BBANDS(close,
-                                            timeperiod=self.lookback,
-                                            nbdevup=self.entry_z_score,
-                                            nbdevdn=self.entry_z_score,
-                                            matype=MA_Type.SMA)
-
-        z_score_upper = middle + self.exit_z_score * \
-                                  ((upper - middle) / self.entry_z_score)
-        z_score_lower = middle + -self.exit_z_score * \
-                                 ((middle - lower) / self.entry_z_score)
+        z_score_upper = middle + self.exit_z_score * moving_std
+        z_score_lower = middle + -self.exit_z_score * moving_std
 
         """
         Upper and lower bands are price targets
@@ -140,24 +276,42 @@ class MovingAverageBacktest(SharpeBacktest):
         Price touches the upper band => Sell
         Buy when we touch the middle band
         """
+        signals, positions = self._scan_signals(close, upper, lower,
+                                                z_score_upper, z_score_lower)
+
+        _plot_series(close, upper, middle, lower, positions)
+        return signals
+
+    @staticmethod
+    def _iterate_signals(close, upper, lower, z_score_upper, z_score_lower):
+        """
+        Reference implementation of _scan_signals, stepping through each bar
+
+        :return: signals & positions
+        """
+        signals = np.zeros(close.shape, dtype=np.int)
+        positions = np.empty(close.shape, dtype=np.float)
+        positions[:] = np.nan
+
         up_trend = False
         down_trend = False
 
         for i in range(1, len(close)):
 
             if not(up_trend or down_trend):
-                if self._break_upwards(close, upper, i):
+                if MovingAverageBacktest._break_upwards(close, upper, i):
                     signals[i] = Side.SELL
                     positions[i] = Side.SELL
                     down_trend = True
 
-                elif self._break_downwards(close, lower, i):
+                elif MovingAverageBacktest._break_downwards(close, lower, i):
                     signals[i] = Side.BUY
                     positions[i] = Side.BUY
                     up_trend = True
 
             elif down_trend:
-                if self._break_downwards(close, z_score_upper, i):
+                if MovingAverageBacktest._break_downwards(
+                        close, z_score_upper, i):
                     signals[i] = Side.BUY
                     positions[i] = Side.NONE
                     down_trend = False
@@ -165,14 +319,98 @@ class MovingAverageBacktest(SharpeBacktest):
                     positions[i] = Side.SELL
 
             elif up_trend:
-                if self._break_upwards(close, z_score_lower, i):
+                if MovingAverageBacktest._break_upwards(
+                        close, z_score_lower, i):
                     signals[i] = Side.SELL
                     positions[i] = Side.NONE
                     up_trend = False
                 else:
                     positions[i] = Side.BUY
 
-        _plot_series(close, upper, middle, lower, positions)
+        return signals, positions
+
+    @staticmethod
+    def _scan_signals(close, upper, lower, z_score_upper, z_score_lower):
+        """
+        Band crossings are found with array operations for the whole series,
+        and the state machine then jumps from each entry to the next
+        matching exit, so only the crossings are visited rather than every
+        bar.
+
+        :return: signals & positions
+        """
+        signals = np.zeros(close.shape, dtype=np.int)
+        positions = np.empty(close.shape, dtype=np.float)
+        positions[:] = np.nan
+
+        size = len(close)
+        short_entries = MovingAverageBacktest._upward_breaks(close, upper)
+        long_entries = MovingAverageBacktest._downward_breaks(close, lower)
+        short_exits = MovingAverageBacktest._downward_breaks(close,
+                                                             z_score_upper)
+        long_exits = MovingAverageBacktest._upward_breaks(close,
+                                                          z_score_lower)
+
+        start = 1
+        while start < size:
+            short_entry = _next_event(short_entries, start)
+            long_entry = _next_event(long_entries, start)
+            # Breaking the upper band takes precedence, as in the iteration
+            if short_entry <= long_entry:
+                side, entry, exits = Side.SELL, short_entry, short_exits
+            else:
+                side, entry, exits = Side.BUY, long_entry, long_exits
+            if entry >= size:
+                break
+
+            exit = _next_event(exits, entry + 1)
+            signals[entry] = side
+            positions[entry:exit] = side
+            if exit >= size:
+                break
+
+            signals[exit] = -side
+            positions[exit] = Side.NONE
+            start = exit + 1
+
+        return signals, positions
+
+    @staticmethod
+    def _grid_signals(close, middle, moving_std, entry_z_scores,
+                      exit_z_scores):
+        """
+        _scan_signals for many z score pairs, where the state of every pair
+        is advanced together at each bar on which any band is crossed
+        """
+        middle = middle[:, np.newaxis]
+        moving_std = moving_std[:, np.newaxis]
+        upper = middle + entry_z_scores * moving_std
+        lower = middle - entry_z_scores * moving_std
+        z_score_upper = middle + exit_z_scores * moving_std
+        z_score_lower = middle + -exit_z_scores * moving_std
+
+        column = close[:, np.newaxis]
+        short_entries = _upward_break_matrix(column, upper)
+        long_entries = _downward_break_matrix(column, lower)
+        short_exits = _downward_break_matrix(column, z_score_upper)
+        long_exits = _upward_break_matrix(column, z_score_lower)
+
+        signals = np.zeros(upper.shape, dtype=np.int)
+        state = np.zeros(upper.shape[1], dtype=np.int)
+        crossings = short_entries | long_entries | short_exits | long_exits
+        for i in np.flatnonzero(crossings.any(axis=1)):
+            flat = state == Side.NONE
+            sell = flat & short_entries[i]
+            buy = flat & ~sell & long_entries[i]
+            cover = (state == Side.SELL) & short_exits[i]
+            liquidate = (state == Side.BUY) & long_exits[i]
+
+            signals[i] = Side.SELL * (sell | liquidate) + \
+                Side.BUY * (buy | cover)
+            state[sell] = Side.SELL
+            state[buy] = Side.BUY
+            state[cover | liquidate] = Side.NONE
+
         return signals
 
     @staticmethod
@@ -187,9 +425,27 @@ class MovingAverageBacktest(SharpeBacktest):
     def _break_downwards(close, band, index):
         return close[index-1] >= band[index-1] and close[index] < band[index]
 
+    @staticmethod
+    def _upward_breaks(close, band):
+        """
+        :return: sorted list of indices at which close breaks upwards through
+        band, ending with len(close) as a sentinel
+        """
+        breaks = (close[:-1] <= band[:-1]) & (close[1:] > band[1:])
+        return (np.flatnonzero(breaks) + 1).tolist() + [len(close)]
+
+    @staticmethod
+    def _downward_breaks(close, band):
+        """
+        :return: sorted list of indices at which close breaks downwards
+        through band, ending with len(close) as a sentinel
+        """
+        breaks = (close[:-1] >= band[:-1]) & (close[1:] < band[1:])
+        return (np.flatnonzero(breaks) + 1).tolist() + [len(close)]
+
     @staticmethod
     def _calculate_positions(close, signals):
-        return np.cumsum(close * signals)
+        return np.cumsum(close * signals, axis=0)
 
 
 class ChanBacktest(SharpeBacktest):
@@ -200,13 +456,11 @@ class ChanBacktest(SharpeBacktest):
     def _run_strategy(self, close, lookback=20,
                                              entry_z_score=2, exit_z_score=0):
 
-        upper, middle, lower = talib.BBANDS(close,
-                                            timeperiod=lookback,
-                                            nbdevup=entry_z_score,
-                                            nbdevdn=entry_z_score,
-                                            matype=MA_Type.SMA)
+        middle, moving_std = self.cache.get_moving_std(
+            close, lookback, matype=MA_Type.SMA)
+        upper = middle + entry_z_score * moving_std
+        lower = middle - entry_z_score * moving_std
 
-        moving_std = (upper - middle) / entry_z_score
         z_score = (close - middle) / moving_std
 
         long_entry = z_score < -entry_z_score
@@ -234,6 +488,26 @@ class ChanBacktest(SharpeBacktest):
         _plot_series(close, upper, middle, lower, positions)
         return positions
 
+    @staticmethod
+    def _grid_signals(close, middle, moving_std, entry_z_scores,
+                      exit_z_scores):
+        z_score = ((close - middle) / moving_std)[:, np.newaxis]
+        shape = (len(close), len(entry_z_scores))
+
+        long_signals = np.empty(shape, dtype=np.float)
+        long_signals[:] = np.nan
+        long_signals[0] = 0.
+        short_signals = np.empty(shape, dtype=np.float)
+        short_signals[:] = np.nan
+        short_signals[0] = 0.
+
+        long_signals[z_score < -entry_z_scores] = Side.BUY
+        long_signals[z_score >= -exit_z_scores] = Side.NONE
+        short_signals[z_score > entry_z_scores] = Side.SELL
+        short_signals[z_score <= exit_z_scores] = Side.NONE
+
+        return _ffill(long_signals) + _ffill(short_signals)
+
     def _validate_params(self):
         pass
 
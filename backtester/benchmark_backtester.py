@@ -0,0 +1,101 @@
+import logging
+import time
+
+import numpy as np
+import talib
+from talib import MA_Type
+
+import backtester
+from backtester import MovingAverageBacktest
+import init_logger
+
+
+SYMBOLS = 600
+PARAMETER_SETS = 1000
+DAYS = 252
+# Backtests are timed on a sample of symbols & parameter sets and scaled up
+SAMPLE_SYMBOLS = 20
+SAMPLE_PARAMETER_SETS = 50
+# Grid of 40 entry x 25 exit z scores, i.e. 1000 parameter sets per lookback
+GRID_LOOKBACK = 20
+ENTRY_Z_SCORES = np.linspace(0.1, 4., 40)
+EXIT_Z_SCORES = np.linspace(-3., 0., 25)
+
+
+def main():
+    backtester._PLOT_SERIES = False
+    random = np.random.RandomState(1)
+    prices = 50. + np.cumsum(random.normal(0, 1, (SAMPLE_SYMBOLS, DAYS)),
+                             axis=1)
+    parameters = np.column_stack((
+        random.randint(2, 92, SAMPLE_PARAMETER_SETS),
+        random.uniform(0.5, 5., SAMPLE_PARAMETER_SETS),
+        random.uniform(-5., 0., SAMPLE_PARAMETER_SETS)))
+
+    bands = [_calculate_bands(close, *params)
+             for close in prices for params in parameters]
+    backtests = len(bands)
+    scale = SYMBOLS * PARAMETER_SETS / float(backtests)
+
+    iterative = _time_signals(MovingAverageBacktest._iterate_signals, bands)
+    scanned = _time_signals(MovingAverageBacktest._scan_signals, bands)
+
+    start = time.time()
+    for close in prices:
+        for lookback, entry_z_score, exit_z_score in parameters:
+            MovingAverageBacktest(int(lookback), entry_z_score,
+                                  exit_z_score)._run_strategy(close)
+    strategy = time.time() - start
+
+    logging.info('{} symbols x {} parameter sets, estimated from {} '
+                 'backtests'.format(SYMBOLS, PARAMETER_SETS, backtests))
+    logging.info('Iterative signals:\t{:.1f}s'.format(iterative * scale))
+    logging.info('Scanned signals:\t{:.1f}s'.format(scanned * scale))
+    logging.info('Speed-up:\t\t\t{:.1f}x'.format(iterative / scanned))
+    logging.info('Strategy with bands:\t{:.1f}s'.format(strategy * scale))
+
+    _benchmark_grid(prices)
+
+
+def _benchmark_grid(prices):
+    close = prices[0]
+    pairs = len(ENTRY_Z_SCORES) * len(EXIT_Z_SCORES)
+
+    start = time.time()
+    for entry_z_score in ENTRY_Z_SCORES[:4]:
+        for exit_z_score in EXIT_Z_SCORES:
+            MovingAverageBacktest(GRID_LOOKBACK, entry_z_score,
+                                  exit_z_score).run(close)
+    runs = (time.time() - start) * len(ENTRY_Z_SCORES) / 4.
+
+    start = time.time()
+    MovingAverageBacktest().evaluate_grid(close, GRID_LOOKBACK,
+                                          ENTRY_Z_SCORES, EXIT_Z_SCORES)
+    grid = time.time() - start
+
+    logging.info('{} parameter sets for one symbol & lookback'.format(pairs))
+    logging.info('Separate runs:\t\t{:.3f}s'.format(runs))
+    logging.info('Grid:\t\t\t\t{:.3f}s'.format(grid))
+    logging.info('Speed-up:\t\t\t{:.1f}x'.format(runs / grid))
+
+
+def _calculate_bands(close, lookback, entry_z_score, exit_z_score):
+    upper, middle, lower = talib.BBANDS(close, timeperiod=int(lookback),
+                                        nbdevup=entry_z_score,
+                                        nbdevdn=entry_z_score,
+                                        matype=MA_Type.SMA)
+    std = (upper - middle) / entry_z_score
+    return (close, upper, lower, middle + exit_z_score * std,
+            middle - exit_z_score * std)
+
+
+def _time_signals(func, bands):
+    start = time.time()
+    for args in bands:
+        func(*args)
+    return time.time() - start
+
+
+if __name__ == '__main__':
+    init_logger.setup()
+    main()
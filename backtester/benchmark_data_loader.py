@@ -0,0 +1,37 @@
+import logging
+import shutil
+import tempfile
+import time
+
+import data_loader
+import data_sources
+import init_logger
+
+
+def main():
+    symbols = data_loader.load_symbol_list(data_sources.SP_500_2012)
+    cache_dir = tempfile.mkdtemp()
+
+    try:
+        cold_csv = _time_load(symbols, use_cache=False)
+        build_cache = _time_load(symbols, cache_dir=cache_dir)
+        warm_cache = _time_load(symbols, cache_dir=cache_dir)
+    finally:
+        shutil.rmtree(cache_dir)
+
+    logging.info('Loaded {} symbols'.format(len(symbols)))
+    logging.info('Cold CSV:\t\t{:.3f}s'.format(cold_csv))
+    logging.info('Building cache:\t{:.3f}s'.format(build_cache))
+    logging.info('Warm cache:\t\t{:.3f}s'.format(warm_cache))
+    logging.info('Speed-up:\t\t{:.1f}x'.format(cold_csv / warm_cache))
+
+
+def _time_load(symbols, **kwargs):
+    start = time.time()
+    data_loader.load_price_data(data_sources.DATA_DIR, symbols, **kwargs)
+    return time.time() - start
+
+
+if __name__ == '__main__':
+    init_logger.setup()
+    main()
@@ -0,0 +1,105 @@
+"""
+Memoised Bollinger band components for repeated backtests.
+
+Bollinger bands are middle +/- z_score * std, where the middle band is a
+moving average of lookback prices and std is their moving standard
+deviation. Only the middle band and std depend on the lookback, so they are
+cached per price array, lookback and moving average type, and bands for any
+z score are derived from them without calling talib again. The derived
+bands are identical to those from talib.BBANDS.
+
+Price arrays are identified by object identity, through a weak reference
+so that the cache does not keep them alive, and their entries are dropped
+once they are collected. Arrays must not be modified in place while their
+bands are cached.
+"""
+
+from collections import OrderedDict
+import weakref
+
+import numpy as np
+import talib
+from talib import MA_Type
+
+
+DEFAULT_MAX_BYTES = 100 * 1024 * 1024
+
+
+class IndicatorCache(object):
+    """
+    Least recently used cache of moving averages and standard deviations,
+    evicting entries once they take more than max_bytes
+    """
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get_moving_std(self, close, lookback, matype=MA_Type.SMA):
+        """
+        :return: middle band & moving standard deviation
+        """
+        key = (id(close), lookback, matype)
+        entry = self._entries.get(key)
+        # A different array can have the id of one that has been collected
+        if entry is not None and entry[0]() is close:
+            self.hits += 1
+            del self._entries[key]
+            self._entries[key] = entry
+            return entry[1], entry[2]
+
+        self.misses += 1
+        if entry is not None:
+            self._remove(key)
+
+        middle = talib.MA(close, timeperiod=lookback, matype=matype)
+        std = talib.STDDEV(close, timeperiod=lookback, nbdev=1)
+        # Cached arrays are shared between callers
+        middle.flags.writeable = False
+        std.flags.writeable = False
+
+        self._entries[key] = (weakref.ref(close, self._get_callback(key)),
+                              middle, std)
+        self.nbytes += middle.nbytes + std.nbytes
+        self._evict()
+        return middle, std
+
+    def get_bands(self, close, lookback, nbdevup, nbdevdn,
+                  matype=MA_Type.SMA):
+        """
+        Equivalent of talib.BBANDS
+
+        :return: upper, middle & lower bands
+        """
+        middle, std = self.get_moving_std(close, lookback, matype)
+        return middle + nbdevup * std, middle, middle - nbdevdn * std
+
+    def clear(self):
+        self._entries.clear()
+        self.nbytes = 0
+
+    def _evict(self):
+        # The newest entry is kept even if it alone is over the limit
+        while self.nbytes > self.max_bytes and len(self._entries) > 1:
+            self._remove(next(iter(self._entries)))
+
+    def _get_callback(self, key):
+        def remove(ref):
+            entry = self._entries.get(key)
+            # The key may have been reused by an array created since
+            if entry is not None and entry[0] is ref:
+                self._remove(key)
+        return remove
+
+    def _remove(self, key):
+        _, middle, std = self._entries.pop(key)
+        self.nbytes -= middle.nbytes + std.nbytes
+
+
+# Shared by backtests which are not given their own cache
+DEFAULT_CACHE = IndicatorCache()
@@ -1,6 +1,13 @@
+import multiprocessing
+
 import matplotlib.pyplot as plt
 import numpy as np
 
+import monte_carlo
+
+
+SIMULATIONS_PER_TASK = 100
+
 
 class Side(object):
     BUY = -1
@@ -8,16 +15,32 @@ class Side(object):
 
 
 def main():
-    final_positions = []
-
-    for i in range(0, 10000):
-        final_positions.append(run_simulation(1000))
+    final_positions = run_simulations(10000, 1000, seed=1,
+                                      workers=multiprocessing.cpu_count())
 
     plt.hist(final_positions)
     plt.show()
 
 
-def run_simulation(iterations):
+def run_simulations(simulation_count, iterations, seed, workers=1):
+    """
+    Final pnl of simulation_count simulations, run in batches across a pool
+    of worker processes. Each batch draws from its own random stream derived
+    from seed, so results are identical for any number of workers.
+    """
+    tasks = [(min(SIMULATIONS_PER_TASK, simulation_count - start), iterations)
+             for start in range(0, simulation_count, SIMULATIONS_PER_TASK)]
+    results = monte_carlo.run_parallel(_run_simulations_task, tasks, seed,
+                                       workers)
+    return np.concatenate(results) if results else np.array([])
+
+
+def _run_simulations_task(random_state, simulation_count, iterations):
+    return np.array([run_simulation(iterations, random_state)
+                     for i in range(simulation_count)])
+
+
+def run_simulation(iterations, random_state=None):
     mid_price = 100.0
     tick = 1.0
     qty = 1.0
@@ -32,7 +55,7 @@ def run_simulation(iterations):
         positions.add_position(buy_position)
         positions.add_position(sell_position)
 
-        fill = create_fill(mid_price, tick)
+        fill = create_fill(mid_price, tick, random_state)
         positions.process_fill(fill)
 
         positions.remove_position(buy_position)
@@ -44,8 +67,9 @@ def run_simulation(iterations):
     return positions.pnl
 
 
-def create_fill(mid_price, tick):
-    side = np.sign(np.random.rand() - 0.5)
+def create_fill(mid_price, tick, random_state=None):
+    random = np.random if random_state is None else random_state
+    side = np.sign(random.rand() - 0.5)
     price = mid_price + (side * tick)
     qty = 1.0
     return Fill(side, price, qty)
@@ -6,6 +6,7 @@ import math
 import data_loader
 import init_logger
 from datatypes import OptionType
+import option_store
 import price_series
 import utils
 
@@ -82,19 +83,11 @@ def main():
                 # select all options we have a last price for & assume this
                 # selling cost
 
-                results = []
-
-                for strike, probability in otm_probabilities:
-                    last_price_str = puts.ix[strike]['LAST_PRICE']
-                    if last_price_str == '-':
-                        continue
-                    last_price = float(last_price_str)
-                    # print('Strike: {}, P(ITM): {}, Last Price: {}'.format(
-                    #     strike, probability, last_price))
-                    results.append([strike, probability, last_price])
-
-
-                data = np.asarray(results).T
+                last_prices = option_store.to_numeric(puts)['LAST_PRICE'] \
+                    .reindex(otm_probabilities[:, 0]).values
+                quoted = ~np.isnan(last_prices)
+                data = np.vstack((otm_probabilities[quoted, :2].T,
+                                  last_prices[quoted]))
 
                 # last_price / probability
                 upside_ratio = data[2] / data[1]
@@ -4,8 +4,10 @@ import datetime as dt
 import data_loader
 import init_logger
 import math
+import numpy as np
 import option
 from datatypes import OptionType
+import option_store
 import utils
 
 
@@ -55,20 +57,23 @@ def main():
 
                 delta = days_to_expiry.days / days_in_year
 
-                for strike in puts.index:
-                    last_price_str = puts.ix[strike]['LAST_PRICE']
-                    if last_price_str == '-':
-                        continue
-                    last_price = float(last_price_str)
-                    price = option.calc_option_price(
-                        OptionType.PUT, strike, underlying_price, sigma, delta,
-                        risk_free_rate=0.01)
-                    implied_volatility = option.implied_volatility(
-                        OptionType.PUT, strike, underlying_price, last_price, delta)
+                last_prices = option_store.to_numeric(puts)['LAST_PRICE'].values
+                quoted = ~np.isnan(last_prices)
+                strikes = puts.index.values[quoted].astype(float)
+                last_prices = last_prices[quoted]
+
+                prices = option.calc_option_values(
+                    OptionType.PUT, strikes, underlying_price, sigma, delta,
+                    risk_free_rate=0.01).price
+                implied_volatilities, status = option.implied_volatilities(
+                    OptionType.PUT, strikes, underlying_price, last_prices,
+                    delta)
+
+                for i, strike in enumerate(strikes):
                     print('Strike: {}, calc price: {}, actual {}'.format(
-                        strike, price, last_price))
-                    print('Sigma: {}, implied sigma: {}'.format(
-                        sigma, implied_volatility))
+                        strike, prices[i], last_prices[i]))
+                    print('Sigma: {}, implied sigma: {}, status: {}'.format(
+                        sigma, implied_volatilities[i], status[i]))
 
 
 def calc_sigma(returns, start_date, expiry_date):
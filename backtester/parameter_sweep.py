@@ -0,0 +1,151 @@
+"""
+Parameter sweeps of MovingAverageBacktest across many symbols, run in a
+pool of processes.
+
+All parameter sets are drawn up front and run in order of lookback, so
+that backtests sharing a lookback reuse the same moving averages from the
+indicator cache. The price arrays and parameters are handed to each worker
+once, when the pool starts, so a task is only a symbol number and a range
+of parameter rows rather than a pickled copy of the prices.
+"""
+
+import logging
+import multiprocessing
+import numbers
+import time
+
+import numpy as np
+
+import backtester
+
+
+DEFAULT_CHUNK_SIZE = 100
+
+# Lower bound & width of the uniform distribution of each parameter
+PARAMETER_LOWS = np.array([2., 0., -5.])
+PARAMETER_WIDTHS = np.array([90., 5., 5.])
+
+RESULT_COLUMNS = ['Sharpe Ratio', 'Lookback', 'Entry Z Score', 'Exit Z Score']
+
+# Set in each worker by _init_worker
+_prices = None
+_parameters = None
+
+
+def sample_parameters(count, random_state=None):
+    """
+    Draw parameter sets from the distributions used by backtest_runner, in
+    a single call to the random number generator
+
+    :param random_state: numpy RandomState or seed to draw from, by default
+    the global numpy random state
+    :return: (count x 3) array of lookback, entry_z_score & exit_z_score,
+    with lookbacks rounded down to whole days
+    """
+    if isinstance(random_state, numbers.Integral):
+        random_state = np.random.RandomState(random_state)
+    random = np.random if random_state is None else random_state
+
+    parameters = PARAMETER_LOWS + \
+        PARAMETER_WIDTHS * random.uniform(size=(count, 3))
+    parameters[:, 0] = np.floor(parameters[:, 0])
+    return parameters
+
+
+def run_sweep(price_data, parameters, workers=1,
+              chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Backtest every parameter set against every symbol
+
+    :param price_data: dictionary of symbol to close prices
+    :param parameters: (n x 3) array of lookback, entry_z_score &
+    exit_z_score, as returned by sample_parameters
+    :return: dictionary of symbol to (n x 4) array of RESULT_COLUMNS, where
+    the Sharpe ratio is NaN for invalid parameter sets
+    """
+    symbols = sorted(price_data.keys())
+    prices = [np.asarray(price_data[symbol], dtype=np.float64)
+              for symbol in symbols]
+    parameters = np.asarray(parameters, dtype=np.float64)
+    # Runs with the same lookback fall in the same tasks, so they share
+    # moving averages through the worker's indicator cache
+    order = np.argsort(parameters[:, 0], kind='mergesort')
+    sorted_parameters = parameters[order]
+
+    tasks = [(i, start, min(start + chunk_size, len(parameters)))
+             for i in range(len(symbols))
+             for start in range(0, len(parameters), chunk_size)]
+
+    sharpe_ratios = np.zeros((len(symbols), len(parameters))) + np.NAN
+    start_time = time.time()
+
+    if workers is None or workers <= 1 or len(tasks) <= 1:
+        plot_series = backtester._PLOT_SERIES
+        _init_worker(prices, sorted_parameters)
+        try:
+            for task in tasks:
+                _store(sharpe_ratios, _run_task(task))
+        finally:
+            _init_worker(None, None)
+            backtester._PLOT_SERIES = plot_series
+    else:
+        pool = multiprocessing.Pool(min(workers, len(tasks)),
+                                    initializer=_init_worker,
+                                    initargs=(prices, sorted_parameters))
+        try:
+            report_every = max(len(tasks) // 10, 1)
+            backtests = 0
+            for i, result in enumerate(pool.imap_unordered(_run_task, tasks)):
+                backtests += _store(sharpe_ratios, result)
+                if (i + 1) % report_every == 0:
+                    _log_throughput(backtests, start_time)
+        finally:
+            pool.close()
+            pool.join()
+
+    _log_throughput(sharpe_ratios.size, start_time)
+    sharpe_ratios[:, order] = sharpe_ratios.copy()
+
+    results = {}
+    for i, symbol in enumerate(symbols):
+        results[symbol] = np.column_stack((sharpe_ratios[i], parameters))
+    return results
+
+
+def _init_worker(prices, parameters):
+    global _prices, _parameters
+    _prices = prices
+    _parameters = parameters
+    # Workers must not open a plot window for each backtest
+    backtester._PLOT_SERIES = False
+
+
+def _run_task(task):
+    symbol_idx, start, end = task
+    close = _prices[symbol_idx]
+
+    sharpe_ratios = np.zeros(end - start) + np.NAN
+    for i in range(start, end):
+        lookback, entry_z_score, exit_z_score = _parameters[i]
+        backtest = backtester.MovingAverageBacktest(
+            lookback=int(lookback),
+            entry_z_score=entry_z_score,
+            exit_z_score=exit_z_score)
+        try:
+            sharpe_ratios[i - start] = backtest.run(close)
+        except backtester.ParameterException as e:
+            logging.debug(e)
+
+    return symbol_idx, start, sharpe_ratios
+
+
+def _store(sharpe_ratios, result):
+    symbol_idx, start, values = result
+    sharpe_ratios[symbol_idx, start:start + len(values)] = values
+    return len(values)
+
+
+def _log_throughput(backtests, start_time):
+    elapsed = time.time() - start_time
+    logging.info('{} backtests in {:.1f}s ({:.0f}/s)'
+                 .format(backtests, elapsed, backtests / max(elapsed, 1e-9)))
@@ -0,0 +1,158 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+
+class PricePanel(object):
+    """
+    Price data for a universe of symbols held in a single
+    dates x symbols x fields float64 array on a shared trading calendar.
+
+    Where a symbol has no price for a date in the calendar the value is NaN,
+    missing values within a symbol's own history are forward, then back
+    filled as with PriceData.
+
+    The array can be persisted to a .npy file and reopened memory-mapped, so
+    that date range queries return views onto the file rather than copies.
+    """
+    def __init__(self, dates, symbols, fields, values):
+        self.dates = np.asarray(dates, dtype='datetime64[ns]')
+        self.symbols = list(symbols)
+        self.fields = list(fields)
+        self.values = values
+
+        self._symbol_idx = dict((s, i) for i, s in enumerate(self.symbols))
+        self._field_idx = dict((f, i) for i, f in enumerate(self.fields))
+
+    @classmethod
+    def from_price_data(cls, price_data, symbols=None, fields=None,
+                        filename=None):
+        """
+        Build a panel from a dictionary of per-symbol DataFrames, as
+        returned by data_loader.load_price_data
+
+        :param filename: if provided the array is written directly to this
+        memory-mapped .npy file, rather than being held in memory
+        """
+        if symbols is None:
+            symbols = sorted(price_data.keys())
+        symbols = [symbol for symbol in symbols if symbol in price_data]
+
+        if fields is None:
+            fields = list(price_data[symbols[0]].columns) if symbols else []
+
+        dates = _get_calendar([price_data[symbol] for symbol in symbols])
+        shape = (len(dates), len(symbols), len(fields))
+
+        if filename is not None:
+            values = np.lib.format.open_memmap(
+                _values_file(filename), mode='w+', dtype=np.float64,
+                shape=shape)
+        else:
+            values = np.empty(shape, dtype=np.float64)
+        values[:] = np.nan
+
+        for i, symbol in enumerate(symbols):
+            df = price_data[symbol]
+            rows = np.searchsorted(dates, df.index.values)
+            columns = [field for field in fields if field in df.columns]
+            clean_data = df[columns].ffill().bfill()
+
+            for column in columns:
+                values[rows, i, fields.index(column)] = \
+                    clean_data[column].values
+
+        panel = cls(dates, symbols, fields, values)
+        if filename is not None:
+            values.flush()
+            panel._save_index(filename)
+        return panel
+
+    @classmethod
+    def load(cls, filename, mmap_mode='r'):
+        with np.load(_index_file(filename), allow_pickle=False) as index:
+            dates = index['dates']
+            symbols = [str(symbol) for symbol in index['symbols']]
+            fields = [str(field) for field in index['fields']]
+
+        values = np.load(_values_file(filename), mmap_mode=mmap_mode)
+        return cls(dates, symbols, fields, values)
+
+    def save(self, filename):
+        np.save(_values_file(filename), self.values)
+        self._save_index(filename)
+
+    def _save_index(self, filename):
+        with open(_index_file(filename), 'wb') as f:
+            np.savez(f, dates=self.dates,
+                     symbols=np.array(self.symbols),
+                     fields=np.array(self.fields))
+
+    def get_price_data(self, symbols, price_type, start=None, end=None):
+        rows = self._get_rows(start, end)
+        columns = [symbol for symbol in symbols if symbol in self._symbol_idx]
+        column_idx = self._get_columns(columns)
+        field = self._field_idx[price_type]
+
+        return pd.DataFrame(self.values[rows, column_idx, field],
+                            index=pd.DatetimeIndex(self.dates[rows]),
+                            columns=columns, copy=False)
+
+    def get_price_data_np(self, symbols, price_type, start=None, end=None):
+        rows = self._get_rows(start, end)
+        field = self._field_idx[price_type]
+
+        np_price_data = {}
+
+        for symbol in symbols:
+            np_price_data[symbol] = \
+                self.values[rows, self._symbol_idx[symbol], field]
+
+        return np_price_data
+
+    def _get_rows(self, start=None, end=None):
+        """
+        Slice of the calendar between start and end dates inclusive
+        """
+        start_idx = 0
+        end_idx = len(self.dates)
+
+        if start is not None:
+            start_idx = np.searchsorted(self.dates, _to_datetime64(start),
+                                        side='left')
+        if end is not None:
+            end_idx = np.searchsorted(self.dates, _to_datetime64(end),
+                                      side='right')
+
+        return slice(start_idx, end_idx)
+
+    def _get_columns(self, symbols):
+        """
+        Index for symbols, which is a slice (and so selects a view) when the
+        symbols are contiguous in the panel
+        """
+        idx = [self._symbol_idx[symbol] for symbol in symbols]
+        if len(idx) > 0 and idx == list(range(idx[0], idx[0] + len(idx))):
+            return slice(idx[0], idx[0] + len(idx))
+        return idx
+
+
+def _get_calendar(frames):
+    if len(frames) == 0:
+        return np.array([], dtype='datetime64[ns]')
+    return np.unique(np.concatenate(
+        [np.asarray(df.index.values, dtype='datetime64[ns]')
+         for df in frames]))
+
+
+def _to_datetime64(date):
+    return np.datetime64(pd.Timestamp(date).value, 'ns')
+
+
+def _values_file(filename):
+    return os.path.splitext(filename)[0] + '.npy'
+
+
+def _index_file(filename):
+    return os.path.splitext(filename)[0] + '.index.npz'
@@ -1,8 +1,11 @@
 import numpy as np
+import talib
+from talib import MA_Type
 import unittest
 
 import backtester
 from backtester import MovingAverageBacktest
+from indicator_cache import IndicatorCache
 import utils
 
 
@@ -25,6 +28,13 @@ class TestBacktester(unittest.TestCase):
 
 class TestMovingAverageBacktest(unittest.TestCase):
 
+    def setUp(self):
+        self.plot_series = backtester._PLOT_SERIES
+        backtester._PLOT_SERIES = False
+
+    def tearDown(self):
+        backtester._PLOT_SERIES = self.plot_series
+
     def test_break_upwards(self):
         self.assertTrue(MovingAverageBacktest._break_upwards(
             [10.0, 15.0], [11.0, 14.0], 1))
@@ -41,6 +51,91 @@ class TestMovingAverageBacktest(unittest.TestCase):
         self.assertFalse(MovingAverageBacktest._break_downwards(
             [15.0, 10.0], [14.0, 9.0], 1))
 
+    def test_breaks(self):
+        close = np.array([10.0, 15.0, 12.0, 9.0, 13.0])
+        band = np.array([11.0, 14.0, np.nan, 10.0, 12.0])
+        np.testing.assert_array_equal(
+            [1, 4, 5], MovingAverageBacktest._upward_breaks(close, band))
+        np.testing.assert_array_equal(
+            [5], MovingAverageBacktest._downward_breaks(close, band))
+
+    def test_scan_signals(self):
+        random = np.random.RandomState(7)
+        for i in range(200):
+            close = 50. + np.cumsum(random.normal(0, 1, 250))
+            lookback = random.randint(2, 60)
+            entry_z_score = random.uniform(0.1, 3.)
+            exit_z_score = random.uniform(-3., entry_z_score)
+
+            upper, middle, lower = talib.BBANDS(
+                close, timeperiod=lookback, nbdevup=entry_z_score,
+                nbdevdn=entry_z_score, matype=MA_Type.SMA)
+            std = (upper - middle) / entry_z_score
+            bands = (close, upper, lower, middle + exit_z_score * std,
+                     middle - exit_z_score * std)
+
+            expected = MovingAverageBacktest._iterate_signals(*bands)
+            result = MovingAverageBacktest._scan_signals(*bands)
+            np.testing.assert_array_equal(expected[0], result[0])
+            np.testing.assert_array_equal(expected[1], result[1])
+
+    def test_scan_signals_open_position(self):
+        close = np.array([10.0, 12.0, 13.0, 9.0, 9.5])
+        upper = np.array([11.0, 11.0, 11.0, 11.0, 11.0])
+        lower = upper - 5.
+        middle = upper - 2.5
+        signals, positions = MovingAverageBacktest._scan_signals(
+            close, upper, lower, middle, middle)
+
+        np.testing.assert_array_equal([0, -1, 0, 0, 0], signals)
+        np.testing.assert_array_equal([np.nan, -1, -1, -1, -1], positions)
+
+    def test_indicator_cache(self):
+        cache = IndicatorCache()
+        close = 50. + np.cumsum(np.random.RandomState(3).normal(0, 1, 100))
+        MovingAverageBacktest(10, 2., 0., cache=cache).run(close)
+        MovingAverageBacktest(10, 1., -1., cache=cache).run(close)
+        backtester.ChanBacktest(cache=cache).run(close)
+
+        self.assertEqual(2, cache.misses)
+        self.assertEqual(1, cache.hits)
+
+    def test_evaluate_grid(self):
+        close = 50. + np.cumsum(np.random.RandomState(4).normal(0, 1, 250))
+        entry_z_scores = np.linspace(0.25, 3., 12)
+        exit_z_scores = np.linspace(-2., 1., 7)
+
+        for lookback in [5, 20, 50]:
+            surface = MovingAverageBacktest().evaluate_grid(
+                close, lookback, entry_z_scores, exit_z_scores,
+                chunk_size=10)
+            self.assertEqual((12, 7), surface.shape)
+
+            for i, entry_z_score in enumerate(entry_z_scores):
+                for j, exit_z_score in enumerate(exit_z_scores):
+                    if entry_z_score <= exit_z_score:
+                        self.assertTrue(np.isnan(surface[i, j]))
+                        continue
+                    expected = MovingAverageBacktest(
+                        lookback, entry_z_score, exit_z_score).run(close)
+                    np.testing.assert_allclose(expected, surface[i, j],
+                                               rtol=1e-12)
+
+    def test_evaluate_parameters(self):
+        close = 50. + np.cumsum(np.random.RandomState(6).normal(0, 1, 200))
+        parameters = np.array([[10., 2., 0.],
+                               [20., 1., -0.5],
+                               [10., 1.5, 1.],
+                               [10., 0.5, 1.]])
+
+        sharpe_ratios = MovingAverageBacktest().evaluate_parameters(
+            close, parameters)
+        for i in range(3):
+            np.testing.assert_allclose(
+                MovingAverageBacktest(*parameters[i]).run(close),
+                sharpe_ratios[i], rtol=1e-12)
+        self.assertTrue(np.isnan(sharpe_ratios[3]))
+
     def test_calculate_pnl(self):
         self.assertEqual(-7.5, MovingAverageBacktest._calculate_positions(
             PRICES, SIGNALS1)[-1])
@@ -48,5 +143,33 @@ class TestMovingAverageBacktest(unittest.TestCase):
             PRICES, SIGNALS2)[-1])
 
 
+class TestChanBacktest(unittest.TestCase):
+
+    def setUp(self):
+        self.plot_series = backtester._PLOT_SERIES
+        backtester._PLOT_SERIES = False
+
+    def tearDown(self):
+        backtester._PLOT_SERIES = self.plot_series
+
+    def test_evaluate_grid(self):
+        close = 50. + np.cumsum(np.random.RandomState(5).normal(0, 1, 250))
+        entry_z_scores = np.array([0.5, 1., 2.])
+        exit_z_scores = np.array([-0.5, 0., 0.5])
+
+        backtest = backtester.ChanBacktest()
+        surface = backtest.evaluate_grid(close, 15, entry_z_scores,
+                                         exit_z_scores)
+        for i, entry_z_score in enumerate(entry_z_scores):
+            for j, exit_z_score in enumerate(exit_z_scores):
+                signals = backtest._run_strategy(
+                    close, 15, entry_z_score, exit_z_score)
+                returns = utils.calculate_returns(
+                    backtest._calculate_positions(close, signals))
+                np.testing.assert_allclose(
+                    backtester._calculate_sharpe_ratio(returns),
+                    surface[i, j], rtol=1e-12)
+
+
 if __name__ == '__main__':
     unittest.main()
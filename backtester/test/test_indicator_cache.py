@@ -0,0 +1,73 @@
+import gc
+import unittest
+
+import numpy as np
+import talib
+from talib import MA_Type
+
+from indicator_cache import IndicatorCache
+
+
+class TestIndicatorCache(unittest.TestCase):
+    def setUp(self):
+        random = np.random.RandomState(1)
+        self.close = 50. + np.cumsum(random.normal(0, 1, 250))
+        self.cache = IndicatorCache()
+
+    def test_get_bands(self):
+        for matype in [MA_Type.SMA, MA_Type.EMA]:
+            for lookback, z_score in [(20, 2.), (20, 0.7), (5, 3.1)]:
+                expected = talib.BBANDS(self.close, timeperiod=lookback,
+                                        nbdevup=z_score, nbdevdn=z_score,
+                                        matype=matype)
+                result = self.cache.get_bands(self.close, lookback, z_score,
+                                              z_score, matype=matype)
+                for e, r in zip(expected, result):
+                    np.testing.assert_array_equal(e, r)
+
+        self.assertEqual(4, self.cache.misses)
+        self.assertEqual(2, self.cache.hits)
+
+    def test_identity(self):
+        middle, std = self.cache.get_moving_std(self.close, 20)
+        self.assertIs(middle, self.cache.get_moving_std(self.close, 20)[0])
+        self.assertFalse(middle.flags.writeable)
+
+        # Equal prices in a different array are a different entry
+        copy = self.close.copy()
+        self.assertIsNot(middle, self.cache.get_moving_std(copy, 20)[0])
+        self.assertEqual(2, len(self.cache))
+
+    def test_collected_array(self):
+        close = self.close.copy()
+        self.cache.get_moving_std(close, 20)
+        key = id(close)
+        del close
+        gc.collect()
+
+        # The entry is dropped, so an array reusing the id cannot be given it
+        self.assertNotIn((key, 20, MA_Type.SMA), self.cache._entries)
+        self.assertEqual(0, len(self.cache))
+        self.assertEqual(0, self.cache.nbytes)
+
+    def test_lru_eviction(self):
+        entry_bytes = 2 * self.close.nbytes
+        cache = IndicatorCache(max_bytes=3 * entry_bytes)
+        for lookback in [5, 10, 15]:
+            cache.get_moving_std(self.close, lookback)
+        # Most recently used
+        cache.get_moving_std(self.close, 5)
+        cache.get_moving_std(self.close, 20)
+
+        self.assertEqual(3, len(cache))
+        self.assertEqual(3 * entry_bytes, cache.nbytes)
+        keys = [key[1] for key in cache._entries]
+        self.assertListEqual([15, 5, 20], keys)
+
+        cache.clear()
+        self.assertEqual(0, len(cache))
+        self.assertEqual(0, cache.nbytes)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -57,6 +57,21 @@ class TestMarketMaking(unittest.TestCase):
         self.assertEqual(99.0, mm.create_fill(100.0, 1.0).price)
         self.assertEqual(101.0, mm.create_fill(100.0, 1.0).price)
 
+    def test_create_fill_random_state(self):
+        np.random.seed(10)
+        expected = [mm.create_fill(100.0, 1.0).price for i in range(3)]
+        random_state = np.random.RandomState(10)
+        self.assertListEqual(
+            expected,
+            [mm.create_fill(100.0, 1.0, random_state).price
+             for i in range(3)])
+
+    def test_run_simulations(self):
+        expected = mm.run_simulations(250, 20, seed=1)
+        self.assertEqual(250, len(expected))
+        np.testing.assert_array_equal(
+            expected, mm.run_simulations(250, 20, seed=1, workers=2))
+
 
 if __name__ == '__main__':
     unittest.main()
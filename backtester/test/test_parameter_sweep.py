@@ -0,0 +1,86 @@
+import unittest
+
+import numpy as np
+
+import backtester
+import parameter_sweep
+
+
+class TestParameterSweep(unittest.TestCase):
+    def setUp(self):
+        self.plot_series = backtester._PLOT_SERIES
+        backtester._PLOT_SERIES = False
+
+        random = np.random.RandomState(1)
+        self.price_data = dict(
+            (symbol, 50. + np.cumsum(random.normal(0, 1, 120)))
+            for symbol in ['AAA', 'BBB', 'CCC'])
+        self.parameters = np.array([[20., 2., 0.],
+                                    [10., 1.5, -0.5],
+                                    [30., 1., 2.],
+                                    [5., 0.5, -1.]])
+
+    def tearDown(self):
+        backtester._PLOT_SERIES = self.plot_series
+
+    def test_sample_parameters(self):
+        parameters = parameter_sweep.sample_parameters(
+            1000, random_state=np.random.RandomState(2))
+
+        self.assertEqual((1000, 3), parameters.shape)
+        np.testing.assert_array_equal(np.floor(parameters[:, 0]),
+                                      parameters[:, 0])
+        self.assertTrue((parameters[:, 0] >= 2).all())
+        self.assertTrue((parameters[:, 0] < 92).all())
+        self.assertTrue((parameters[:, 1] >= 0).all())
+        self.assertTrue((parameters[:, 2] <= 0).all())
+
+        np.testing.assert_array_equal(
+            parameters, parameter_sweep.sample_parameters(
+                1000, random_state=np.random.RandomState(2)))
+
+    def test_sample_parameters_seed(self):
+        parameters = parameter_sweep.sample_parameters(1000, random_state=2)
+        np.testing.assert_array_equal(
+            parameters, parameter_sweep.sample_parameters(
+                1000, random_state=np.random.RandomState(2)))
+
+        # Each parameter is drawn independently
+        correlation = np.corrcoef(parameters, rowvar=False)
+        self.assertTrue(
+            (np.abs(correlation[np.triu_indices(3, 1)]) < 0.1).all())
+
+    def test_run_sweep(self):
+        results = parameter_sweep.run_sweep(self.price_data, self.parameters,
+                                            chunk_size=3)
+
+        self.assertListEqual(sorted(self.price_data.keys()),
+                             sorted(results.keys()))
+        for symbol, close in self.price_data.items():
+            expected = [backtester.MovingAverageBacktest(
+                int(lookback), entry_z_score, exit_z_score).run(close)
+                for lookback, entry_z_score, exit_z_score
+                in self.parameters[[0, 1, 3]]]
+
+            self.assertEqual((4, 4), results[symbol].shape)
+            np.testing.assert_array_equal(self.parameters,
+                                          results[symbol][:, 1:])
+            np.testing.assert_array_equal(expected,
+                                          results[symbol][[0, 1, 3], 0])
+            # Entry z score below exit z score is skipped
+            self.assertTrue(np.isnan(results[symbol][2, 0]))
+
+        self.assertFalse(backtester._PLOT_SERIES)
+        self.assertIsNone(parameter_sweep._prices)
+
+    def test_workers(self):
+        expected = parameter_sweep.run_sweep(self.price_data,
+                                             self.parameters, chunk_size=3)
+        results = parameter_sweep.run_sweep(self.price_data, self.parameters,
+                                            workers=2, chunk_size=3)
+        for symbol in self.price_data:
+            np.testing.assert_array_equal(expected[symbol], results[symbol])
+
+
+if __name__ == '__main__':
+    unittest.main()
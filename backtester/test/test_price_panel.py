@@ -0,0 +1,104 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+from pandas import Timestamp
+
+import data_loader as dl
+from price_panel import PricePanel
+import utils
+from utils import DATE_FORMAT
+
+
+WORKING_DIR = os.path.dirname(os.path.realpath(__file__))
+DATA_DIR = os.path.join(WORKING_DIR, 'data')
+SYMBOL_LIST = ['TEST', 'TEST2', 'TEST3']
+
+DATE1 = '2012-08-28'
+DATE2 = '2012-08-29'
+DATE3 = '2012-08-30'
+
+
+class TestPricePanel(unittest.TestCase):
+    def setUp(self):
+        self.price_data = dl.load_price_data(DATA_DIR, SYMBOL_LIST,
+                                             use_cache=False)
+        self.panel = PricePanel.from_price_data(self.price_data)
+
+    def test_shape(self):
+        # Union of the TEST and TEST3 calendars
+        self.assertEqual((6, 3, 6), self.panel.values.shape)
+        self.assertListEqual(SYMBOL_LIST, self.panel.symbols)
+
+    def test_get_price_data(self):
+        result = self.panel.get_price_data(['TEST', 'TEST2'], 'Close',
+                                           end=utils.create_date(DATE3))
+
+        # float('NaN') != float('NaN')
+        result = result.fillna(0)
+
+        self.assertEqual(2, len(result.columns))
+        self.assertDictEqual(
+            {Timestamp('2012-08-28 00:00:00'): 13102.99,
+             Timestamp('2012-08-29 00:00:00'): 13107.48,
+             Timestamp('2012-08-30 00:00:00'): 13000.709999999999},
+            result["TEST"].to_dict())
+        self.assertDictEqual(
+            {Timestamp('2012-08-28 00:00:00'): 0,
+             Timestamp('2012-08-29 00:00:00'): 1410.49,
+             Timestamp('2012-08-30 00:00:00'): 1399.48},
+            result["TEST2"].to_dict())
+
+    def test_get_price_data_by_date_range(self):
+        start = utils.create_date(DATE1)
+        end = utils.create_date(DATE2)
+
+        result = self.panel.get_price_data(['TEST'], 'Close', start, end)
+
+        self.assertEqual(2, len(result))
+        self.assertEqual(DATE1, result.index[0].strftime(DATE_FORMAT))
+        self.assertEqual(DATE2, result.index[-1].strftime(DATE_FORMAT))
+
+    def test_get_price_data_np(self):
+        start = utils.create_date(DATE2)
+        end = utils.create_date(DATE3)
+
+        result = self.panel.get_price_data_np(['TEST', 'TEST2'], 'Close',
+                                              start, end)
+
+        np.testing.assert_array_equal(np.array([13107.48, 13000.71]),
+                                      result['TEST'])
+        np.testing.assert_array_equal(np.array([1410.49, 1399.48]),
+                                      result['TEST2'])
+        self.assertTrue(np.may_share_memory(self.panel.values,
+                                            result['TEST']))
+
+    def test_does_not_modify_price_data(self):
+        self.price_data['TEST'].iloc[1, 0] = np.nan
+        PricePanel.from_price_data(self.price_data)
+        self.assertTrue(np.isnan(self.price_data['TEST'].iloc[1, 0]))
+
+    def test_save_and_load(self):
+        directory = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(directory, 'panel')
+            self.panel.save(filename)
+            loaded = PricePanel.load(filename)
+
+            self.assertTrue(isinstance(loaded.values, np.memmap))
+            self.assertListEqual(self.panel.symbols, loaded.symbols)
+            self.assertListEqual(self.panel.fields, loaded.fields)
+            np.testing.assert_array_equal(self.panel.dates, loaded.dates)
+            np.testing.assert_array_equal(self.panel.values, loaded.values)
+
+            mapped = PricePanel.from_price_data(
+                self.price_data, filename=os.path.join(directory, 'mapped'))
+            np.testing.assert_array_equal(self.panel.values, mapped.values)
+        finally:
+            shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,153 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+import backtester
+import universe_runner
+from universe_runner import ResultStore
+
+
+class TestUniverseRunner(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        random = np.random.RandomState(1)
+        self.price_data = dict(
+            (symbol, 50. + np.cumsum(random.normal(0, 1, 150)))
+            for symbol in ['AAA', 'BBB', 'CCC'])
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def run_universe(self, directory=None, workers=1, block_size=4):
+        return universe_runner.run_universe(
+            self.price_data, directory or self.directory,
+            parameter_count=10, block_size=block_size, workers=workers)
+
+    def get_results(self, store):
+        results = {}
+        for record in store:
+            unit = (record['symbol'], record['strategy'], record['block'])
+            self.assertNotIn(unit, results)
+            results[unit] = np.array(record['results'], dtype=float)
+        return results
+
+    def test_run_universe(self):
+        store = self.run_universe()
+        results = self.get_results(store)
+        parameters = store.load_parameters(10)
+
+        self.assertEqual(3 * 2 * 3, len(results))
+        for (symbol, strategy, block), unit_results in results.items():
+            rows = parameters[block * 4:(block + 1) * 4]
+            backtest = universe_runner.STRATEGIES[strategy]()
+            np.testing.assert_array_equal(rows, unit_results[:, 1:])
+            np.testing.assert_allclose(
+                backtest.evaluate_parameters(self.price_data[symbol], rows),
+                unit_results[:, 0], rtol=1e-12)
+
+    def test_resume(self):
+        expected = self.get_results(self.run_universe())
+
+        # Keep 5 complete units and part of the next, as if the run died
+        filename = os.path.join(self.directory, 'results.jsonl')
+        with open(filename, 'r') as f:
+            lines = f.readlines()
+        with open(filename, 'w') as f:
+            f.writelines(lines[:5])
+            f.write(lines[5][:20])
+
+        store = self.run_universe()
+        np.testing.assert_array_equal(
+            np.load(os.path.join(self.directory, 'parameters.npy')),
+            store.load_parameters(10))
+        results = self.get_results(store)
+        self.assertListEqual(sorted(expected.keys()), sorted(results.keys()))
+        for unit in expected:
+            np.testing.assert_array_equal(expected[unit], results[unit])
+
+        # Nothing is left to run
+        with open(filename, 'r') as f:
+            size = len(f.readlines())
+        self.run_universe()
+        with open(filename, 'r') as f:
+            self.assertEqual(size, len(f.readlines()))
+
+    def test_repair(self):
+        filename = os.path.join(self.directory, 'results.jsonl')
+        lines = [b'{"a": 1}\n', b'{"b": 2}\n']
+        with open(filename, 'wb') as f:
+            f.writelines(lines)
+            f.write(b'{"c": 3')
+        original_block_size = universe_runner._REPAIR_BLOCK_SIZE
+        # Search back across several blocks
+        universe_runner._REPAIR_BLOCK_SIZE = 3
+        try:
+            ResultStore(self.directory)
+            with open(filename, 'rb') as f:
+                self.assertEqual(b''.join(lines), f.read())
+
+            # Complete lines are left alone
+            ResultStore(self.directory)
+            with open(filename, 'rb') as f:
+                self.assertEqual(b''.join(lines), f.read())
+
+            # A partial first line leaves nothing
+            with open(filename, 'wb') as f:
+                f.write(b'{"a": 1')
+            ResultStore(self.directory)
+            self.assertEqual(0, os.path.getsize(filename))
+        finally:
+            universe_runner._REPAIR_BLOCK_SIZE = original_block_size
+
+    def test_parameter_count_mismatch(self):
+        self.run_universe()
+        self.assertRaises(ValueError,
+                          ResultStore(self.directory).load_parameters, 20)
+
+    def test_block_size_mismatch(self):
+        self.run_universe()
+        self.assertRaises(ValueError, self.run_universe, block_size=5)
+
+    def test_price_data_mismatch(self):
+        self.run_universe()
+        self.price_data['AAA'] = self.price_data['AAA'][1:]
+        self.assertRaises(ValueError, self.run_universe)
+        del self.price_data['AAA']
+        self.assertRaises(ValueError, self.run_universe)
+
+    def test_workers(self):
+        expected = self.get_results(self.run_universe())
+        directory = os.path.join(self.directory, 'parallel')
+        results = self.get_results(self.run_universe(directory, workers=2))
+
+        self.assertListEqual(sorted(expected.keys()), sorted(results.keys()))
+        for unit in expected:
+            np.testing.assert_array_equal(expected[unit], results[unit])
+
+    def test_build_leaderboard(self):
+        store = self.run_universe()
+        leaderboard = universe_runner.build_leaderboard(store)
+
+        best = {}
+        for (symbol, strategy, block), unit_results in \
+                self.get_results(store).items():
+            sharpe_ratios = unit_results[:, 0]
+            sharpe_ratios = sharpe_ratios[np.isfinite(sharpe_ratios)]
+            if len(sharpe_ratios) > 0:
+                best[(symbol, strategy)] = max(
+                    best.get((symbol, strategy), -np.inf),
+                    sharpe_ratios.max())
+
+        self.assertEqual(len(best), len(leaderboard))
+        self.assertListEqual(sorted(best.values(), reverse=True),
+                             [sharpe for name, sharpe in leaderboard])
+        for name, sharpe in leaderboard:
+            symbol, strategy = name.split()[:2]
+            self.assertEqual(best[(symbol, strategy)], sharpe)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import unittest
+
+import numpy as np
+
+import backtester
+import walk_forward
+from walk_forward import WalkForwardResult
+
+
+LOOKBACKS = [5, 10, 20]
+ENTRY_Z_SCORES = np.array([0.5, 1., 2.])
+EXIT_Z_SCORES = np.array([-1., 0., 0.5])
+
+
+class TestWalkForward(unittest.TestCase):
+    def setUp(self):
+        random = np.random.RandomState(1)
+        self.close = 50. + np.cumsum(random.normal(0, 1, 400))
+
+    def run_walk_forward(self, workers=1):
+        return walk_forward.walk_forward(
+            self.close, train_size=120, test_size=50, lookbacks=LOOKBACKS,
+            entry_z_scores=ENTRY_Z_SCORES, exit_z_scores=EXIT_Z_SCORES,
+            workers=workers)
+
+    def test_get_windows(self):
+        np.testing.assert_array_equal(
+            [[0, 120, 170], [50, 170, 220], [100, 220, 270]],
+            walk_forward.get_windows(300, 120, 50))
+        self.assertEqual(0, len(walk_forward.get_windows(100, 120, 50)))
+
+    def test_walk_forward(self):
+        result = self.run_walk_forward()
+
+        self.assertEqual(5, len(result.windows))
+        self.assertEqual(5 * 50, len(result.returns))
+
+        backtest = backtester.MovingAverageBacktest()
+        for (train_start, test_start, test_end), parameters, sharpe, \
+                returns in zip(result.windows, result.parameters,
+                               result.in_sample_sharpe_ratios,
+                               result.out_of_sample_returns):
+            surfaces = np.array([backtest.evaluate_grid(
+                self.close, lookback, ENTRY_Z_SCORES, EXIT_Z_SCORES,
+                start=train_start, end=test_start)
+                for lookback in LOOKBACKS])
+            self.assertEqual(np.nanmax(surfaces), sharpe)
+            k, i, j = np.unravel_index(np.nanargmax(surfaces),
+                                       surfaces.shape)
+            np.testing.assert_array_equal(
+                [LOOKBACKS[k], ENTRY_Z_SCORES[i], EXIT_Z_SCORES[j]],
+                parameters)
+
+            expected = backtest.calculate_returns(
+                self.close, LOOKBACKS[k], [ENTRY_Z_SCORES[i]],
+                [EXIT_Z_SCORES[j]], start=test_start, end=test_end)[0]
+            np.testing.assert_array_equal(expected, returns)
+
+        df = result.to_frame()
+        self.assertEqual(5, len(df))
+        np.testing.assert_array_equal(result.parameters[:, 0],
+                                      df['lookback'])
+
+        stability = result.parameter_stability()
+        np.testing.assert_allclose(result.parameters.mean(axis=0),
+                                   stability['mean'])
+
+    def test_workers(self):
+        expected = self.run_walk_forward()
+        result = self.run_walk_forward(workers=2)
+
+        np.testing.assert_array_equal(expected.parameters, result.parameters)
+        np.testing.assert_array_equal(expected.returns, result.returns)
+
+    def test_statistics(self):
+        result = WalkForwardResult(
+            np.array([[0, 2, 4], [2, 4, 6]]),
+            np.array([[5., 1., 0.], [10., 1., 0.]]),
+            np.array([1., 2.]),
+            [np.array([0.1, 0.2]), np.array([-0.4, 0.15])])
+
+        np.testing.assert_array_equal([0.1, 0.2, -0.4, 0.15], result.returns)
+        self.assertAlmostEqual(0.4, result.max_drawdown)
+        self.assertAlmostEqual(
+            backtester._calculate_sharpe_ratio(result.returns),
+            result.sharpe_ratio)
+
+        stability = result.parameter_stability()
+        np.testing.assert_array_equal([7.5, 1., 0.], stability['mean'])
+        np.testing.assert_array_equal([1., 0., 0.], stability['changes'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,334 @@
+"""
+Backtests across a universe of symbols, sharded into work units and run on
+a local process pool.
+
+A work unit is one symbol, one strategy and one block of parameter sets.
+The parameter sets are drawn once and saved with the results, along with
+the block size and a fingerprint of the prices, and each completed unit is
+appended to a JSON lines store as soon as it finishes. A run that is
+interrupted therefore resumes with the units that are not yet in the store,
+provided it is given the same prices and block size, and the leaderboard is
+built by streaming through the store rather than holding every result in
+memory.
+"""
+
+import hashlib
+import json
+import logging
+import math
+import multiprocessing
+import os
+import time
+
+import numpy as np
+
+import backtest_runner
+import backtester
+import data_loader
+import data_sources
+import init_logger
+import parameter_sweep
+from price_panel import PricePanel
+import utils
+
+
+STRATEGIES = {
+    'MovingAverage': backtester.MovingAverageBacktest,
+    'Chan': backtester.ChanBacktest,
+}
+
+DEFAULT_PARAMETER_COUNT = 1000
+DEFAULT_BLOCK_SIZE = 250
+# Parameter sets are reproducible, so a store can be rebuilt from scratch
+PARAMETER_SEED = 1
+
+RESULTS_DIR = os.path.join(data_sources.DATA_DIR, 'universe_results')
+
+_PARAMETERS_FILE = 'parameters.npy'
+_RUN_FILE = 'run.json'
+_RESULTS_FILE = 'results.jsonl'
+# Bytes read at a time when searching back for the end of the last line
+_REPAIR_BLOCK_SIZE = 64 * 1024
+
+# Set in each worker by _init_worker
+_price_data = None
+_parameters = None
+_block_size = None
+
+
+class ResultStore(object):
+    """
+    Append-only store of completed work units in a directory, holding the
+    parameter sets, the settings of the run and a JSON lines file with one
+    line per unit
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        self.filename = os.path.join(directory, _RESULTS_FILE)
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        self._repair()
+
+    def load_parameters(self, count=DEFAULT_PARAMETER_COUNT):
+        """
+        Parameter sets for this store, which are drawn and saved on first use
+
+        :return: (count x 3) array of lookback, entry_z_score & exit_z_score
+        """
+        filename = os.path.join(self.directory, _PARAMETERS_FILE)
+        if os.path.exists(filename):
+            parameters = np.load(filename)
+            if len(parameters) != count:
+                raise ValueError(
+                    'Store {} has {} parameter sets, not {}'
+                    .format(self.directory, len(parameters), count))
+            return parameters
+
+        parameters = parameter_sweep.sample_parameters(
+            count, random_state=np.random.RandomState(PARAMETER_SEED))
+        tmp_file = filename + '.tmp'
+        with open(tmp_file, 'wb') as f:
+            np.save(f, parameters)
+        os.rename(tmp_file, filename)
+        return parameters
+
+    def check_run(self, block_size, fingerprint):
+        """
+        Block numbers in the store only identify parameter sets for the block
+        size they were run with, and results only hold for the prices they
+        were run on, so both are saved on first use and must match when
+        resuming
+
+        :param fingerprint: as returned by fingerprint_prices
+        """
+        run = {'block_size': block_size, 'fingerprint': fingerprint}
+        filename = os.path.join(self.directory, _RUN_FILE)
+        if os.path.exists(filename):
+            with open(filename, 'r') as f:
+                saved = json.load(f)
+            for key in sorted(run.keys()):
+                if saved[key] != run[key]:
+                    raise ValueError(
+                        'Store {} was run with {} {}, not {}'
+                        .format(self.directory, key, saved[key], run[key]))
+            return
+
+        tmp_file = filename + '.tmp'
+        with open(tmp_file, 'w') as f:
+            json.dump(run, f)
+        os.rename(tmp_file, filename)
+
+    def append(self, unit, results):
+        """
+        :param unit: symbol, strategy & block number
+        :param results: (n x 4) array of Sharpe ratio, lookback, entry &
+        exit z score
+        """
+        symbol, strategy, block = unit
+        record = {
+            'symbol': symbol,
+            'strategy': strategy,
+            'block': block,
+            'results': [[_to_json(value) for value in row]
+                        for row in results],
+        }
+        with open(self.filename, 'a') as f:
+            f.write(json.dumps(record) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+    def __iter__(self):
+        """
+        Records of completed units, read one line at a time
+        """
+        if not os.path.exists(self.filename):
+            return
+        with open(self.filename, 'r') as f:
+            for line in f:
+                yield json.loads(line)
+
+    def get_completed_units(self):
+        return set((record['symbol'], record['strategy'], record['block'])
+                   for record in self)
+
+    def _repair(self):
+        """
+        Drop a partly written final line, left if a run was killed while
+        appending, so that the next unit starts on a line of its own. Only
+        the end of the file is read, back to the last complete line.
+        """
+        if not os.path.exists(self.filename):
+            return
+        with open(self.filename, 'rb+') as f:
+            f.seek(0, os.SEEK_END)
+            end = f.tell()
+            if end == 0:
+                return
+            f.seek(end - 1)
+            if f.read(1) == b'\n':
+                return
+
+            position = end
+            while position > 0:
+                start = max(position - _REPAIR_BLOCK_SIZE, 0)
+                f.seek(start)
+                newline = f.read(position - start).rfind(b'\n')
+                if newline >= 0:
+                    position = start + newline + 1
+                    break
+                position = start
+            f.truncate(position)
+        logging.warning('Discarded incomplete result in {}'
+                        .format(self.filename))
+
+
+def run_universe(price_data, directory=RESULTS_DIR,
+                 strategies=sorted(STRATEGIES.keys()),
+                 parameter_count=DEFAULT_PARAMETER_COUNT,
+                 block_size=DEFAULT_BLOCK_SIZE, workers=1):
+    """
+    Run every work unit that is not already in the store
+
+    :param price_data: dictionary of symbol to close prices
+    :param strategies: names of STRATEGIES to run
+    :return: ResultStore
+    """
+    store = ResultStore(directory)
+    parameters = store.load_parameters(parameter_count)
+    store.check_run(block_size, fingerprint_prices(price_data))
+
+    blocks = range(int(math.ceil(len(parameters) / float(block_size))))
+    units = [(symbol, strategy, block)
+             for symbol in sorted(price_data.keys())
+             for strategy in strategies
+             for block in blocks]
+    completed = store.get_completed_units()
+    pending = [unit for unit in units if unit not in completed]
+    logging.info('{} of {} work units already complete'
+                 .format(len(units) - len(pending), len(units)))
+
+    start_time = time.time()
+    report_every = max(len(pending) // 10, 1)
+
+    if workers is None or workers <= 1 or len(pending) <= 1:
+        _init_worker(price_data, parameters, block_size)
+        try:
+            results = (_run_unit(unit) for unit in pending)
+            _store_results(store, results, start_time, report_every)
+        finally:
+            _init_worker(None, None, None)
+    else:
+        pool = multiprocessing.Pool(min(workers, len(pending)),
+                                    initializer=_init_worker,
+                                    initargs=(price_data, parameters,
+                                              block_size))
+        try:
+            _store_results(store, pool.imap_unordered(_run_unit, pending),
+                           start_time, report_every)
+        finally:
+            pool.close()
+            pool.join()
+
+    return store
+
+
+def fingerprint_prices(price_data):
+    """
+    :param price_data: dictionary of symbol to close prices
+    :return: hex digest of the symbols and their prices
+    """
+    digest = hashlib.sha256()
+    for symbol in sorted(price_data.keys()):
+        close = np.ascontiguousarray(price_data[symbol], dtype=np.float64)
+        digest.update('{}:{}:'.format(symbol, len(close)).encode('utf-8'))
+        digest.update(close.tobytes())
+    return digest.hexdigest()
+
+
+def build_leaderboard(store):
+    """
+    Best parameter set for each symbol & strategy, found by streaming
+    through the store
+
+    :return: list of (description, Sharpe ratio), best first
+    """
+    best = {}
+    for record in store:
+        key = (record['symbol'], record['strategy'])
+        for row in record['results']:
+            sharpe_ratio = row[0]
+            if sharpe_ratio is None or math.isinf(sharpe_ratio):
+                continue
+            if key not in best or sharpe_ratio > best[key][0]:
+                best[key] = row
+
+    leaderboard = [('{} {} [lookback={:.0f}, entry_z_score={:.3f}, '
+                    'exit_z_score={:.3f}]'.format(symbol, strategy, *row[1:]),
+                    row[0])
+                   for (symbol, strategy), row in best.items()]
+    return backtest_runner.order_results_desc(leaderboard)
+
+
+def _store_results(store, results, start_time, report_every):
+    for i, (unit, unit_results) in enumerate(results):
+        store.append(unit, unit_results)
+        if (i + 1) % report_every == 0:
+            elapsed = time.time() - start_time
+            logging.info('{} work units in {:.1f}s ({:.1f}/s)'
+                         .format(i + 1, elapsed, (i + 1) / max(elapsed, 1e-9)))
+
+
+def _init_worker(price_data, parameters, block_size):
+    global _price_data, _parameters, _block_size
+    _price_data = price_data
+    _parameters = parameters
+    _block_size = block_size
+
+
+def _run_unit(unit):
+    symbol, strategy, block = unit
+    parameters = _parameters[block * _block_size:(block + 1) * _block_size]
+
+    backtest = STRATEGIES[strategy]()
+    sharpe_ratios = backtest.evaluate_parameters(_price_data[symbol],
+                                                 parameters)
+    return unit, np.column_stack((sharpe_ratios, parameters))
+
+
+def _to_json(value):
+    # JSON has no NaN, so invalid parameter sets are stored as null
+    value = float(value)
+    return None if np.isnan(value) else value
+
+
+def main():
+    symbols = data_loader.load_symbol_list(data_sources.SP_500_2012)
+    start = utils.create_date('2012-01-01')
+    end = utils.create_date('2012-12-31')
+
+    report = data_loader.LoadReport()
+    symbol_data = data_loader.load_price_data(
+        data_sources.DATA_DIR, symbols, workers=multiprocessing.cpu_count(),
+        report=report)
+    if len(report) > 0:
+        logging.warning('Skipping symbols which failed to load:\n{}'
+                        .format(report))
+
+    loaded = sorted(symbol_data.keys())
+    price_panel = PricePanel.from_price_data(symbol_data, loaded)
+    close_price_data = price_panel.get_price_data_np(loaded, 'Adj Close',
+                                                     start, end)
+    price_data = {}
+    for symbol, close in close_price_data.items():
+        # Dates before listing are NaN
+        close = close[~np.isnan(close)]
+        if len(close) > 0:
+            price_data[symbol] = close
+
+    store = run_universe(price_data, workers=multiprocessing.cpu_count())
+    backtest_runner.display_results(build_leaderboard(store))
+
+
+if __name__ == '__main__':
+    init_logger.setup()
+    main()
@@ -0,0 +1,223 @@
+"""
+Walk-forward optimisation of SharpeBacktest strategies.
+
+The price history is split into rolling windows, each a train period
+followed by a test period. Parameters are chosen by the best in-sample
+Sharpe ratio over a grid of lookbacks and z scores in the train period, and
+are then traded over the following test period. The out-of-sample returns
+of the test periods, which do not overlap, are stitched together to judge
+the strategy.
+
+Windows are spread across a pool of processes. The prices are handed to
+each worker once, when the pool starts, and moving averages are taken over
+the whole history and sliced for each window, so overlapping windows share
+the indicators cached in each worker.
+"""
+
+import logging
+import multiprocessing
+
+import numpy as np
+import pandas as pd
+
+import backtester
+import data_loader
+import data_sources
+import init_logger
+from price_panel import PricePanel
+
+
+TRAIN_SIZE = 252
+TEST_SIZE = 63
+
+LOOKBACKS = np.arange(5, 95, 5)
+ENTRY_Z_SCORES = np.linspace(0.25, 4., 16)
+EXIT_Z_SCORES = np.linspace(-3., 1., 17)
+
+PARAMETERS = ['lookback', 'entry_z_score', 'exit_z_score']
+
+# Set in each worker by _init_worker
+_close = None
+_backtest = None
+_grid = None
+
+
+class WalkForwardResult(object):
+    def __init__(self, windows, parameters, in_sample_sharpe_ratios,
+                 out_of_sample_returns):
+        """
+        :param windows: (n x 3) array of train start, test start & test end
+        indices
+        :param parameters: (n x 3) array of the lookback, entry & exit z
+        score chosen in each window, NaN where none were valid
+        :param out_of_sample_returns: list of the returns of each test period
+        """
+        self.windows = windows
+        self.parameters = parameters
+        self.in_sample_sharpe_ratios = in_sample_sharpe_ratios
+        self.out_of_sample_returns = out_of_sample_returns
+        self.returns = np.concatenate(out_of_sample_returns) \
+            if len(out_of_sample_returns) > 0 else np.array([])
+
+    @property
+    def sharpe_ratio(self):
+        """
+        Annualised Sharpe ratio of the stitched out-of-sample returns
+        """
+        return backtester._calculate_sharpe_ratio(self.returns)
+
+    @property
+    def max_drawdown(self):
+        """
+        Largest fall from a peak in the cumulative out-of-sample returns
+        """
+        if len(self.returns) == 0:
+            return 0.
+        cumulative = np.cumsum(self.returns)
+        peaks = np.maximum.accumulate(np.maximum(cumulative, 0.))
+        return (peaks - cumulative).max()
+
+    def parameter_stability(self):
+        """
+        :return: DataFrame of the mean and standard deviation of each chosen
+        parameter, and the fraction of windows in which it changed from the
+        previous window
+        """
+        parameters = self.parameters[~np.isnan(self.parameters).any(axis=1)]
+        if len(parameters) > 1:
+            changes = (np.diff(parameters, axis=0) != 0).mean(axis=0)
+        else:
+            changes = np.zeros(len(PARAMETERS))
+        return pd.DataFrame({'mean': parameters.mean(axis=0),
+                             'std': parameters.std(axis=0),
+                             'changes': changes},
+                            index=PARAMETERS,
+                            columns=['mean', 'std', 'changes'])
+
+    def to_frame(self):
+        """
+        :return: DataFrame with a row for each window
+        """
+        df = pd.DataFrame(self.windows,
+                          columns=['train_start', 'test_start', 'test_end'])
+        for i, name in enumerate(PARAMETERS):
+            df[name] = self.parameters[:, i]
+        df['in_sample_sharpe'] = self.in_sample_sharpe_ratios
+        df['out_of_sample_sharpe'] = [
+            backtester._calculate_sharpe_ratio(returns)
+            for returns in self.out_of_sample_returns]
+        return df
+
+
+def get_windows(length, train_size=TRAIN_SIZE, test_size=TEST_SIZE):
+    """
+    Rolling windows over length prices, moved forward by test_size so that
+    the test periods are contiguous and do not overlap. Any remainder
+    shorter than test_size at the end is not tested.
+
+    :return: (n x 3) array of train start, test start & test end indices
+    """
+    test_starts = np.arange(train_size, length - test_size + 1, test_size)
+    return np.column_stack((test_starts - train_size, test_starts,
+                            test_starts + test_size)).astype(int)
+
+
+def walk_forward(close, train_size=TRAIN_SIZE, test_size=TEST_SIZE,
+                 lookbacks=LOOKBACKS, entry_z_scores=ENTRY_Z_SCORES,
+                 exit_z_scores=EXIT_Z_SCORES,
+                 backtest_class=backtester.MovingAverageBacktest, workers=1):
+    """
+    :param close: full price history
+    :param backtest_class: SharpeBacktest with a grid evaluation, created
+    with its default arguments
+    :return: WalkForwardResult
+    """
+    close = np.asarray(close, dtype=np.float64)
+    windows = get_windows(len(close), train_size, test_size)
+    grid = (np.asarray(lookbacks), np.asarray(entry_z_scores, dtype=float),
+            np.asarray(exit_z_scores, dtype=float))
+
+    if workers is None or workers <= 1 or len(windows) <= 1:
+        _init_worker(close, backtest_class, grid)
+        try:
+            results = [_run_window(window) for window in windows]
+        finally:
+            _init_worker(None, None, None)
+    else:
+        pool = multiprocessing.Pool(min(workers, len(windows)),
+                                    initializer=_init_worker,
+                                    initargs=(close, backtest_class, grid))
+        try:
+            results = pool.map(_run_window, windows)
+        finally:
+            pool.close()
+            pool.join()
+
+    parameters = np.array([result[0] for result in results]) \
+        .reshape(len(windows), len(PARAMETERS))
+    in_sample = np.array([result[1] for result in results])
+    return WalkForwardResult(windows, parameters, in_sample,
+                             [result[2] for result in results])
+
+
+def _init_worker(close, backtest_class, grid):
+    global _close, _backtest, _grid
+    _close = close
+    _backtest = backtest_class() if backtest_class is not None else None
+    _grid = grid
+
+
+def _run_window(window):
+    train_start, test_start, test_end = window
+    lookbacks, entry_z_scores, exit_z_scores = _grid
+
+    best = (np.zeros(len(PARAMETERS)) + np.NAN, np.NAN)
+    for lookback in lookbacks:
+        surface = _backtest.evaluate_grid(_close, lookback, entry_z_scores,
+                                          exit_z_scores, start=train_start,
+                                          end=test_start)
+        if np.isnan(surface).all():
+            continue
+        i, j = np.unravel_index(np.nanargmax(surface), surface.shape)
+        if np.isnan(best[1]) or surface[i, j] > best[1]:
+            best = (np.array([lookback, entry_z_scores[i], exit_z_scores[j]]),
+                    surface[i, j])
+
+    parameters, sharpe_ratio = best
+    if np.isnan(sharpe_ratio):
+        logging.warning('No valid parameters for window {}'.format(window))
+        # Stay out of the market
+        returns = np.zeros(test_end - test_start)
+    else:
+        lookback, entry_z_score, exit_z_score = parameters
+        returns = _backtest.calculate_returns(
+            _close, int(lookback), [entry_z_score], [exit_z_score],
+            start=test_start, end=test_end)[0]
+
+    return parameters, sharpe_ratio, returns
+
+
+def main():
+    symbols = ['ACN']
+
+    symbol_data = data_loader.load_price_data(data_sources.DATA_DIR, symbols)
+    price_panel = PricePanel.from_price_data(symbol_data, symbols)
+    close_price_data = price_panel.get_price_data_np(symbols, 'Adj Close')
+
+    for symbol in symbols:
+        close = close_price_data[symbol]
+        # Dates before listing are NaN
+        close = close[~np.isnan(close)]
+        result = walk_forward(close,
+                              workers=multiprocessing.cpu_count())
+        logging.info('{}: out-of-sample Sharpe ratio={}, max drawdown={}'
+                     .format(symbol, result.sharpe_ratio,
+                             result.max_drawdown))
+        logging.info('Windows:\n{}'.format(result.to_frame()))
+        logging.info('Parameter stability:\n{}'
+                     .format(result.parameter_stability()))
+
+
+if __name__ == '__main__':
+    init_logger.setup()
+    main()
@@ -0,0 +1,58 @@
+"""
+Per contract cost of pricing 100k options with Option objects against a
+single call to calc_option_values
+"""
+
+import timeit
+
+import numpy as np
+
+from datatypes import OptionType
+import option
+
+
+CONTRACTS = 100000
+# Option objects are slow, so are timed on a sample and scaled up
+SAMPLE = 5000
+REPEAT = 3
+
+
+def main():
+    types, strikes, underlying, sigmas, days = generate_contracts(CONTRACTS)
+
+    def objects():
+        for i in range(SAMPLE):
+            opt = option.Option(types[i], strikes[i], underlying[i],
+                                sigmas[i], days[i], risk_free_rate=0.01)
+            (opt.price, opt.delta, opt.gamma, opt.vega, opt.theta, opt.rho)
+
+    def vectorised():
+        option.calc_option_values(types, strikes, underlying, sigmas, days,
+                                  risk_free_rate=0.01)
+
+    object_time = _time(objects) / SAMPLE
+    vectorised_time = _time(vectorised) / CONTRACTS
+
+    print('{:>12} {:>16}'.format('Method', 'Per contract (us)'))
+    print('{:>12} {:>16.3f}'.format('Option', object_time * 1e6))
+    print('{:>12} {:>16.3f}'.format('Vectorised', vectorised_time * 1e6))
+    print('Speed-up: {:.0f}x'.format(object_time / vectorised_time))
+
+
+def generate_contracts(count):
+    random = np.random.RandomState(1)
+    types = np.where(random.rand(count) < 0.5, OptionType.CALL,
+                     OptionType.PUT)
+    underlying = np.full(count, 100.0)
+    strikes = np.round(random.uniform(50.0, 150.0, count))
+    sigmas = random.uniform(0.1, 0.8, count)
+    days = random.uniform(1.0, 500.0, count) / 365.0
+    return types, strikes, underlying, sigmas, days
+
+
+def _time(func):
+    return min(timeit.repeat(func, number=1, repeat=REPEAT))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""
+ITM probabilities for a ladder of strikes, comparing every simulated price
+against each strike, against a binary search of the sorted prices
+"""
+
+import timeit
+
+import numpy as np
+
+from option import OptionType
+import price_series
+
+
+PRICE = 70.0
+SIGMA = 3.5
+PERIODS = 100
+SIMULATIONS = 100000
+STRIKES = np.arange(50., 90., 0.1)
+REPEAT = 3
+
+
+def main():
+    final_prices = price_series.generate_paths(
+        SIMULATIONS, PERIODS, PRICE, SIGMA, dt=1.0,
+        model=price_series.Model.ABM, terminal_only=True,
+        random_state=np.random.RandomState(1))
+
+    def per_strike():
+        return np.array([(final_prices < strike).sum() / float(SIMULATIONS)
+                         for strike in STRIKES])
+
+    def sorted_search():
+        cdf = price_series.EmpiricalCDF(final_prices)
+        return cdf.itm_probability(STRIKES, OptionType.PUT)
+
+    np.testing.assert_array_equal(per_strike(), sorted_search())
+
+    per_strike_time = _time(per_strike)
+    sorted_time = _time(sorted_search)
+
+    print('{} simulations, {} strikes'.format(SIMULATIONS, len(STRIKES)))
+    print('{:>14} {:>10}'.format('Method', 'Time (ms)'))
+    print('{:>14} {:>10.2f}'.format('Per strike', per_strike_time * 1e3))
+    print('{:>14} {:>10.2f}'.format('Sorted search', sorted_time * 1e3))
+    print('Speed-up: {:.0f}x'.format(per_strike_time / sorted_time))
+
+
+def _time(func):
+    return min(timeit.repeat(func, number=1, repeat=REPEAT))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""
+Time to aggregate the greeks of a simulated book of 100k legs across
+500 underlyings
+"""
+
+import timeit
+
+import numpy as np
+import pandas as pd
+
+import risk_slide as rs
+
+
+LEGS = 100000
+UNDERLYINGS = 500
+REPEAT = 3
+
+
+def main():
+    positions, market_data = generate_book(LEGS, UNDERLYINGS)
+
+    elapsed = min(timeit.repeat(
+        lambda: rs.aggregate(positions, market_data, 0.01, spot_shift=-0.05),
+        number=1, repeat=REPEAT))
+
+    print('{} legs, {} underlyings: {:.1f} ms ({:.2f} us per leg)'.format(
+        LEGS, UNDERLYINGS, elapsed * 1000., elapsed * 1e6 / LEGS))
+
+
+def generate_book(legs, underlyings):
+    random = np.random.RandomState(1)
+    names = np.array(['U{:04d}'.format(i) for i in range(underlyings)])
+    spots = random.uniform(10.0, 500.0, underlyings)
+    market_data = pd.DataFrame(
+        {'Spot': spots, 'Sigma': random.uniform(0.1, 0.6, underlyings)},
+        index=pd.Index(names, name='Underlying'))
+
+    codes = random.randint(0, underlyings, legs)
+    types = np.array(['C', 'P', 'S'])[random.randint(0, 3, legs)]
+    strikes = np.round(spots[codes] * random.uniform(0.7, 1.3, legs))
+    quantities = random.randint(-50, 50, legs)
+    expiries = random.randint(1, 730, legs) / 365.0
+
+    positions = rs.Positions(strikes, types, quantities, names[codes],
+                             expiries)
+    return positions, market_data
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""
+Compares the rolling window estimators against the per-window loop they
+replaced, on 10 years of simulated daily prices
+"""
+
+import timeit
+
+import numpy as np
+from numpy import log, sqrt
+
+import utils
+import volatility_models as vm
+
+
+DAYS = 252 * 10
+LOOKBACKS = [10, 20, 30, 60, 120, 250]
+REPEAT = 3
+
+
+def main():
+    close, open, high, low = generate_prices(DAYS)
+
+    print('{:>8} {:>12} {:>12} {:>12} {:>10}'.format(
+        'Lookback', 'Estimator', 'Loop (ms)', 'Vector (ms)', 'Speed-up'))
+
+    for lookback in LOOKBACKS:
+        for name, loop, vectorised in [
+            ('std_dev',
+             lambda: loop_population_std_dev(close, lookback),
+             lambda: vm.population_std_dev(close, lookback)),
+            ('yang_zhang',
+             lambda: loop_yang_zhang_std_dev(close, open, high, low,
+                                             lookback),
+             lambda: vm.yang_zhang_std_dev(close, open, high, low,
+                                           lookback))]:
+
+            loop_time = _time(loop)
+            vectorised_time = _time(vectorised)
+            print('{:>8} {:>12} {:>12.2f} {:>12.2f} {:>9.0f}x'.format(
+                lookback, name, loop_time * 1000., vectorised_time * 1000.,
+                loop_time / vectorised_time))
+
+
+def generate_prices(days, sigma=0.01):
+    random = np.random.RandomState(1)
+    close = 100.0 * np.exp(np.cumsum(random.normal(0, sigma, days)))
+    open = close * np.exp(random.normal(0, sigma / 4., days))
+    high = np.maximum(open, close) * \
+        np.exp(np.abs(random.normal(0, sigma / 2., days)))
+    low = np.minimum(open, close) * \
+        np.exp(-np.abs(random.normal(0, sigma / 2., days)))
+    return close, open, high, low
+
+
+def _time(func):
+    return min(timeit.repeat(func, number=1, repeat=REPEAT))
+
+
+def loop_population_std_dev(close_prices, lookback):
+    N = float(lookback)
+
+    prices = log(close_prices / utils.lag(close_prices))
+    results = np.zeros(np.size(prices))
+    results[:] = np.NAN
+    for i in range(lookback, len(prices)):
+        bounds = range(i-(lookback-1), i+1)
+        results[i] = sqrt(
+            ((prices[bounds] - prices[bounds].sum() / N)**2).sum() / (N - 1))
+    return vm.annualise(results)
+
+
+def loop_yang_zhang_std_dev(close_prices, open_prices, high_prices,
+                            low_prices, lookback):
+    N = float(lookback)
+
+    k = 0.34 / (1.34 + ((N + 1) / (N - 1)))
+
+    logOC = log(open_prices / utils.lag(close_prices))
+    logCO = log(close_prices / open_prices)
+    logHC = log(high_prices / close_prices)
+    logHO = log(high_prices / open_prices)
+    logLC = log(low_prices / close_prices)
+    logLO = log(low_prices / open_prices)
+
+    results = np.zeros(np.size(close_prices))
+    results[:] = np.NAN
+
+    for i in range(lookback, len(results)):
+        bounds = range(i - (lookback - 1), i + 1)
+        open_var = ((logOC[bounds] - (logOC[bounds].sum() / N))**2).sum() / \
+                   (N - 1)
+        close_var = ((logCO[bounds] - (logCO[bounds].sum() / N))**2).sum() / \
+                    (N - 1)
+        rs_var = ((logHC[bounds] * logHO[bounds]) +
+                  (logLC[bounds] * logLO[bounds])).sum() / N
+
+        results[i] = sqrt(open_var + k * close_var + (1 - k) * rs_var)
+
+    return vm.annualise(results)
+
+
+if __name__ == '__main__':
+    main()
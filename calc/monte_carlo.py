@@ -0,0 +1,264 @@
+"""
+Chunked Monte Carlo simulation with streaming statistics.
+
+Paths are generated by price_series.generate_paths in blocks of at most
+block_size paths. Each block is passed to a set of accumulators, which keep
+only summary state (counts, running means & variances, a bounded quantile
+sketch), and is then discarded. Peak memory therefore depends on the block
+size rather than the total number of paths.
+
+Blocks consume the random stream in the same order as a single call to
+generate_paths, so with the same seed the counts, means & variances match
+those of the in-memory simulation.
+
+Simulations can also be spread across a pool of processes with
+run_parallel. Work is split into fixed tasks, each drawing from its own
+RandomState seeded by hashing a master seed with the task number, so
+results are reproducible and independent of the number of workers.
+"""
+
+import hashlib
+import multiprocessing
+
+import numpy as np
+
+from option import OptionType
+import price_series as ps
+
+
+DEFAULT_BLOCK_SIZE = 100000
+
+
+class RunningStats(object):
+    """
+    Count, mean and variance along the first axis of each block, combined
+    across blocks with Chan's parallel update. Paths x steps blocks give the
+    statistics of each step.
+    """
+    def __init__(self):
+        self.count = 0
+        self._mean = 0.
+        self._m2 = 0.
+
+    def update(self, values):
+        values = np.asarray(values)
+        count = len(values)
+        if count == 0:
+            return
+
+        mean = values.mean(axis=0, dtype=np.float64)
+        m2 = ((values - mean)**2).sum(axis=0, dtype=np.float64)
+
+        total = self.count + count
+        delta = mean - self._mean
+        self._mean = self._mean + delta * (count / float(total))
+        self._m2 = self._m2 + m2 + \
+            delta**2 * (self.count * count / float(total))
+        self.count = total
+
+    @property
+    def mean(self):
+        if self.count == 0:
+            return np.NAN
+        return self._mean
+
+    @property
+    def variance(self):
+        """
+        Unbiased variance
+        """
+        if self.count < 2:
+            return np.NAN
+        return self._m2 / (self.count - 1)
+
+    @property
+    def std_error(self):
+        return np.sqrt(self.variance / self.count)
+
+
+class ThresholdCounts(object):
+    """
+    Number of values strictly above and below each threshold, ignoring NaN
+    """
+    def __init__(self, thresholds):
+        self.thresholds = np.asarray(thresholds, dtype=np.float64)
+        self.count = 0
+        self.above = np.zeros(self.thresholds.shape, dtype=np.int64)
+        self.below = np.zeros(self.thresholds.shape, dtype=np.int64)
+
+    def update(self, values):
+        cdf = ps.EmpiricalCDF(values)
+        self.count += len(cdf)
+        self.below += cdf.count_below(self.thresholds)
+        self.above += cdf.count_above(self.thresholds)
+
+    def merge(self, other):
+        self.count += other.count
+        self.above += other.above
+        self.below += other.below
+
+    def probability_above(self):
+        return self.above / float(self.count)
+
+    def probability_below(self):
+        return self.below / float(self.count)
+
+
+class QuantileSketch(object):
+    """
+    Approximate quantiles from a bounded summary of at most size weighted
+    points. When the summary grows beyond size it is compacted to points at
+    evenly spaced ranks, so the rank error of a quantile is of the order of
+    1 / size. The minimum and maximum are exact.
+    """
+    def __init__(self, size=10000):
+        self.size = size
+        self.count = 0
+        self.minimum = np.NAN
+        self.maximum = np.NAN
+        self._values = np.array([])
+        self._weights = np.array([])
+
+    def update(self, values):
+        values = np.ravel(values).astype(np.float64)
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return
+
+        self.count += len(values)
+        self.minimum = np.fmin(self.minimum, values.min())
+        self.maximum = np.fmax(self.maximum, values.max())
+
+        weights = np.concatenate((self._weights, np.ones(len(values))))
+        values = np.concatenate((self._values, values))
+        order = np.argsort(values, kind='mergesort')
+        self._values = values[order]
+        self._weights = weights[order]
+
+        if len(self._values) > self.size:
+            self._compact()
+
+    def _compact(self):
+        total = self._weights.sum()
+        ranks = (np.arange(self.size) + 0.5) * (total / self.size)
+        idx = np.searchsorted(np.cumsum(self._weights), ranks)
+        self._values = self._values[np.minimum(idx, len(self._values) - 1)]
+        self._weights = np.zeros(self.size) + total / self.size
+
+    def quantile(self, q):
+        """
+        :param q: quantile or array of quantiles between 0 and 1
+        """
+        if self.count == 0:
+            return np.zeros(np.shape(q)) + np.NAN
+        # Rank of the centre of each point's weight
+        ranks = np.cumsum(self._weights) - self._weights / 2.
+        return np.interp(np.asarray(q) * self._weights.sum(),
+                         np.concatenate(([0.], ranks,
+                                         [self._weights.sum()])),
+                         np.concatenate(([self.minimum], self._values,
+                                         [self.maximum])))
+
+
+def simulate(paths, steps, start_price, sigma, accumulators,
+             observe=None, block_size=DEFAULT_BLOCK_SIZE, **kwargs):
+    """
+    Generate paths in blocks, passing each block to every accumulator
+
+    :param accumulators: objects with an update(values) method
+    :param observe: function applied to each block before it is passed to
+    the accumulators, e.g. to take the maximum of each path
+    :param kwargs: further arguments to price_series.generate_paths, e.g.
+    terminal_only=True when only final prices are needed
+    :return: accumulators
+    """
+    for start in range(0, paths, block_size):
+        block = ps.generate_paths(min(block_size, paths - start), steps,
+                                  start_price, sigma, **kwargs)
+        if observe is not None:
+            block = observe(block)
+        for accumulator in accumulators:
+            accumulator.update(block)
+
+    return accumulators
+
+
+def derive_seed(seed, stream):
+    """
+    Seed for an independent random stream, from a master seed and the
+    stream number
+    """
+    digest = hashlib.sha256('{}:{}'.format(seed, stream).encode('utf-8'))
+    return np.frombuffer(digest.digest(), dtype=np.uint32).copy()
+
+
+def spawn_random_states(seed, count):
+    return [np.random.RandomState(derive_seed(seed, i)) for i in range(count)]
+
+
+def run_parallel(func, tasks, seed, workers=1):
+    """
+    Call func(random_state, *task) for each task, across a pool of worker
+    processes if more than one worker is requested. Each task has its own
+    random stream derived from seed, so the results do not depend on the
+    number of workers or the order in which tasks complete.
+
+    :param func: module level function, so it can be sent to the workers
+    :return: results in task order
+    """
+    work = [(func, task, derive_seed(seed, i)) for i, task in enumerate(tasks)]
+
+    if workers is None or workers <= 1 or len(work) <= 1:
+        return [_run_task(item) for item in work]
+
+    pool = multiprocessing.Pool(min(workers, len(work)))
+    try:
+        return pool.map(_run_task, work)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def _run_task(item):
+    func, task, seed = item
+    return func(np.random.RandomState(seed), *task)
+
+
+def calc_itm_probability(strikes, price, sigma, periods, simulation_count,
+                         type, block_size=DEFAULT_BLOCK_SIZE, seed=None,
+                         workers=1):
+    """
+    Chunked equivalent of price_series.calc_itm_probability without
+    variance reduction, with memory bounded by block_size rather than
+    simulation_count
+
+    :param seed: if provided, blocks are run as tasks across workers with
+    random streams derived from seed, otherwise the global numpy random
+    state is used
+    """
+    if seed is None:
+        counts = _itm_counts(None, strikes, price, sigma, periods,
+                             simulation_count, block_size)
+    else:
+        tasks = [(strikes, price, sigma, periods,
+                  min(block_size, simulation_count - start), block_size)
+                 for start in range(0, simulation_count, block_size)]
+        counts = ThresholdCounts(strikes)
+        for result in run_parallel(_itm_counts, tasks, seed, workers):
+            counts.merge(result)
+
+    if type == OptionType.CALL:
+        probabilities = counts.probability_above()
+    else:
+        probabilities = counts.probability_below()
+    std_error = ps.binomial_std_error(probabilities, counts.count)
+    return np.column_stack((strikes, probabilities, std_error))
+
+
+def _itm_counts(random_state, strikes, price, sigma, periods,
+                simulation_count, block_size):
+    counts = ThresholdCounts(strikes)
+    simulate(simulation_count, periods, price, sigma, [counts],
+             block_size=block_size, dt=1.0, model=ps.Model.ABM,
+             terminal_only=True, random_state=random_state)
+    return counts
@@ -18,16 +18,16 @@ def main():
 def aapl_first_exit():
     aapl_intraday_prices = get_intraday_data()
     aapl_returns = vm.intraday_returns(aapl_intraday_prices)
+    boundaries = vm.day_boundaries(aapl_intraday_prices)
     day_count = len(aapl_intraday_prices)
     print(day_count)
-    first_exit_vol = vm.first_exit(aapl_returns, 0.01, 20, day_count)
+    first_exit_vol = vm.first_exit(aapl_returns, 0.01, 20, day_count,
+                                   boundaries=boundaries)
     print(first_exit_vol)
 
     close_prices = get_close_prices(aapl_intraday_prices)
     rolling_std = pd.rolling_std(aapl_returns, window=391 * 20) * np.sqrt(252.0)
-    std_dev = []
-    for i in range(0, len(rolling_std), 391):
-        std_dev.append(rolling_std[i:i+391].mean())
+    std_dev = daily_mean(rolling_std, boundaries)
     print(std_dev)
 
     plot(close_prices, first_exit_vol, std_dev)
@@ -49,15 +49,19 @@ def random_first_exit():
 
     # TODO: Implement a resampling parameter?
     rolling_std = pd.rolling_std(intraday_returns, window=391 * 20) * np.sqrt(252.0)
-    std_dev = []
-    for i in range(0, len(rolling_std), 391):
-        std_dev.append(rolling_std[i:i+391].mean())
+    boundaries = np.arange(0, 391 * (day_count + 1), 391)
+    std_dev = daily_mean(rolling_std, boundaries)
 
     plot(intraday_returns,
          first_exit_vol,
          std_dev)
 
 
+def daily_mean(values, boundaries):
+    with np.errstate(invalid='ignore'):
+        return np.nanmean(vm._by_day(np.asarray(values), boundaries), axis=1)
+
+
 def plot(close_prices, first_exit_vol, std_dev):
 
     fig = plt.figure()
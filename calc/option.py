@@ -1,6 +1,7 @@
-import math
-from math import exp, log, pi, sqrt
+from collections import namedtuple
+from math import pi, sqrt
 
+import numpy as np
 from scipy.stats import norm as N
 from scipy import optimize
 
@@ -21,135 +22,259 @@ class Option(object):
         self.sigma = float(sigma)
         self.t = float(start_time)
 
-        self._d1 = None
-        self._d2 = None
-        self._price = None
-
-        self._delta = None
-        self._theta = None
-        self._vega = None
-        self._gamma = None
-        self._rho = None
+        self._values = None
 
+    @property
+    def values(self):
+        """
+        Price and greeks, which are calculated together on first access
+        """
+        if self._values is None:
+            values = calc_option_values(self.type, self.K, self.S, self.sigma,
+                                        self.T, self.t, self.r, self.q)
+            self._values = OptionValues(*[float(value) for value in values])
+        return self._values
 
     @property
     def price(self):
-        if self._price is None:
-            if self.q != 0.0:
-                if self.type == OptionType.CALL:
-                    self._price = self._call_price_with_dividends()
-                elif self.type == OptionType.PUT:
-                    self._price = self._put_price_with_dividends()
-            else:
-                if self.type == OptionType.CALL:
-                    self._price = self._call_price_no_dividends()
-                elif self.type == OptionType.PUT:
-                    self._price = self._put_price_with_dividends()
-
-        return self._price
-
-    def _call_price_with_dividends(self):
-        return self.S * exp(-self.q * (self.T - self.t)) * N.cdf(self.d1) - \
-            self.K * exp(-self.r * (self.T - self.t)) * N.cdf(self.d2)
-
-    def _put_price_with_dividends(self):
-        return self.K * exp(-self.r * (self.T - self.t)) * N.cdf(-self.d2) - \
-            self.S * math.exp(-self.q * (self.T - self.t)) * N.cdf(-self.d1)
-
-    def _call_price_no_dividends(self):
-        return self.S * N.cdf(self.d1) - \
-            self.K * exp(-self.r * (self.T - self.t)) * N.cdf(self.d2)
-
-    def _put_price_no_dividends(self):
-        return self.K * exp(-self.r * (self.T - self.t)) * N.cdf(-self.d2) - \
-            self.S * N.cdf(-self.d1)
-
+        return self.values.price
 
     @property
     def d1(self):
-        if self._d1 is None:
-            try:
-                self._d1 = (log(self.S / self.K) +
-                        (self.r - self.q + (self.sigma ** 2) / 2) *
-                        (self.T - self.t)) / \
-                    (self.sigma * sqrt(self.T - self.t))
-            except ZeroDivisionError:
-                self._d1 = 0
-        return self._d1
+        return self.values.d1
 
     @property
     def d2(self):
-        if self._d2 is None:
-            self._d2 = self.d1 - self.sigma * sqrt(self.T - self.t)
-        return self._d2
+        return self.values.d2
 
     @property
     def delta(self):
-        if self._delta is None:
-            if self.type == OptionType.CALL:
-                self._delta = self._delta_call()
-            elif self.type == OptionType.PUT:
-                self._delta = self._delta_put()
-        return self._delta
-
-    def _delta_call(self):
-        return exp(-self.q * self.T) * N.cdf(self.d1)
-        # return N.cdf(self.d1)
-
-    def _delta_put(self):
-        return -exp(-self.q * self.T) * N.cdf(-self.d1)
-        # return N.cdf(-self.d1)
+        return self.values.delta
 
     @property
     def gamma(self):
-        if self._gamma is None:
-            self._gamma = (exp(-self.q * self.T) /
-                           (self.S * self.sigma * sqrt(self.T))) * \
-                          ((1 / sqrt(2 * pi)) * exp(-self.d1**2 / 2))
-        return self._gamma
+        return self.values.gamma
 
     @property
     def rho(self):
-        if self._rho is None:
-            if self.type == OptionType.CALL:
-                self._rho = self._rho_call()
-            elif self.type == OptionType.PUT:
-                self._rho = self._rho_put()
-        return self._rho
-
-    def _rho_call(self):
-        return self.K * self.T * exp(-self.r * self.T) * N.cdf(self.d2)
-
-    def _rho_put(self):
-        return -self.K * self.T * exp(-self.r * self.T) * N.cdf(-self.d2)
+        return self.values.rho
 
     @property
     def theta(self):
-        if self._theta is None:
-            if self.type == OptionType.CALL:
-                self._theta = self._theta_call()
-            elif self.type == OptionType.PUT:
-                self._theta = self._theta_put()
-        return self._theta
-
-    def _theta_call(self):
-        return - ((self.S * self.sigma * exp(-self.q * self.T)) /
-                  (2 * sqrt(2 * pi * self.T))) * exp(-self.d1**2 / 2) + \
-               self.q * self.S * exp(-self.q * self.T) * N.cdf(self.d1) - \
-               self.r * self.K * exp(-self.r * self.T) * N.cdf(self.d2)
-
-    def _theta_put(self):
-        return - ((self.S * self.sigma * exp(-self.q * self.T)) /
-                  (2 * sqrt(2 * pi * self.T))) * exp(-self.d1**2 / 2) - \
-               self.q * self.S * exp(-self.q * self.T) * N.cdf(-self.d1) + \
-               self.r * self.K * exp(-self.r * self.T) * N.cdf(-self.d2)
+        return self.values.theta
 
     @property
     def vega(self):
-        if self._vega is None:
-            self._vega = self.S * exp(-self.q * self.T) * sqrt(self.T) * \
-                ((1 / sqrt(2 * pi)) * exp(-self.d1**2 / 2))
-        return self._vega
+        return self.values.vega
+
+
+OptionValues = namedtuple('OptionValues', ['price', 'delta', 'gamma', 'vega',
+                                           'theta', 'rho', 'd1', 'd2'])
+
+
+def calc_option_values(type, strike_price, underlying_price, sigma,
+                       days_to_expiry, start_time=0.0, risk_free_rate=0.0,
+                       dividend_rate=0.0):
+    """
+    Prices and greeks for arrays of options, using the same formulae as
+    Option. All arguments are broadcast against each other, so a chain can
+    be priced with arrays of types and strikes against a scalar underlying.
+
+    d1, d2 and the normal pdf & cdf terms are calculated once per option
+    and shared by all of the outputs.
+
+    :param type: OptionType.CALL or OptionType.PUT, or an array of these
+    :return: OptionValues of arrays in the broadcast shape of the inputs
+    """
+    K = np.asarray(strike_price, dtype=np.float64)
+    S = np.asarray(underlying_price, dtype=np.float64)
+    T = np.asarray(days_to_expiry, dtype=np.float64)
+    q = np.asarray(dividend_rate, dtype=np.float64)
+    r = np.asarray(risk_free_rate, dtype=np.float64)
+    sigma = np.asarray(sigma, dtype=np.float64)
+    t = np.asarray(start_time, dtype=np.float64)
+
+    sign = _sign(type)
+
+    time_remaining = T - t
+    d1, d2 = _d1_d2(S, K, sigma, time_remaining, r, q)
+
+    cdf_d1 = N.cdf(sign * d1)
+    cdf_d2 = N.cdf(sign * d2)
+    pdf_d1 = _pdf(d1)
+
+    dividend_discount = np.exp(-q * T)
+    rate_discount = np.exp(-r * T)
+
+    price = _price(sign, S, K, time_remaining, r, q, cdf_d1, cdf_d2)
+    delta = sign * dividend_discount * cdf_d1
+    with np.errstate(divide='ignore', invalid='ignore'):
+        gamma = (dividend_discount / (S * sigma * np.sqrt(T))) * pdf_d1
+    vega = S * dividend_discount * np.sqrt(T) * pdf_d1
+    theta = -((S * sigma * dividend_discount) / (2 * np.sqrt(T))) * pdf_d1 + \
+        sign * (q * S * dividend_discount * cdf_d1 -
+                r * K * rate_discount * cdf_d2)
+    rho = sign * K * T * rate_discount * cdf_d2
+
+    return OptionValues(price, delta, gamma, vega, theta, rho, d1, d2)
+
+
+def _sign(type):
+    # +1 for calls, -1 for puts, so each put formula is the negated call
+    # formula with the signs of d1 & d2 flipped
+    return np.where(np.asarray(type) == OptionType.CALL, 1., -1.)
+
+
+def _d1_d2(S, K, sigma, time_remaining, r, q):
+    sigma_sqrt_time = sigma * np.sqrt(time_remaining)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        d1 = (np.log(S / K) + (r - q + (sigma ** 2) / 2) * time_remaining) / \
+            sigma_sqrt_time
+    d1 = np.where(sigma_sqrt_time == 0, 0., d1)
+    return d1, d1 - sigma_sqrt_time
+
+
+def _pdf(d):
+    return (1 / sqrt(2 * pi)) * np.exp(-d**2 / 2)
+
+
+def _price(sign, S, K, time_remaining, r, q, cdf_d1, cdf_d2):
+    return sign * (S * np.exp(-q * time_remaining) * cdf_d1 -
+                   K * np.exp(-r * time_remaining) * cdf_d2)
+
+
+class SolverStatus(object):
+    CONVERGED = 0
+    # No volatility gives a price this low, i.e. it is at or below the
+    # discounted intrinsic value
+    BELOW_INTRINSIC = 1
+    # The price requires a volatility above the upper bound of the search
+    ABOVE_MAXIMUM = 2
+    NOT_CONVERGED = 3
+    INVALID_INPUT = 4
+
+
+def implied_volatilities(type, strike_price, underlying_price, option_price,
+                         days_to_expiry, start_time=0.0, risk_free_rate=0.0,
+                         dividend_rate=0.0, max_sigma=5.0, tolerance=1e-12,
+                         max_iterations=100):
+    """
+    Implied volatility for arrays of options, such as a whole chain, with
+    arguments broadcast as for calc_option_values.
+
+    All contracts are solved together. Each starts from the Corrado-Miller
+    approximation and takes Newton steps using vega, falling back to
+    bisection of the bracket [0, max_sigma] whenever a step would leave it.
+    Contracts drop out of the iteration once their volatility changes by
+    less than tolerance.
+
+    :return: (volatility, status) arrays, where volatility is NaN for any
+    contract which could not be solved and status is a SolverStatus code
+    """
+    arrays = np.broadcast_arrays(
+        np.asarray(type), np.asarray(strike_price, dtype=np.float64),
+        np.asarray(underlying_price, dtype=np.float64),
+        np.asarray(option_price, dtype=np.float64),
+        np.asarray(days_to_expiry, dtype=np.float64),
+        np.asarray(start_time, dtype=np.float64),
+        np.asarray(risk_free_rate, dtype=np.float64),
+        np.asarray(dividend_rate, dtype=np.float64))
+    shape = arrays[0].shape
+    sign = _sign(arrays[0].ravel())
+    K, S, price, T, t, r, q = [array.ravel() for array in arrays[1:]]
+    time_remaining = T - t
+
+    volatility = np.zeros(len(price))
+    volatility[:] = np.NAN
+    status = np.zeros(len(price), dtype=int)
+    status[:] = SolverStatus.NOT_CONVERGED
+
+    with np.errstate(invalid='ignore'):
+        invalid = ~(np.isfinite(K) & np.isfinite(S) & np.isfinite(price) &
+                    np.isfinite(time_remaining) & np.isfinite(r) &
+                    np.isfinite(q)) | (K <= 0) | (S <= 0) | \
+            (time_remaining <= 0)
+    status[invalid] = SolverStatus.INVALID_INPUT
+
+    # Limits of the price as volatility goes to zero and max_sigma
+    forward = S * np.exp(-q * time_remaining)
+    discounted_strike = K * np.exp(-r * time_remaining)
+    lower_price = np.maximum(sign * (forward - discounted_strike), 0.)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        upper_price = _solver_price(sign, S, K, max_sigma, time_remaining, r,
+                                    q)[0]
+        below = ~invalid & (price <= lower_price)
+        above = ~invalid & ~below & (price > upper_price)
+    status[below] = SolverStatus.BELOW_INTRINSIC
+    status[above] = SolverStatus.ABOVE_MAXIMUM
+
+    active = np.flatnonzero(status == SolverStatus.NOT_CONVERGED)
+    lower = np.zeros(len(active))
+    upper = np.zeros(len(active)) + max_sigma
+    sigma = _initial_volatility(sign[active], forward[active],
+                                discounted_strike[active], price[active],
+                                time_remaining[active])
+    sigma = np.where((sigma > lower) & (sigma < upper), sigma, upper / 2.)
+
+    iteration = 0
+    while len(active) > 0 and iteration < max_iterations:
+        iteration += 1
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            model_price, vega = _solver_price(
+                sign[active], S[active], K[active], sigma,
+                time_remaining[active], r[active], q[active])
+            error = model_price - price[active]
+
+            lower = np.where(error < 0, sigma, lower)
+            upper = np.where(error > 0, sigma, upper)
+
+            newton = sigma - error / vega
+        bisect = ~((newton > lower) & (newton < upper))
+        step = np.where(bisect, (lower + upper) / 2., newton)
+
+        converged = (error == 0) | (np.abs(step - sigma) < tolerance) | \
+            (upper - lower < tolerance)
+        sigma = step
+
+        volatility[active[converged]] = sigma[converged]
+        status[active[converged]] = SolverStatus.CONVERGED
+
+        remaining = ~converged
+        active = active[remaining]
+        sigma = sigma[remaining]
+        lower = lower[remaining]
+        upper = upper[remaining]
+
+    return volatility.reshape(shape), status.reshape(shape)
+
+
+def _solver_price(sign, S, K, sigma, time_remaining, r, q):
+    """
+    Price along with its derivative with respect to volatility
+    """
+    d1, d2 = _d1_d2(S, K, sigma, time_remaining, r, q)
+    price = _price(sign, S, K, time_remaining, r, q, N.cdf(sign * d1),
+                   N.cdf(sign * d2))
+    vega = S * np.exp(-q * time_remaining) * np.sqrt(time_remaining) * \
+        _pdf(d1)
+    return price, vega
+
+
+def _initial_volatility(sign, forward, discounted_strike, price,
+                        time_remaining):
+    """
+    Corrado-Miller approximation, using put-call parity for puts
+    """
+    call_price = np.where(sign > 0, price,
+                          price + forward - discounted_strike)
+    half_moneyness = (forward - discounted_strike) / 2.
+    excess = call_price - half_moneyness
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return (sqrt(2 * pi) / (forward + discounted_strike)) * \
+            (excess + np.sqrt(np.maximum(
+                excess**2 - (forward - discounted_strike)**2 / pi, 0.))) / \
+            np.sqrt(time_remaining)
 
 
 def calc_option_price(type, strike_price, underlying_price, volatility,
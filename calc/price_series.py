@@ -2,8 +2,9 @@ import math
 
 import numpy as np
 from scikits.statsmodels.tsa import arima_process
+from scipy.stats import norm
 
-from option import OptionType
+from option import OptionType, calc_option_values
 
 
 class Series:
@@ -48,21 +49,90 @@ def generate_random_walk_revised(periods, start_price, sigma, days):
 
 def generate_random_walks(periods, simulation_count, start_price, sigma,
                           model=NORMAL):
-    return [np.cumsum(model(periods) * sigma) + start_price
-            for i in range(simulation_count)]
+    """
+    :return: (simulation_count x periods) array with a walk in each row
+    """
+    return generate_paths(simulation_count, periods, start_price, sigma,
+                          dt=1.0, model=Model.ABM, shocks=model)
 
 
 DAYS_PER_YEAR = 252.0
 
+
+class Model:
+    # Arithmetic Brownian motion
+    ABM = 0
+    # Geometric Brownian motion
+    GBM = 1
+
+
+def generate_paths(paths, steps, start_price, sigma, mu=0.0,
+                   dt=1.0 / DAYS_PER_YEAR, model=Model.GBM, shocks=None,
+                   dtype=np.float64, terminal_only=False, random_state=None):
+    """
+    Simulated prices as a (paths x steps) array, where row i is a path and
+    column j the price after j + 1 steps of length dt years
+
+    With ABM prices move by mu * dt + sigma * sqrt(dt) * shock each step, and
+    with GBM log prices move by (mu - sigma^2 / 2) * dt + sigma * sqrt(dt) *
+    shock.
+
+    :param shocks: function returning a number of draws, as NORMAL, which
+    are taken for each path in turn. By default these are standard normal
+    draws from random_state.
+    :param dtype: float32 halves memory use for large simulations
+    :param terminal_only: return only the (paths,) prices after the final
+    step, which are drawn directly rather than by stepping along each path
+    :param random_state: numpy RandomState to draw from, by default the
+    global numpy random state
+    """
+    dtype = np.dtype(dtype)
+    if shocks is None:
+        random = np.random if random_state is None else random_state
+        shocks = lambda size: random.normal(0, 1, size)
+
+    if terminal_only:
+        increments = np.asarray(shocks(paths), dtype=dtype)
+        return _to_prices(increments, start_price, sigma, mu, dt * steps,
+                          model, cumulative=False)
+
+    increments = np.asarray(shocks(paths * steps), dtype=dtype) \
+        .reshape(paths, steps)
+    return _to_prices(increments, start_price, sigma, mu, dt, model,
+                      cumulative=True)
+
+
+def _to_prices(shocks, start_price, sigma, mu, dt, model, cumulative):
+    """
+    Convert shocks to prices in place
+    """
+    dtype = shocks.dtype.type
+
+    shocks *= dtype(sigma * math.sqrt(dt))
+    if model == Model.GBM:
+        drift = (mu - 0.5 * sigma**2) * dt
+    else:
+        drift = mu * dt
+    if drift != 0.0:
+        shocks += dtype(drift)
+
+    if cumulative:
+        np.cumsum(shocks, axis=-1, out=shocks)
+
+    if model == Model.GBM:
+        np.exp(shocks, out=shocks)
+        shocks *= dtype(start_price)
+    else:
+        shocks += dtype(start_price)
+    return shocks
+
+
 def generate_bm_prices(periods, start_price, mu, sigma, delta):
     t = delta / DAYS_PER_YEAR
     prices = np.zeros(periods)
     epsilon_sigma_t = np.random.normal(0, 1, periods) * sigma * np.sqrt(t)
     prices[0] = start_price
-    for i in range(1, len(prices)):
-        prices[i] = prices[i-1] * mu * t + \
-                    prices[i-1] * epsilon_sigma_t[i-1] + \
-                    prices[i-1]
+    prices[1:] = start_price * np.cumprod(1 + mu * t + epsilon_sigma_t[:-1])
     return prices
 
 
@@ -71,10 +141,8 @@ def generate_gbm_prices(periods, start_price, mu, sigma, delta):
     prices = np.zeros(periods)
     epsilon_sigma_t = np.random.normal(0, 1, periods-1) * sigma * np.sqrt(t)
     prices[0] = start_price
-    for i in range(1, len(prices)):
-        prices[i] = prices[i-1] * \
-                    np.exp((mu - 0.5 * sigma**2) * t +
-                           epsilon_sigma_t[i-1])
+    prices[1:] = start_price * np.exp(
+        np.cumsum((mu - 0.5 * sigma**2) * t + epsilon_sigma_t))
     return prices
 
 
@@ -92,19 +160,259 @@ def generate_gbm_prices_vec(periods, start_price, mu, sigma, delta):
 
 
 
-def calc_itm_probability(strikes, price, sigma, periods, simulation_count, type):
-    outcomes = generate_random_walks(periods, simulation_count, price, sigma)
-    final_prices = np.transpose(np.array(outcomes))[-1]
-
-    results = np.column_stack((strikes, np.zeros(strikes.shape)))
-
-    for idx in np.ndindex(strikes.shape):
-        # Can this be vectorised?
-        if type is OptionType.CALL:
-            results[idx][1] = \
-                sum(final_prices > strikes[idx]) / float(simulation_count)
-        elif type is OptionType.PUT:
-            results[idx][1] = \
-                sum(final_prices < strikes[idx]) / float(simulation_count)
+class EmpiricalCDF(object):
+    """
+    Distribution of simulated prices, sorted once so that the fraction of
+    prices beyond any number of levels is found by binary search in
+    O(log n) per level rather than by comparing against every price
+    """
+    def __init__(self, values):
+        values = np.ravel(values).astype(np.float64)
+        self.values = np.sort(values[~np.isnan(values)])
+        self.count = len(self.values)
+
+    def __len__(self):
+        return self.count
+
+    def count_below(self, levels):
+        """
+        Number of values strictly below each level
+        """
+        return np.searchsorted(self.values, levels, side='left')
+
+    def count_above(self, levels):
+        """
+        Number of values strictly above each level
+        """
+        return self.count - np.searchsorted(self.values, levels, side='right')
+
+    def probability_below(self, levels):
+        """
+        Fraction of values strictly below each level
+        """
+        return self.count_below(levels) / float(self.count)
+
+    def probability_above(self, levels):
+        """
+        Fraction of values strictly above each level
+        """
+        return self.count_above(levels) / float(self.count)
+
+    def probability_between(self, lower, upper):
+        """
+        Fraction of values strictly between lower and upper, e.g. for a
+        range of strikes
+        """
+        hits = np.searchsorted(self.values, upper, side='left') - \
+            np.searchsorted(self.values, lower, side='right')
+        return np.maximum(hits, 0) / float(self.count)
+
+    def itm_probability(self, strikes, type):
+        if type == OptionType.CALL:
+            return self.probability_above(strikes)
+        return self.probability_below(strikes)
+
+    def digital_value(self, strikes, type, payout=1.0, discount=1.0):
+        """
+        Expected value of cash-or-nothing options paying payout when they
+        finish in the money
+        """
+        return discount * payout * self.itm_probability(strikes, type)
+
+    def std_error(self, probability):
+        """
+        Standard error of probabilities estimated from these values
+        """
+        return binomial_std_error(probability, self.count)
+
+
+def binomial_std_error(probability, count):
+    """
+    Standard error of probabilities estimated as the fraction of count
+    samples in which an event occurred
+    """
+    # Standard deviation of the indicator is sqrt(p (1 - p))
+    probability = np.asarray(probability)
+    return np.sqrt(probability * (1. - probability) / (count - 1))
+
+
+def final_price_cdf(price, sigma, periods, simulation_count,
+                    random_state=None):
+    """
+    EmpiricalCDF of final prices after periods steps of an arithmetic random
+    walk with sigma per step, which can be queried for any strikes
+    """
+    return EmpiricalCDF(generate_paths(simulation_count, periods, price,
+                                       sigma, dt=1.0, model=Model.ABM,
+                                       terminal_only=True,
+                                       random_state=random_state))
+
+
+class VarianceReduction:
+    NONE = 0
+    # Each normal draw is paired with its negation
+    ANTITHETIC = 1
+    # Regression on the lognormal probability from Black-Scholes, using the
+    # same draws
+    CONTROL_VARIATE = 2
+    # Randomly shifted low discrepancy points mapped to normals
+    QUASI_RANDOM = 3
+    # Draws shifted towards the strike for strikes in the tail, weighted by
+    # the likelihood ratio
+    IMPORTANCE_SAMPLING = 4
+
+
+# Independently shifted copies of the quasi-random points, from whose spread
+# the standard error is estimated
+QMC_REPLICATES = 16
+
+
+def calc_itm_probability(strikes, price, sigma, periods, simulation_count,
+                         type, method=VarianceReduction.NONE,
+                         random_state=None):
+    """
+    Probability of finishing in the money at each strike after periods
+    steps of an arithmetic random walk with sigma per step
+
+    :param method: VarianceReduction method, all of which draw only the
+    final prices
+    :param random_state: numpy RandomState to draw from, by default the
+    global numpy random state
+    :return: (strikes x 3) array of strike, probability and the standard
+    error of the probability
+    """
+    strikes = np.asarray(strikes, dtype=np.float64)
+    random = np.random if random_state is None else random_state
+    # Standard deviation of the final price
+    scale = sigma * math.sqrt(float(periods))
+
+    if method == VarianceReduction.NONE:
+        cdf = final_price_cdf(price, sigma, periods, simulation_count,
+                              random_state=random_state)
+        probability = cdf.itm_probability(strikes, type)
+        std_error = cdf.std_error(probability)
+    elif method == VarianceReduction.ANTITHETIC:
+        probability, std_error = _itm_antithetic(
+            strikes, price, scale, simulation_count, type, random)
+    elif method == VarianceReduction.CONTROL_VARIATE:
+        probability, std_error = _itm_control_variate(
+            strikes, price, scale, simulation_count, type, random)
+    elif method == VarianceReduction.QUASI_RANDOM:
+        probability, std_error = _itm_quasi_random(
+            strikes, price, scale, simulation_count, type, random)
+    elif method == VarianceReduction.IMPORTANCE_SAMPLING:
+        probability, std_error = _itm_importance_sampling(
+            strikes, price, scale, simulation_count, type, random)
+    else:
+        raise ValueError('Unknown variance reduction method: {}'
+                         .format(method))
+
+    return np.column_stack((strikes, probability, std_error))
+
+
+def _in_the_money(final_prices, strikes, type):
+    """
+    :return: (prices x strikes) boolean array
+    """
+    if type == OptionType.CALL:
+        return final_prices[:, np.newaxis] > strikes
+    return final_prices[:, np.newaxis] < strikes
+
+
+def _mean_std_error(samples):
+    """
+    Mean and standard error of the mean of each column
+    """
+    count = len(samples)
+    return samples.mean(axis=0), samples.std(axis=0, ddof=1) / math.sqrt(count)
+
+
+def _itm_antithetic(strikes, price, scale, simulation_count, type, random):
+    pairs = max(simulation_count // 2, 2)
+    shocks = random.normal(0, 1, pairs)
+    samples = 0.5 * (
+        _in_the_money(price + scale * shocks, strikes, type).astype(float) +
+        _in_the_money(price - scale * shocks, strikes, type))
+    return _mean_std_error(samples)
+
+
+def _itm_control_variate(strikes, price, scale, simulation_count, type,
+                         random):
+    shocks = random.normal(0, 1, simulation_count)
+    samples = _in_the_money(price + scale * shocks, strikes, type) \
+        .astype(float)
+
+    # Lognormal prices with the same volatility at the start price, driven by
+    # the same draws. Their probability of finishing in the money is N(d2).
+    log_sigma = scale / price
+    controls = _in_the_money(
+        price * np.exp(log_sigma * shocks - 0.5 * log_sigma**2),
+        strikes, type).astype(float)
+    d2 = calc_option_values(type, strikes, price, log_sigma, 1.0).d2
+    if type == OptionType.CALL:
+        expected = norm.cdf(d2)
+    else:
+        expected = norm.cdf(-d2)
+
+    control_mean = controls.mean(axis=0)
+    covariance = ((samples - samples.mean(axis=0)) *
+                  (controls - control_mean)).sum(axis=0)
+    variance = ((controls - control_mean)**2).sum(axis=0)
+    # No correction where every control is in or out of the money
+    beta = np.where(variance > 0, covariance / np.where(variance > 0,
+                                                        variance, 1.), 0.)
+    samples -= beta * (controls - expected)
+    return _mean_std_error(samples)
+
+
+def _itm_quasi_random(strikes, price, scale, simulation_count, type, random):
+    count = max(simulation_count // QMC_REPLICATES, 1)
+    points = van_der_corput(count)
+
+    estimates = np.zeros((QMC_REPLICATES, len(strikes)))
+    for i in range(QMC_REPLICATES):
+        # Random shift modulo 1 keeps the points evenly spread and makes
+        # each replicate an unbiased estimate
+        uniforms = np.mod(points + random.uniform(), 1.0)
+        # Only a point shifted to exactly 0, whose shock would be -inf, is
+        # moved, so the other points keep their place in the tails
+        uniforms = np.where(uniforms > 0., uniforms,
+                            np.finfo(np.float64).tiny)
+        shocks = norm.ppf(uniforms)
+        estimates[i] = _in_the_money(price + scale * shocks, strikes, type) \
+            .mean(axis=0)
+    return _mean_std_error(estimates)
+
+
+def _itm_importance_sampling(strikes, price, scale, simulation_count, type,
+                             random):
+    # Distance to each strike in standard deviations of the final price
+    distance = (strikes - price) / scale
+    # Centre draws on strikes in the tail, leaving the others unshifted
+    if type == OptionType.CALL:
+        shift = np.maximum(distance, 0.)
+    else:
+        shift = np.minimum(distance, 0.)
 
-    return results
+    shocks = random.normal(0, 1, simulation_count)[:, np.newaxis] + shift
+    weights = np.exp(0.5 * shift**2 - shift * shocks)
+    if type == OptionType.CALL:
+        hits = price + scale * shocks > strikes
+    else:
+        hits = price + scale * shocks < strikes
+    return _mean_std_error(hits * weights)
+
+
+def van_der_corput(count, base=2):
+    """
+    First count points of the van der Corput sequence, excluding 0. In base
+    2 this is the first dimension of the Sobol sequence.
+    """
+    indices = np.arange(1, count + 1)
+    points = np.zeros(count)
+    denominator = 1.
+    while indices.any():
+        denominator *= base
+        points += (indices % base) / denominator
+        indices //= base
+    return points
@@ -1,9 +1,15 @@
 import math
+import numpy as np
 import pandas as pd
 
+from datatypes import OptionType
 import option
 
 
+STOCK = 'S'
+MEASURES = ['value', 'pnl', 'delta', 'gamma', 'vega', 'theta']
+
+
 def main():
     # calc_slide('test/data/positions.csv', 100.0, 0.4, 90.0 / 365.0, 0.02)
     # calc_slide('test/data/positions2.csv', 100.0, 0.5, 30.0 / 365.0, 0.02)
@@ -53,39 +59,302 @@ def other_positions():
 
 
 def calc_slide(positions_file, underlying, sigma, time, risk_free_rate):
-    positions = load_positions(positions_file)
+    positions = Positions.from_frame(load_positions(positions_file))
 
-    delta = 0.0
-    gamma = 0.0
-    vega = 0.0
-    theta = 0.0
-    pnl = 0.0
-
-    for strike, inst_type, qty in positions.values:
-        if inst_type == 'S':
-            pnl += strike * qty
-            delta += qty
-        else:
-            opt = option.Option(inst_type, strike, underlying, sigma,
-                                time, risk_free_rate=risk_free_rate)
-
-            delta += ((opt.delta * 100.0) * qty)
-            print('Delta adjust: {}'.format(opt.delta * 100.0 * qty))
-            gamma += (opt.gamma * 100.0) * qty # Gamma is always positive
-            vega += (opt.vega) * qty # See p80
-            theta += (opt.theta) * qty # See p76
-
-            pnl += opt.price * qty * 100.0
-
-            print('Strike: {}, Type: {}, Qty: {}, Price: {}'.format(strike, inst_type, qty, opt.price))
-            print('Delta: {}, Gamma: {}, Vega: {}, Theta: {}'.format(opt.delta, opt.gamma, opt.vega, opt.theta / 365.0))
-
-    print('Delta:\t\t{}'.format(delta))
-    print('Gamma:\t\t{}'.format(gamma))
-    print('Vega:\t\t{}'.format(vega))
-    print('Theta:\t\t{}'.format((theta / 365.0) * 100.0))
-    print('Position Cost:\t\t{}'.format(pnl))
-    print('Total PnL:\t\t{}'.format(pnl))
+    legs = option.calc_option_values(positions.types, positions.strikes,
+                                     underlying, sigma, time,
+                                     risk_free_rate=risk_free_rate)
+    for i in np.flatnonzero(~positions.is_stock):
+        strike = positions.strikes[i]
+        inst_type = positions.types[i]
+        qty = positions.quantities[i]
+        print('Delta adjust: {}'.format(legs.delta[i] * 100.0 * qty))
+        print('Strike: {}, Type: {}, Qty: {}, Price: {}'.format(
+            strike, inst_type, qty, legs.price[i]))
+        print('Delta: {}, Gamma: {}, Vega: {}, Theta: {}'.format(
+            legs.delta[i], legs.gamma[i], legs.vega[i],
+            legs.theta[i] / 365.0))
+
+    risk = slide(positions, underlying, sigma, time, risk_free_rate)
+    cost = risk.value[0, 0, 0] - \
+        (underlying * positions.quantities[positions.is_stock]).sum() + \
+        (positions.strikes * positions.quantities)[positions.is_stock].sum()
+
+    print('Delta:\t\t{}'.format(risk.delta[0, 0, 0]))
+    print('Gamma:\t\t{}'.format(risk.gamma[0, 0, 0]))
+    print('Vega:\t\t{}'.format(risk.vega[0, 0, 0]))
+    print('Theta:\t\t{}'.format(risk.theta[0, 0, 0]))
+    print('Position Cost:\t\t{}'.format(cost))
+    print('Total PnL:\t\t{}'.format(cost))
+
+
+class Positions(object):
+    """
+    Legs of a portfolio as arrays. Options have type C or P, while stock has
+    type S with the strike holding its entry price.
+
+    Books across several underlyings also provide the underlying, time to
+    expiry in years and optionally volatility of each leg, which are read
+    from the Underlying, Expiry and Sigma columns of the positions file.
+    Legs without a volatility use that of their underlying's market data.
+    """
+    def __init__(self, strikes, types, quantities, underlyings=None,
+                 expiries=None, sigmas=None):
+        self.strikes = np.asarray(strikes, dtype=np.float64)
+        self.types = np.asarray(types).astype(str)
+        self.quantities = np.asarray(quantities, dtype=np.float64)
+        self.is_stock = self.types == STOCK
+
+        self.underlyings = None if underlyings is None \
+            else np.asarray(underlyings).astype(str)
+        self.expiries = _optional_array(expiries, len(self.strikes))
+        self.sigmas = _optional_array(sigmas, len(self.strikes))
+
+    def __len__(self):
+        return len(self.strikes)
+
+    @classmethod
+    def from_frame(cls, df):
+        return cls(df['Strike'].values, df['Type'].values, df['Qty'].values,
+                   _get_column(df, 'Underlying'), _get_column(df, 'Expiry'),
+                   _get_column(df, 'Sigma'))
+
+
+class RiskSlide(object):
+    """
+    Portfolio value and greeks over a grid of spot shifts x volatility
+    shifts x days forward. Each measure is an array of shape
+    (len(spot_shifts), len(vol_shifts), len(days_forward)).
+
+    Measures are in the units printed by calc_slide: delta in shares, gamma
+    in shares per point, vega per option (without the multiplier) and theta
+    in currency per day. pnl is relative to the unshifted portfolio value.
+    """
+    def __init__(self, spot_shifts, vol_shifts, days_forward, measures):
+        self.spot_shifts = np.asarray(spot_shifts, dtype=np.float64)
+        self.vol_shifts = np.asarray(vol_shifts, dtype=np.float64)
+        self.days_forward = np.asarray(days_forward, dtype=np.float64)
+        self.measures = measures
+
+    def __getattr__(self, name):
+        measures = self.__dict__.get('measures', {})
+        if name in measures:
+            return measures[name]
+        raise AttributeError(name)
+
+    def to_frame(self):
+        """
+        DataFrame with a row for each grid point, indexed by spot shift,
+        vol shift and days forward, and a column for each measure
+        """
+        index = pd.MultiIndex.from_product(
+            [self.spot_shifts, self.vol_shifts, self.days_forward],
+            names=['spot_shift', 'vol_shift', 'days_forward'])
+        return pd.DataFrame(
+            dict((measure, self.measures[measure].ravel())
+                 for measure in MEASURES),
+            index=index, columns=MEASURES)
+
+
+def slide(positions, underlying, sigma, time, risk_free_rate=0.0,
+          spot_shifts=(0.0,), vol_shifts=(0.0,), days_forward=(0,),
+          multiplier=100.0, chunk_size=1000):
+    """
+    Evaluate the portfolio over every combination of shifts in one pass,
+    with legs broadcast against the grid
+
+    :param spot_shifts: relative shifts in the underlying, e.g. -0.1 for a
+    10% fall
+    :param vol_shifts: absolute shifts in volatility
+    :param days_forward: calendar days elapsed, reducing time to expiry
+    :param chunk_size: number of legs evaluated at a time, which bounds
+    memory use to chunk_size x grid points
+    :return: RiskSlide
+    """
+    spot_shifts = np.asarray(spot_shifts, dtype=np.float64)
+    vol_shifts = np.asarray(vol_shifts, dtype=np.float64)
+    days_forward = np.asarray(days_forward, dtype=np.float64)
+
+    # Grid axes are (spot, vol, days, legs)
+    spots = underlying * (1 + spot_shifts)[:, None, None, None]
+    sigmas = np.maximum(sigma + vol_shifts, 0.)[None, :, None, None]
+    times = np.maximum(time - days_forward / 365.0, 0.)[None, None, :, None]
+
+    shape = (len(spot_shifts), len(vol_shifts), len(days_forward))
+    measures = dict((measure, np.zeros(shape)) for measure in MEASURES)
+
+    options = np.flatnonzero(~positions.is_stock)
+    for start in range(0, len(options), chunk_size):
+        legs = options[start:start + chunk_size]
+        quantities = positions.quantities[legs]
+        values = _leg_values(positions.types[legs], positions.strikes[legs],
+                             spots, sigmas, times, risk_free_rate)
+
+        with np.errstate(invalid='ignore'):
+            measures['value'] += \
+                (values.price * quantities).sum(axis=-1) * multiplier
+            measures['delta'] += \
+                (values.delta * quantities).sum(axis=-1) * multiplier
+            measures['gamma'] += \
+                (values.gamma * quantities).sum(axis=-1) * multiplier
+            measures['vega'] += (values.vega * quantities).sum(axis=-1)
+            measures['theta'] += \
+                (values.theta * quantities).sum(axis=-1) * multiplier / 365.0
+
+    stock = positions.quantities[positions.is_stock].sum()
+    measures['value'] += spots[:, :, :, 0] * stock
+    measures['delta'] += stock
+
+    base_prices = _leg_values(positions.types[options],
+                              positions.strikes[options], underlying, sigma,
+                              time, risk_free_rate).price
+    base_value = (base_prices * positions.quantities[options]).sum() * \
+        multiplier + underlying * stock
+    measures['pnl'] = measures['value'] - base_value
+
+    return RiskSlide(spot_shifts, vol_shifts, days_forward, measures)
+
+
+def aggregate(positions, market_data, risk_free_rate=0.0, spot_shift=0.0,
+              vol_shift=0.0, days_forward=0, multiplier=100.0):
+    """
+    Value and greeks of a book spanning many underlyings, rolled up to each
+    underlying. All option legs are priced in a single batch, with the spot
+    and volatility of each leg taken from its underlying's market data, then
+    summed per underlying.
+
+    :param market_data: DataFrame indexed by underlying with Spot and Sigma
+    columns, as returned by load_market_data
+    :param spot_shift: relative shift applied to every underlying
+    :param vol_shift: absolute shift applied to every volatility
+    :param days_forward: calendar days elapsed, reducing time to expiry
+    :return: DataFrame indexed by underlying with a column for each measure
+    in the units of RiskSlide, where pnl is the change in value due to the
+    shifts. Use book_total for the totals across the book.
+    """
+    if positions.underlyings is None:
+        raise ValueError('Positions have no underlyings')
+
+    underlyings, codes = np.unique(positions.underlyings, return_inverse=True)
+    market_data = market_data.reindex(underlyings)
+    if market_data[['Spot', 'Sigma']].isnull().values.any():
+        missing = market_data.index[
+            market_data[['Spot', 'Sigma']].isnull().any(axis=1)]
+        raise ValueError('No market data for underlyings: {}'
+                         .format(', '.join(missing)))
+
+    spots = market_data['Spot'].values[codes]
+    sigmas = np.where(np.isnan(positions.sigmas),
+                      market_data['Sigma'].values[codes], positions.sigmas)
+
+    options = ~positions.is_stock
+    base = _price_legs(positions, options, spots, sigmas,
+                       positions.expiries, risk_free_rate)
+    shifted = _price_legs(positions, options, spots * (1 + spot_shift),
+                          sigmas + vol_shift,
+                          positions.expiries - days_forward / 365.0,
+                          risk_free_rate)
+
+    quantities = np.where(options, positions.quantities, 0.)
+    stock = np.where(options, 0., positions.quantities)
+    shifted_value = shifted.price * quantities * multiplier + \
+        spots * (1 + spot_shift) * stock
+    base_value = base.price * quantities * multiplier + spots * stock
+
+    leg_measures = {
+        'value': shifted_value,
+        'pnl': shifted_value - base_value,
+        'delta': shifted.delta * quantities * multiplier + stock,
+        'gamma': shifted.gamma * quantities * multiplier,
+        'vega': shifted.vega * quantities,
+        'theta': shifted.theta * quantities * multiplier / 365.0,
+    }
+
+    report = pd.DataFrame(
+        dict((measure, np.bincount(codes, weights=leg_measures[measure],
+                                   minlength=len(underlyings)))
+             for measure in MEASURES),
+        index=pd.Index(underlyings, name='Underlying'), columns=MEASURES)
+    return report
+
+
+def book_total(report):
+    """
+    Totals across all underlyings of a report from aggregate
+    """
+    return report.sum()
+
+
+def print_report(report):
+    print(report.to_string())
+    print('')
+    for measure, value in book_total(report).items():
+        print('{}:\t\t{}'.format(measure.capitalize(), value))
+
+
+def _price_legs(positions, options, spots, sigmas, expiries, risk_free_rate):
+    """
+    Option values for every leg, with stock legs zeroed
+    """
+    values = _leg_values(positions.types, positions.strikes, spots, sigmas,
+                         expiries, risk_free_rate)
+    return option.OptionValues(*[np.where(options, value, 0.)
+                                 for value in values])
+
+
+def _leg_values(types, strikes, spots, sigmas, times, risk_free_rate):
+    """
+    option.calc_option_values, except that legs at or past expiry, or
+    without volatility, are worth their intrinsic value against the
+    discounted strike, with a delta of +/-1 or 0 and no gamma or vega. At
+    expiry this is max(+/-(S - K), 0).
+    """
+    with np.errstate(invalid='ignore', divide='ignore'):
+        values = option.calc_option_values(types, strikes, spots, sigmas,
+                                           times,
+                                           risk_free_rate=risk_free_rate)
+
+    times = np.asarray(times)
+    expired = (times <= 0.) | (np.asarray(sigmas) <= 0.)
+    if not expired.any():
+        return values
+
+    sign = np.where(np.asarray(types) == OptionType.CALL, 1., -1.)
+    time_remaining = np.maximum(times, 0.)
+    discounted_strikes = np.asarray(strikes) * \
+        np.exp(-risk_free_rate * time_remaining)
+    intrinsic = np.maximum(sign * (spots - discounted_strikes), 0.)
+    in_the_money = intrinsic > 0.
+    # The discounted strike accrues towards the strike over the remaining
+    # time, which is the only source of theta and rho
+    theta = np.where(in_the_money & (times > 0.),
+                     -sign * risk_free_rate * discounted_strikes, 0.)
+    rho = np.where(in_the_money,
+                   sign * time_remaining * discounted_strikes, 0.)
+    return option.OptionValues(
+        np.where(expired, intrinsic, values.price),
+        np.where(expired, np.where(in_the_money, sign, 0.), values.delta),
+        np.where(expired, 0., values.gamma),
+        np.where(expired, 0., values.vega),
+        np.where(expired, theta, values.theta),
+        np.where(expired, rho, values.rho), values.d1, values.d2)
+
+
+def _optional_array(values, size):
+    if values is None:
+        return np.zeros(size) + np.NAN
+    return np.asarray(values, dtype=np.float64)
+
+
+def _get_column(df, column):
+    return df[column].values if column in df.columns else None
+
+
+def load_market_data(filename):
+    """
+    Market data for each underlying, with columns Underlying, Spot & Sigma
+    """
+    return pd.read_csv(filename, index_col='Underlying')
 
 
 def load_positions(filename):
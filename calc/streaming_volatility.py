@@ -0,0 +1,230 @@
+"""
+Stateful volatility estimators for live bar feeds.
+
+Each estimator holds fixed size ring buffers of its log price terms along
+with their running sums, so that push(bar) updates the current volatility
+in O(1) with memory bounded by the lookback, regardless of feed length.
+Replaying a price series through an estimator gives the same results as the
+corresponding function in volatility_models.
+"""
+
+from abc import abstractmethod
+
+from numpy import log, sqrt
+import numpy as np
+
+import volatility_models as vm
+
+
+class RollingWindow(object):
+    """
+    Ring buffer of the most recent values, with running sum and sum of
+    squares. Non-finite values make the window invalid until they drop out.
+    """
+    def __init__(self, size):
+        self.size = size
+        self.count = 0
+        self.sum = 0.
+        self.sum_squares = 0.
+
+        self._values = np.zeros(size)
+        self._finite = np.ones(size, dtype=bool)
+        self._invalid = 0
+        self._index = 0
+        self._updates = 0
+        # Values are stored relative to the first value seen, which keeps
+        # the sum of squares well conditioned for the variance
+        self._shift = None
+
+    @property
+    def full(self):
+        return self.count == self.size
+
+    @property
+    def valid(self):
+        return self.full and self._invalid == 0
+
+    def push(self, value):
+        finite = np.isfinite(value)
+        if finite and self._shift is None:
+            self._shift = value
+        value = value - self._shift if finite else 0.
+
+        if self.full:
+            old = self._values[self._index]
+            self.sum -= old
+            self.sum_squares -= old * old
+            if not self._finite[self._index]:
+                self._invalid -= 1
+        else:
+            self.count += 1
+
+        self._values[self._index] = value
+        self._finite[self._index] = finite
+        if not finite:
+            self._invalid += 1
+
+        self.sum += value
+        self.sum_squares += value * value
+        self._index = (self._index + 1) % self.size
+
+        # Periodically recalculate the sums from the buffer, so rounding
+        # errors from the running updates cannot accumulate
+        self._updates += 1
+        if self._updates == self.size:
+            self._updates = 0
+            self.sum = self._values.sum()
+            self.sum_squares = (self._values**2).sum()
+
+    def total(self):
+        if not self.valid:
+            return np.NAN
+        return self.sum + self.count * (self._shift or 0.)
+
+    def variance(self):
+        """
+        Unbiased variance of the values in the window
+        """
+        if not self.valid:
+            return np.NAN
+        N = float(self.count)
+        return max((self.sum_squares - self.sum**2 / N) / (N - 1), 0.)
+
+
+class StreamingEstimator(object):
+    """
+    Base class for streaming estimators. Bars may be any object supporting
+    lookup of open, high, low & close prices by name, such as a dict or a
+    row of an intraday price DataFrame.
+    """
+    def __init__(self, lookback, periods_per_day=1):
+        self.lookback = lookback
+        self.periods_per_day = periods_per_day
+        self.volatility = np.NAN
+        self._previous_close = None
+
+    def push(self, bar):
+        return self.push_prices(_get_price(bar, 'open'),
+                                _get_price(bar, 'high'),
+                                _get_price(bar, 'low'),
+                                _get_price(bar, 'close'))
+
+    def push_prices(self, open, high, low, close):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            volatility = self._update(float(open), float(high), float(low),
+                                      float(close))
+        self.volatility = vm.annualise(volatility, self.periods_per_day)
+        self._previous_close = float(close)
+        return self.volatility
+
+    @abstractmethod
+    def _update(self, open, high, low, close):
+        """
+        Add a bar to the estimator's windows
+
+        :return: unannualised volatility, NaN until the windows are full
+        """
+        pass
+
+
+class CloseToCloseEstimator(StreamingEstimator):
+    """
+    Streaming equivalent of volatility_models.population_std_dev
+    """
+    def __init__(self, lookback, periods_per_day=1):
+        super(CloseToCloseEstimator, self).__init__(lookback,
+                                                    periods_per_day)
+        self._returns = RollingWindow(lookback)
+
+    def _update(self, open, high, low, close):
+        if self._previous_close is not None:
+            self._returns.push(log(close / self._previous_close))
+        return sqrt(self._returns.variance())
+
+
+class ParkinsonEstimator(StreamingEstimator):
+    """
+    Streaming equivalent of volatility_models.parkinson_std_dev
+    """
+    def __init__(self, lookback, periods_per_day=1):
+        super(ParkinsonEstimator, self).__init__(lookback, periods_per_day)
+        self._high_low = RollingWindow(lookback)
+
+    def _update(self, open, high, low, close):
+        N = float(self.lookback)
+        self._high_low.push(log(high / low)**2)
+        return sqrt((1 / (4 * N * log(2))) * self._high_low.total())
+
+
+class GarmanKlassEstimator(StreamingEstimator):
+    """
+    Streaming equivalent of volatility_models.garman_klass_std_dev
+    """
+    def __init__(self, lookback, periods_per_day=1):
+        super(GarmanKlassEstimator, self).__init__(lookback, periods_per_day)
+        self._high_low = RollingWindow(lookback)
+        self._close_open = RollingWindow(lookback)
+
+    def _update(self, open, high, low, close):
+        N = float(self.lookback)
+        self._high_low.push(log(high / low)**2)
+        self._close_open.push(log(close / open)**2)
+
+        mids = 0.5 * self._high_low.total()
+        closes = (2 * log(2) - 1) * self._close_open.total()
+        return sqrt((mids / N) - (closes / N))
+
+
+class RogersSatchellEstimator(StreamingEstimator):
+    """
+    Streaming equivalent of volatility_models.rogers_satchell_std_dev
+    """
+    def __init__(self, lookback, periods_per_day=1):
+        super(RogersSatchellEstimator, self).__init__(lookback,
+                                                      periods_per_day)
+        self._rs = RollingWindow(lookback)
+
+    def _update(self, open, high, low, close):
+        N = float(self.lookback)
+        self._rs.push(_rogers_satchell_term(open, high, low, close))
+        return sqrt(self._rs.total() / N)
+
+
+class YangZhangEstimator(StreamingEstimator):
+    """
+    Streaming equivalent of volatility_models.yang_zhang_std_dev
+    """
+    def __init__(self, lookback, periods_per_day=1):
+        super(YangZhangEstimator, self).__init__(lookback, periods_per_day)
+        self._open_close = RollingWindow(lookback)
+        self._close_open = RollingWindow(lookback)
+        self._rs = RollingWindow(lookback)
+
+    def _update(self, open, high, low, close):
+        N = float(self.lookback)
+        k = 0.34 / (1.34 + ((N + 1) / (N - 1)))
+
+        # We require a previous close for the overnight term, so the other
+        # windows fill one bar earlier, but only hold the last lookback bars
+        if self._previous_close is not None:
+            self._open_close.push(log(open / self._previous_close))
+        self._close_open.push(log(close / open))
+        self._rs.push(_rogers_satchell_term(open, high, low, close))
+
+        open_var = self._open_close.variance()
+        close_var = self._close_open.variance()
+        rs_var = self._rs.total() / N
+
+        return sqrt(open_var + k * close_var + (1 - k) * rs_var)
+
+
+def _rogers_satchell_term(open, high, low, close):
+    return (log(high / close) * log(high / open)) + \
+        (log(low / close) * log(low / open))
+
+
+def _get_price(bar, name):
+    try:
+        return bar[name]
+    except KeyError:
+        return bar[name.capitalize()]
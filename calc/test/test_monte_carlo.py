@@ -0,0 +1,143 @@
+import unittest
+
+import numpy as np
+import numpy.testing as ntest
+
+import monte_carlo as mc
+from option import OptionType
+import price_series as ps
+
+
+class TestAccumulators(unittest.TestCase):
+    def setUp(self):
+        random = np.random.RandomState(1)
+        self.values = random.normal(100., 5., (1000, 3))
+
+    def test_running_stats(self):
+        stats = mc.RunningStats()
+        for start in range(0, 1000, 300):
+            stats.update(self.values[start:start + 300])
+
+        self.assertEqual(1000, stats.count)
+        ntest.assert_allclose(self.values.mean(axis=0), stats.mean)
+        ntest.assert_allclose(self.values.var(axis=0, ddof=1),
+                              stats.variance)
+
+    def test_threshold_counts(self):
+        thresholds = np.array([90., 100., 110.])
+        counts = mc.ThresholdCounts(thresholds)
+        counts.update(self.values[:500])
+        counts.update(self.values[500:])
+
+        ntest.assert_array_equal(
+            [(self.values > threshold).sum() for threshold in thresholds],
+            counts.above)
+        ntest.assert_array_equal(
+            [(self.values < threshold).sum() for threshold in thresholds],
+            counts.below)
+
+    def test_quantile_sketch(self):
+        random = np.random.RandomState(2)
+        values = random.normal(0., 1., 200000)
+        sketch = mc.QuantileSketch(size=2000)
+        for start in range(0, len(values), 15000):
+            sketch.update(values[start:start + 15000])
+
+        quantiles = [0., 0.01, 0.25, 0.5, 0.75, 0.99, 1.]
+        result = sketch.quantile(quantiles)
+        self.assertEqual(values.min(), result[0])
+        self.assertEqual(values.max(), result[-1])
+        # Compare by rank, as the sketch bounds the rank error
+        ranks = np.searchsorted(np.sort(values), result) / float(len(values))
+        ntest.assert_allclose(quantiles, ranks, atol=2e-3)
+
+    def test_quantile_sketch_exact_when_small(self):
+        sketch = mc.QuantileSketch(size=100)
+        sketch.update([3., 1., 2.])
+        sketch.update([4., 5.])
+        self.assertEqual(3., sketch.quantile(0.5))
+
+
+class TestSimulate(unittest.TestCase):
+    def test_matches_in_memory(self):
+        np.random.seed(3)
+        paths = ps.generate_paths(1000, 20, 100., 0.3, 0.05)
+
+        np.random.seed(3)
+        stats, counts = mc.simulate(1000, 20, 100., 0.3,
+                                    [mc.RunningStats(),
+                                     mc.ThresholdCounts([95., 105.])],
+                                    observe=lambda block: block[:, -1],
+                                    block_size=128, mu=0.05)
+
+        ntest.assert_allclose(paths[:, -1].mean(), stats.mean)
+        ntest.assert_allclose(paths[:, -1].var(ddof=1), stats.variance)
+        ntest.assert_array_equal(
+            [(paths[:, -1] > 95.).sum(), (paths[:, -1] > 105.).sum()],
+            counts.above)
+
+    def test_itm_probability(self):
+        strikes = np.arange(60., 80., 0.5)
+
+        np.random.seed(4)
+        final_prices = ps.generate_paths(5000, 100, 70., 3.5, dt=1.0,
+                                         model=ps.Model.ABM,
+                                         terminal_only=True)
+        np.random.seed(4)
+        result = mc.calc_itm_probability(strikes, 70., 3.5, 100, 5000,
+                                         OptionType.PUT, block_size=700)
+
+        ntest.assert_array_equal(strikes, result[:, 0])
+        ntest.assert_array_equal(
+            [(final_prices < strike).mean() for strike in strikes],
+            result[:, 1])
+
+        np.random.seed(4)
+        ntest.assert_allclose(
+            ps.calc_itm_probability(strikes, 70., 3.5, 100, 5000,
+                                    OptionType.PUT), result)
+
+
+def _draw(random_state, size):
+    return random_state.normal(0, 1, size)
+
+
+class TestParallel(unittest.TestCase):
+    def test_derive_seed(self):
+        ntest.assert_array_equal(mc.derive_seed(1, 0), mc.derive_seed(1, 0))
+        self.assertFalse(np.array_equal(mc.derive_seed(1, 0),
+                                        mc.derive_seed(1, 1)))
+        self.assertFalse(np.array_equal(mc.derive_seed(1, 0),
+                                        mc.derive_seed(2, 0)))
+
+    def test_run_parallel(self):
+        tasks = [(5,), (3,), (4,)]
+        serial = mc.run_parallel(_draw, tasks, 7)
+        parallel = mc.run_parallel(_draw, tasks, 7, workers=2)
+
+        self.assertListEqual([5, 3, 4], [len(result) for result in serial])
+        for expected, result in zip(serial, parallel):
+            ntest.assert_array_equal(expected, result)
+        ntest.assert_array_equal(
+            mc.spawn_random_states(7, 2)[1].normal(0, 1, 3), serial[1])
+
+    def test_itm_probability_reproducible(self):
+        strikes = np.arange(60., 80., 0.5)
+        expected = mc.calc_itm_probability(strikes, 70., 3.5, 100, 5000,
+                                           OptionType.CALL, block_size=700,
+                                           seed=3)
+        for workers in [2, 3]:
+            ntest.assert_array_equal(
+                expected,
+                mc.calc_itm_probability(strikes, 70., 3.5, 100, 5000,
+                                        OptionType.CALL, block_size=700,
+                                        seed=3, workers=workers))
+
+        other = mc.calc_itm_probability(strikes, 70., 3.5, 100, 5000,
+                                        OptionType.CALL, block_size=700,
+                                        seed=4)
+        self.assertFalse(np.array_equal(expected, other))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,8 @@
 import unittest
 
+import numpy as np
+import numpy.testing as ntest
+
 from option import Option
 import option
 
@@ -103,5 +106,130 @@ class OptionTests(unittest.TestCase):
         print(call2.delta)
 
 
+class OptionValuesTests(unittest.TestCase):
+    def setUp(self):
+        # Contracts from Stefanica, Joshi & Hull used by OptionTests, as a
+        # call & put pair for each
+        self.types = np.array([OptionType.CALL, OptionType.PUT] * 3)
+        self.strikes = np.array([40.0, 40.0, 110.0, 110.0, 50.0, 50.0])
+        self.underlying = np.array([42.0, 42.0, 100.0, 100.0, 49.0, 49.0])
+        self.sigmas = np.array([0.3, 0.3, 0.1, 0.1, 0.2, 0.2])
+        self.days = np.array([0.5, 0.5, 1.0, 1.0, 0.3846, 0.3846])
+        self.rates = np.array([0.05, 0.05, 0.05, 0.05, 0.05, 0.05])
+        self.dividends = np.array([0.03, 0.03, 0.0, 0.0, 0.0, 0.0])
+        self.values = option.calc_option_values(
+            self.types, self.strikes, self.underlying, self.sigmas,
+            self.days, 0.0, self.rates, self.dividends)
+
+    def test_reference_values(self):
+        values = self.values
+        # p104 of Stefanica MFE
+        ntest.assert_allclose([0.3832055088531541] * 2, values.d1[:2],
+                              rtol=1e-12)
+        ntest.assert_allclose([0.17107347449718982] * 2, values.d2[:2],
+                              rtol=1e-12)
+        ntest.assert_allclose([4.7053274115128225, 2.3430224293174966],
+                              values.price[:2], rtol=1e-12)
+
+        # p92 of Joshi
+        ntest.assert_allclose([2.174, 6.81], values.price[2:4], atol=5e-3)
+        ntest.assert_allclose([0.343, -0.657], values.delta[2:4], atol=5e-4)
+        ntest.assert_allclose([36.78, 36.78], values.vega[2:4], atol=5e-3)
+        ntest.assert_allclose([0.0368, 0.0368], values.gamma[2:4], atol=5e-5)
+
+        # p383 onwards of Hull
+        self.assertAlmostEqual(0.522, values.delta[4], places=3)
+        self.assertAlmostEqual(-4.31, values.theta[4], places=2)
+        self.assertAlmostEqual(0.066, values.gamma[4], places=2)
+        self.assertAlmostEqual(12.1, values.vega[4], places=1)
+        self.assertAlmostEqual(8.91, values.rho[4], places=2)
+
+    def test_put_call_parity(self):
+        calls = slice(0, None, 2)
+        puts = slice(1, None, 2)
+        values = self.values
+        spot_discount = np.exp(-self.dividends[calls] * self.days[calls])
+        strike_discount = np.exp(-self.rates[calls] * self.days[calls])
+
+        ntest.assert_allclose(
+            self.underlying[calls] * spot_discount -
+            self.strikes[calls] * strike_discount,
+            values.price[calls] - values.price[puts], rtol=1e-10)
+        ntest.assert_allclose(spot_discount,
+                              values.delta[calls] - values.delta[puts],
+                              rtol=1e-10)
+        ntest.assert_allclose(values.gamma[calls], values.gamma[puts],
+                              rtol=1e-10)
+        ntest.assert_allclose(values.vega[calls], values.vega[puts],
+                              rtol=1e-10)
+        ntest.assert_allclose(
+            self.strikes[calls] * self.days[calls] * strike_discount,
+            values.rho[calls] - values.rho[puts], rtol=1e-10)
+
+    def test_broadcast(self):
+        strikes = np.arange(90.0, 111.0, 5.0)
+        values = option.calc_option_values(OptionType.CALL, strikes, 100.0,
+                                           np.array([[0.2], [0.4]]), 0.5)
+
+        self.assertEqual((2, 5), values.price.shape)
+        ntest.assert_array_equal(
+            option.calc_option_values(OptionType.CALL, strikes, 100.0, 0.4,
+                                      0.5).delta,
+            values.delta[1])
+
+    def test_expired(self):
+        # d1 is 0 at expiry, as it is for Option
+        values = option.calc_option_values(
+            [OptionType.CALL, OptionType.PUT], 100.0, 110.0, 0.2, 0.5,
+            start_time=0.5)
+
+        ntest.assert_array_equal([0.0, 0.0], values.d1)
+        self.assertEqual(
+            Option(OptionType.CALL, 100.0, 110.0, 0.2, 0.5, 0.5).price,
+            values.price[0])
+
+
+class ImpliedVolatilitiesTests(unittest.TestCase):
+    def test_matches_brentq(self):
+        random = np.random.RandomState(5)
+        count = 50
+        types = np.where(random.rand(count) < 0.5, OptionType.CALL,
+                         OptionType.PUT)
+        strikes = np.round(random.uniform(70.0, 130.0, count))
+        sigmas = random.uniform(0.1, 1.0, count)
+        days = random.uniform(0.05, 2.0, count)
+        prices = option.calc_option_values(types, strikes, 100.0, sigmas,
+                                           days, 0.0, 0.02, 0.01).price
+
+        result, status = option.implied_volatilities(
+            types, strikes, 100.0, prices, days, 0.0, 0.02, 0.01)
+
+        self.assertTrue((status == option.SolverStatus.CONVERGED).all())
+        for i in range(count):
+            expected = option.implied_volatility(
+                types[i], strikes[i], 100.0, prices[i], days[i], 0.0, 0.02,
+                0.01)
+            self.assertTrue(abs(expected - result[i]) < 1e-8)
+
+    def test_textbook_values(self):
+        result, status = option.implied_volatilities(
+            [OptionType.CALL, OptionType.PUT], 40.0, 42.0, [4.71, 2.34], 0.5,
+            risk_free_rate=0.05, dividend_rate=0.03)
+        ntest.assert_array_almost_equal([0.3, 0.3], result, decimal=3)
+
+    def test_unsolvable(self):
+        result, status = option.implied_volatilities(
+            OptionType.CALL, 100.0, [110.0, 100.0, 100.0, 100.0],
+            [5.0, 99.0, 10.0, np.nan], [1.0, 1.0, 0.0, 1.0])
+
+        self.assertTrue(np.isnan(result).all())
+        ntest.assert_array_equal(
+            [option.SolverStatus.BELOW_INTRINSIC,
+             option.SolverStatus.ABOVE_MAXIMUM,
+             option.SolverStatus.INVALID_INPUT,
+             option.SolverStatus.INVALID_INPUT],
+            status)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -4,6 +4,7 @@ import unittest
 import numpy as np
 from numpy import random
 from numpy.testing import utils as np_utils
+from scipy.stats import norm
 
 from option import OptionType
 import price_series
@@ -137,6 +138,176 @@ class PriceSeriesTest(unittest.TestCase):
         np_utils.assert_array_almost_equal(iterative_ret, vectorised_ret)
 
 
+    def test_generate_random_walks(self):
+        random.seed(1)
+        expected = [np.cumsum(np.random.normal(0, 1, 5) * 2.) + 70.
+                    for i in range(3)]
+        random.seed(1)
+        series = price_series.generate_random_walks(5, 3, 70., 2.)
+
+        self.assertEqual((3, 5), series.shape)
+        np_utils.assert_array_equal(np.array(expected), series)
+
+    def test_generate_paths(self):
+        random.seed(2)
+        expected = np.array([price_series.generate_gbm_prices(
+            11, 70., 0.05, 0.3, 1.0)[1:] for i in range(4)])
+        random.seed(2)
+        paths = price_series.generate_paths(4, 10, 70., 0.3, 0.05)
+
+        self.assertEqual((4, 10), paths.shape)
+        np_utils.assert_array_almost_equal(expected, paths)
+
+    def test_generate_paths_float32(self):
+        random.seed(3)
+        paths = price_series.generate_paths(
+            100, 20, 70., 0.3, model=price_series.Model.ABM,
+            dtype=np.float32)
+        random.seed(3)
+        expected = price_series.generate_paths(
+            100, 20, 70., 0.3, model=price_series.Model.ABM)
+
+        self.assertEqual(np.float32, paths.dtype)
+        np_utils.assert_allclose(expected, paths, rtol=1e-5)
+
+    def test_generate_paths_random_state(self):
+        random.seed(5)
+        expected = price_series.generate_paths(10, 5, 70., 0.3)
+        paths = price_series.generate_paths(
+            10, 5, 70., 0.3, random_state=np.random.RandomState(5))
+        np_utils.assert_array_equal(expected, paths)
+
+    def test_generate_paths_terminal_only(self):
+        random.seed(4)
+        terminal = price_series.generate_paths(200000, 63, 100., 0.3, 0.05,
+                                               terminal_only=True)
+        paths = price_series.generate_paths(20000, 63, 100., 0.3, 0.05)
+
+        self.assertEqual((200000,), terminal.shape)
+        expected = 100. * math.exp(0.05 * 63 / 252.)
+        self.assertAlmostEqual(expected, terminal.mean(), delta=0.1)
+        self.assertAlmostEqual(expected, paths[:, -1].mean(), delta=0.3)
+        self.assertAlmostEqual(
+            0.3 * math.sqrt(63 / 252.),
+            np.log(terminal / 100.).std(), places=2)
+
+
+class TestEmpiricalCDF(unittest.TestCase):
+    def setUp(self):
+        self.values = np.random.RandomState(2).normal(70., 3.5, 2001)
+        # Strikes that fall on simulated values as well as between them
+        self.strikes = np.concatenate((np.arange(55., 85., 0.5),
+                                       self.values[:5]))
+        self.cdf = price_series.EmpiricalCDF(self.values)
+
+    def test_probabilities(self):
+        np_utils.assert_array_equal(
+            [(self.values > k).mean() for k in self.strikes],
+            self.cdf.probability_above(self.strikes))
+        np_utils.assert_array_equal(
+            [(self.values < k).mean() for k in self.strikes],
+            self.cdf.probability_below(self.strikes))
+        np_utils.assert_array_equal(
+            [((self.values > k) & (self.values < k + 2.)).mean()
+             for k in self.strikes],
+            self.cdf.probability_between(self.strikes, self.strikes + 2.))
+        self.assertEqual(0., self.cdf.probability_between(75., 65.))
+
+    def test_itm_probability(self):
+        np_utils.assert_array_equal(
+            self.cdf.probability_above(self.strikes),
+            self.cdf.itm_probability(self.strikes, OptionType.CALL))
+        np_utils.assert_array_equal(
+            self.cdf.probability_below(self.strikes),
+            self.cdf.itm_probability(self.strikes, OptionType.PUT))
+        np_utils.assert_allclose(
+            0.95 * 10. * self.cdf.probability_below(self.strikes),
+            self.cdf.digital_value(self.strikes, OptionType.PUT, 10., 0.95))
+
+    def test_nan_values_are_ignored(self):
+        cdf = price_series.EmpiricalCDF([np.NAN, 1., 2., 3., np.NAN])
+        self.assertEqual(3, len(cdf))
+        self.assertAlmostEqual(1. / 3., cdf.probability_above(2.5))
+
+    def test_final_price_cdf(self):
+        np.random.seed(3)
+        cdf = price_series.final_price_cdf(70., 3.5, 100, 1000)
+        np.random.seed(3)
+        result = price_series.calc_itm_probability(self.strikes, 70., 3.5,
+                                                   100, 1000, OptionType.CALL)
+        np_utils.assert_array_equal(
+            cdf.itm_probability(self.strikes, OptionType.CALL), result[:, 1])
+
+
+class TestVarianceReduction(unittest.TestCase):
+    price = 70.0
+    sigma = 0.35
+    periods = 100
+    strikes = np.array([60., 65., 69., 70., 73., 76.])
+
+    def itm_probability(self, type, method, count=10000, seed=1):
+        return price_series.calc_itm_probability(
+            self.strikes, self.price, self.sigma, self.periods, count, type,
+            method=method, random_state=np.random.RandomState(seed))
+
+    def exact(self, type):
+        scale = self.sigma * math.sqrt(self.periods)
+        z = (self.price - self.strikes) / scale
+        return norm.cdf(z) if type == OptionType.CALL else norm.cdf(-z)
+
+    def test_plain(self):
+        np.random.seed(6)
+        final_prices = price_series.generate_paths(
+            1000, self.periods, self.price, self.sigma, dt=1.0,
+            model=price_series.Model.ABM, terminal_only=True)
+        np.random.seed(6)
+        result = price_series.calc_itm_probability(
+            self.strikes, self.price, self.sigma, self.periods, 1000,
+            OptionType.PUT)
+
+        self.assertEqual((len(self.strikes), 3), result.shape)
+        np_utils.assert_array_equal(self.strikes, result[:, 0])
+        hits = final_prices[:, np.newaxis] < self.strikes
+        np_utils.assert_array_equal(hits.mean(axis=0), result[:, 1])
+        np_utils.assert_allclose(hits.std(axis=0, ddof=1) / math.sqrt(1000),
+                                 result[:, 2])
+
+    def test_estimates_are_within_error(self):
+        VR = price_series.VarianceReduction
+        for type in [OptionType.CALL, OptionType.PUT]:
+            exact = self.exact(type)
+            for method in [VR.NONE, VR.ANTITHETIC, VR.CONTROL_VARIATE,
+                           VR.QUASI_RANDOM, VR.IMPORTANCE_SAMPLING]:
+                result = self.itm_probability(type, method)
+                error = np.abs(result[:, 1] - exact)
+                self.assertTrue((error <= 4 * result[:, 2] + 1e-12).all(),
+                                'type {} method {}'.format(type, method))
+
+    def test_standard_error_is_reduced(self):
+        VR = price_series.VarianceReduction
+        plain = self.itm_probability(OptionType.PUT, VR.NONE)[:, 2]
+        result = self.itm_probability(OptionType.PUT, VR.QUASI_RANDOM)
+        self.assertTrue((result[:, 2] < plain / 2).all())
+        # The lognormal control is least correlated deep in the tail
+        result = self.itm_probability(OptionType.PUT, VR.CONTROL_VARIATE)
+        self.assertTrue((result[1:, 2] < plain[1:] / 2).all())
+
+        # Antithetic pairs only help away from the money
+        result = self.itm_probability(OptionType.PUT, VR.ANTITHETIC)
+        self.assertTrue((result[:, 2] <= plain * 1.1).all())
+
+        # Tail strikes gain the most from importance sampling
+        result = self.itm_probability(OptionType.PUT, VR.IMPORTANCE_SAMPLING)
+        self.assertTrue(result[0, 2] < plain[0] / 5)
+
+    def test_unknown_method(self):
+        self.assertRaises(ValueError, self.itm_probability, OptionType.PUT, -1)
+
+    def test_van_der_corput(self):
+        np_utils.assert_array_equal(
+            [0.5, 0.25, 0.75, 0.125, 0.625, 0.375, 0.875],
+            price_series.van_der_corput(7))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -1,5 +1,9 @@
 import unittest
 
+import numpy as np
+import numpy.testing as ntest
+
+import option
 import risk_slide as rs
 
 
@@ -9,4 +13,193 @@ class RiskSlideTest(unittest.TestCase):
         self.assertEqual(8, len(positions))
 
     def test_risk_slide(self):
-        pass
+        positions = rs.Positions.from_frame(
+            rs.load_positions('data/positions.csv'))
+        spot_shifts = [-0.1, 0.0, 0.05]
+        vol_shifts = [-0.05, 0.0, 0.1]
+        days_forward = [0, 10, 30]
+
+        result = rs.slide(positions, 100.0, 0.4, 90.0 / 365.0, 0.02,
+                          spot_shifts, vol_shifts, days_forward,
+                          chunk_size=3)
+
+        self.assertEqual((3, 3, 3), result.delta.shape)
+        for i, spot_shift in enumerate(spot_shifts):
+            for j, vol_shift in enumerate(vol_shifts):
+                for k, days in enumerate(days_forward):
+                    expected = self._evaluate(
+                        positions, 100.0 * (1 + spot_shift), 0.4 + vol_shift,
+                        (90.0 - days) / 365.0)
+                    for measure, value in expected.items():
+                        self.assertAlmostEqual(
+                            value, result.measures[measure][i, j, k],
+                            places=8)
+
+        base = self._evaluate(positions, 100.0, 0.4, 90.0 / 365.0)['value']
+        ntest.assert_allclose(result.value - base, result.pnl,
+                              atol=1e-8 * abs(base))
+        self.assertAlmostEqual(0.0, result.pnl[1, 1, 0], places=8)
+
+    def test_leg_expires_within_slide(self):
+        # Call expiring in 5 days, slid to and past its expiry
+        positions = rs.Positions([95.0], ['C'], [2.0])
+        result = rs.slide(positions, 100.0, 0.3, 5.0 / 365.0,
+                          spot_shifts=[-0.1, 0.0, 0.1],
+                          vol_shifts=[-0.3, 0.0], days_forward=[0, 5, 10])
+
+        for i, spot in enumerate([90.0, 100.0, 110.0]):
+            intrinsic = max(spot - 95.0, 0.0) * 2.0 * 100.0
+            # Expired, or without volatility
+            for j, k in [(0, 0), (0, 1), (0, 2), (1, 1), (1, 2)]:
+                self.assertAlmostEqual(intrinsic, result.value[i, j, k])
+                self.assertEqual(200.0 if spot > 95.0 else 0.0,
+                                 result.delta[i, j, k])
+                self.assertEqual(0.0, result.gamma[i, j, k])
+                self.assertEqual(0.0, result.vega[i, j, k])
+                self.assertEqual(0.0, result.theta[i, j, k])
+
+            opt = option.Option('C', 95.0, spot, 0.3, 5.0 / 365.0)
+            self.assertAlmostEqual(opt.price * 200.0, result.value[i, 1, 0],
+                                   places=8)
+
+    def test_zero_volatility_leg(self):
+        # Put with time left but no volatility, with a non-zero rate
+        positions = rs.Positions([105.0], ['P'], [-3.0])
+        time = 30.0 / 365.0
+        result = rs.slide(positions, 100.0, 0.0, time, 0.05,
+                          spot_shifts=[0.0, 0.1], days_forward=[0, 30])
+
+        discounted_strike = 105.0 * np.exp(-0.05 * time)
+        self.assertAlmostEqual((discounted_strike - 100.0) * -300.0,
+                               result.value[0, 0, 0])
+        self.assertAlmostEqual(300.0, result.delta[0, 0, 0])
+        self.assertAlmostEqual(0.05 * discounted_strike * -300.0 / 365.0,
+                               result.theta[0, 0, 0])
+        self.assertEqual(0.0, result.gamma[0, 0, 0])
+        self.assertEqual(0.0, result.vega[0, 0, 0])
+        # Expired
+        self.assertAlmostEqual(5.0 * -300.0, result.value[0, 0, 1])
+        self.assertEqual(0.0, result.theta[0, 0, 1])
+        # Out of the money
+        self.assertEqual(0.0, result.value[1, 0, 0])
+        self.assertEqual(0.0, result.delta[1, 0, 0])
+
+        # Matches a small volatility
+        small = rs.slide(positions, 100.0, 1e-6, time, 0.05)
+        self.assertAlmostEqual(small.value[0, 0, 0], result.value[0, 0, 0],
+                               places=6)
+        self.assertAlmostEqual(small.theta[0, 0, 0], result.theta[0, 0, 0],
+                               places=6)
+
+    def test_to_frame(self):
+        positions = rs.Positions.from_frame(
+            rs.load_positions('data/positions.csv'))
+        result = rs.slide(positions, 100.0, 0.4, 90.0 / 365.0,
+                          spot_shifts=[-0.1, 0.0], vol_shifts=[0.0, 0.1])
+
+        df = result.to_frame()
+        self.assertEqual(4, len(df))
+        self.assertListEqual(rs.MEASURES, list(df.columns))
+        self.assertEqual(result.delta[1, 1, 0], df['delta'][(0.0, 0.1, 0)])
+
+    def test_aggregate(self):
+        positions = rs.Positions.from_frame(
+            rs.load_positions('data/positions_book.csv'))
+        market_data = rs.load_market_data('data/market_data.csv')
+
+        report = rs.aggregate(positions, market_data, 0.01,
+                              spot_shift=-0.05, vol_shift=0.02,
+                              days_forward=7)
+
+        self.assertListEqual(['AAPL', 'IBM', 'MSFT'], list(report.index))
+        for underlying in report.index:
+            spot = market_data['Spot'][underlying]
+            legs = positions.underlyings == underlying
+            expected = dict((measure, 0.0) for measure in rs.MEASURES)
+            for strike, type, qty, expiry, sigma in zip(
+                    positions.strikes[legs], positions.types[legs],
+                    positions.quantities[legs], positions.expiries[legs],
+                    positions.sigmas[legs]):
+                if type == rs.STOCK:
+                    expected['value'] += spot * 0.95 * qty
+                    expected['pnl'] += -spot * 0.05 * qty
+                    expected['delta'] += qty
+                    continue
+                if np.isnan(sigma):
+                    sigma = market_data['Sigma'][underlying]
+                base = option.Option(type, strike, spot, sigma, expiry,
+                                     risk_free_rate=0.01)
+                opt = option.Option(type, strike, spot * 0.95, sigma + 0.02,
+                                    expiry - 7 / 365.0, risk_free_rate=0.01)
+                expected['value'] += opt.price * qty * 100.0
+                expected['pnl'] += (opt.price - base.price) * qty * 100.0
+                expected['delta'] += opt.delta * qty * 100.0
+                expected['gamma'] += opt.gamma * qty * 100.0
+                expected['vega'] += opt.vega * qty
+                expected['theta'] += opt.theta * qty * 100.0 / 365.0
+
+            for measure, value in expected.items():
+                self.assertAlmostEqual(value, report[measure][underlying],
+                                       places=8)
+
+    def test_aggregate_expired_leg(self):
+        # The MSFT call expires 5 days into the 10 day shift
+        positions = rs.Positions(
+            [100.0, 50.0, 45.0, 48.0], ['C', 'P', 'C', rs.STOCK],
+            [-10.0, 4.0, 20.0, 300.0], ['AAPL', 'AAPL', 'MSFT', 'MSFT'],
+            [0.25, 0.5, 5.0 / 365.0, np.NAN])
+        market_data = rs.load_market_data('data/market_data.csv') \
+            .loc[['AAPL', 'MSFT']]
+
+        report = rs.aggregate(positions, market_data, 0.01, spot_shift=0.1,
+                              days_forward=10)
+
+        time = 10.0 / 365.0
+        aapl_call = option.Option('C', 100.0, 101.5 * 1.1, 0.3, 0.25 - time,
+                                  risk_free_rate=0.01)
+        aapl_put = option.Option('P', 50.0, 101.5 * 1.1, 0.3, 0.5 - time,
+                                 risk_free_rate=0.01)
+        aapl_value = (aapl_call.price * -10.0 + aapl_put.price * 4.0) * 100.0
+        aapl_delta = (aapl_call.delta * -10.0 + aapl_put.delta * 4.0) * 100.0
+        msft_spot = 46.4 * 1.1
+        msft_value = (msft_spot - 45.0) * 20.0 * 100.0 + msft_spot * 300.0
+        msft_delta = 20.0 * 100.0 + 300.0
+
+        self.assertAlmostEqual(aapl_value, report['value']['AAPL'], places=8)
+        self.assertAlmostEqual(aapl_delta, report['delta']['AAPL'], places=8)
+        self.assertAlmostEqual(msft_value, report['value']['MSFT'], places=8)
+        self.assertAlmostEqual(msft_delta, report['delta']['MSFT'], places=8)
+        self.assertAlmostEqual(0.0, report['gamma']['MSFT'])
+        self.assertAlmostEqual(0.0, report['vega']['MSFT'])
+        self.assertAlmostEqual(0.0, report['theta']['MSFT'])
+
+        total = rs.book_total(report)
+        self.assertAlmostEqual(aapl_value + msft_value, total['value'],
+                               places=8)
+        self.assertAlmostEqual(aapl_delta + msft_delta, total['delta'],
+                               places=8)
+
+    def test_aggregate_missing_market_data(self):
+        positions = rs.Positions.from_frame(
+            rs.load_positions('data/positions_book.csv'))
+        market_data = rs.load_market_data('data/market_data.csv')
+        self.assertRaises(ValueError, rs.aggregate, positions,
+                          market_data.drop('IBM'))
+
+    def _evaluate(self, positions, underlying, sigma, time):
+        expected = dict((measure, 0.0) for measure in rs.MEASURES)
+        for strike, type, qty in zip(positions.strikes, positions.types,
+                                     positions.quantities):
+            if type == rs.STOCK:
+                expected['value'] += underlying * qty
+                expected['delta'] += qty
+                continue
+            opt = option.Option(type, strike, underlying, sigma, time,
+                                risk_free_rate=0.02)
+            expected['value'] += opt.price * qty * 100.0
+            expected['delta'] += opt.delta * qty * 100.0
+            expected['gamma'] += opt.gamma * qty * 100.0
+            expected['vega'] += opt.vega * qty
+            expected['theta'] += opt.theta * qty * 100.0 / 365.0
+        del expected['pnl']
+        return expected
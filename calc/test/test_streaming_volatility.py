@@ -0,0 +1,96 @@
+import unittest
+
+import numpy as np
+import numpy.testing as ntest
+import pandas as pd
+
+import data_loader as dl
+import streaming_volatility as sv
+import volatility_models as vol
+
+
+class TestStreamingVolatility(unittest.TestCase):
+
+    def setUp(self):
+        random = np.random.RandomState(10)
+        days = 300
+        self.close = 100.0 * np.exp(np.cumsum(random.normal(0, 0.01, days)))
+        self.open = self.close * np.exp(random.normal(0, 0.002, days))
+        self.high = np.maximum(self.open, self.close) * \
+            np.exp(np.abs(random.normal(0, 0.005, days)))
+        self.low = np.minimum(self.open, self.close) * \
+            np.exp(-np.abs(random.normal(0, 0.005, days)))
+
+    def test_close_to_close(self):
+        self.assert_replay_equal(
+            sv.CloseToCloseEstimator,
+            lambda lookback: vol.population_std_dev(self.close, lookback))
+
+    def test_parkinson(self):
+        self.assert_replay_equal(
+            sv.ParkinsonEstimator,
+            lambda lookback: vol.parkinson_std_dev(self.high, self.low,
+                                                   lookback))
+
+    def test_garman_klass(self):
+        self.assert_replay_equal(
+            sv.GarmanKlassEstimator,
+            lambda lookback: vol.garman_klass_std_dev(
+                self.close, self.open, self.high, self.low, lookback))
+
+    def test_rogers_satchell(self):
+        self.assert_replay_equal(
+            sv.RogersSatchellEstimator,
+            lambda lookback: vol.rogers_satchell_std_dev(
+                self.close, self.open, self.high, self.low, lookback))
+
+    def test_yang_zhang(self):
+        self.assert_replay_equal(
+            sv.YangZhangEstimator,
+            lambda lookback: vol.yang_zhang_std_dev(
+                self.close, self.open, self.high, self.low, lookback))
+
+    def test_missing_price(self):
+        self.close[100] = np.NAN
+        self.assert_replay_equal(
+            sv.YangZhangEstimator,
+            lambda lookback: vol.yang_zhang_std_dev(
+                self.close, self.open, self.high, self.low, lookback))
+
+    def test_intraday_bars(self):
+        data = dl.load_intraday_data('SP500', 'intraday', ['AAPL'])
+        bars = pd.concat([data['AAPL'][date]
+                          for date in sorted(data['AAPL'].keys())])
+
+        estimator = sv.ParkinsonEstimator(30, periods_per_day=391)
+        results = [estimator.push(bar) for timestamp, bar in bars.iterrows()]
+
+        expected = vol.parkinson_std_dev(bars['high'].values,
+                                         bars['low'].values, 30) * \
+            np.sqrt(391)
+        ntest.assert_allclose(expected, results, rtol=1e-8)
+
+    def test_rolling_window(self):
+        window = sv.RollingWindow(3)
+        for value in [1., 2., 3., 4., 5.]:
+            window.push(value)
+
+        self.assertEqual(3, len(window._values))
+        self.assertAlmostEqual(12., window.total())
+        self.assertAlmostEqual(1., window.variance())
+
+    def assert_replay_equal(self, estimator_class, batch):
+        for lookback in [2, 10, 30]:
+            expected = batch(lookback)
+
+            estimator = estimator_class(lookback)
+            results = [estimator.push({'open': o, 'high': h, 'low': l,
+                                       'close': c})
+                       for o, h, l, c in zip(self.open, self.high,
+                                             self.low, self.close)]
+
+            ntest.assert_allclose(expected, results, rtol=1e-8)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+
+import numpy as np
+import numpy.testing as ntest
+import pandas as pd
+
+import volatility_cones as cones
+import volatility_models as vol
+
+
+class TestVolatilityCones(unittest.TestCase):
+
+    def setUp(self):
+        random = np.random.RandomState(10)
+        days = 500
+        self.close = 100.0 * np.exp(np.cumsum(random.normal(0, 0.01, days)))
+        self.open = self.close * np.exp(random.normal(0, 0.002, days))
+        self.high = np.maximum(self.open, self.close) * \
+            np.exp(np.abs(random.normal(0, 0.005, days)))
+        self.low = np.minimum(self.open, self.close) * \
+            np.exp(-np.abs(random.normal(0, 0.005, days)))
+
+    def test_calc_cones(self):
+        lookbacks = [20, 60]
+        quantiles = [0., 0.5, 1.]
+        result = cones.calc_cones(self.close, self.open, self.high, self.low,
+                                  lookbacks, ['std_dev', 'yang_zhang'],
+                                  quantiles)
+
+        self.assertEqual((4, 3), result.shape)
+
+        for lookback in lookbacks:
+            std_dev = vol.population_std_dev(self.close, lookback)
+            yang_zhang = vol.yang_zhang_std_dev(self.close, self.open,
+                                                self.high, self.low,
+                                                lookback)
+
+            for estimator, expected in [('std_dev', std_dev),
+                                        ('yang_zhang', yang_zhang)]:
+                expected = expected[~np.isnan(expected)]
+                ntest.assert_allclose(
+                    [expected.min(), np.median(expected), expected.max()],
+                    result.loc[(lookback, estimator)].values, rtol=1e-10)
+
+    def test_calc_universe_cones(self):
+        df = pd.DataFrame({'Close': self.close, 'Open': self.open,
+                           'High': self.high, 'Low': self.low})
+        price_data = {'A': df, 'B': df.iloc[:300]}
+
+        result = cones.calc_universe_cones(price_data, lookbacks=[20])
+
+        self.assertEqual(2 * len(cones.CONE_ESTIMATORS), len(result))
+        ntest.assert_allclose(
+            cones.calc_cones(self.close[:300], self.open[:300],
+                             self.high[:300], self.low[:300],
+                             lookbacks=[20]).values,
+            result.loc['B'].values)
+
+    def test_lookback_exceeds_prices(self):
+        result = cones.calc_cones(self.close[:10], lookbacks=[20],
+                                  estimators=['std_dev'])
+        self.assertTrue(np.isnan(result.values).all())
+
+
+if __name__ == '__main__':
+    unittest.main()
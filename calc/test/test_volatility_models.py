@@ -1,5 +1,6 @@
 import unittest
 
+import numpy as np
 import numpy.testing as ntest
 import pandas as pd
 
@@ -99,6 +100,151 @@ class TestVolatilityModels(unittest.TestCase):
         vol.intraday_data_returns(data, ['AAPL'])
 
 
+class TestRollingWindows(unittest.TestCase):
+
+    def setUp(self):
+        random = np.random.RandomState(10)
+        self.values = random.normal(0.001, 0.02, 500)
+        self.values[0] = np.inf
+        self.values[250] = np.NAN
+
+    def test_rolling_sum(self):
+        for lookback in [1, 2, 10, 30, 250]:
+            expected = self._windowed(np.sum, lookback)
+            ntest.assert_allclose(expected, vol._rolling_sum(self.values,
+                                                             lookback),
+                                  rtol=1e-10, atol=1e-14)
+
+    def test_rolling_variance(self):
+        for lookback in [2, 10, 30, 250]:
+            expected = self._windowed(lambda x: x.var(ddof=1), lookback)
+            ntest.assert_allclose(expected,
+                                  vol._rolling_variance(self.values,
+                                                        lookback),
+                                  rtol=1e-10, atol=1e-14)
+
+    def test_lookback_exceeds_size(self):
+        self.assertTrue(np.isnan(vol._rolling_sum(self.values, 501)).all())
+
+    def _windowed(self, func, lookback):
+        results = np.zeros(len(self.values))
+        results[:] = np.NAN
+        for i in range(lookback - 1, len(self.values)):
+            window = self.values[i - (lookback - 1):i + 1]
+            if np.isfinite(window).all():
+                results[i] = func(window)
+        return results
+
+
+class TestFirstExit(unittest.TestCase):
+
+    def setUp(self):
+        random = np.random.RandomState(10)
+        self.bars_per_day = 50
+        self.day_count = 30
+        self.prices = np.cumsum(random.normal(
+            0, 0.001, self.bars_per_day * self.day_count))
+
+    def test_first_exit(self):
+        delta = 0.002
+        lookback = 5
+        result = vol.first_exit(self.prices, delta, lookback, self.day_count,
+                                self.bars_per_day)
+
+        expected = np.zeros(self.day_count)
+        expected[:] = np.NAN
+        events = self._exit_events(delta)
+        for day in range(lookback - 1, self.day_count):
+            window = [tau for i, tau in events
+                      if day - lookback < i // self.bars_per_day <= day]
+            expected[day] = delta / np.sqrt(np.mean(window))
+        expected = vol.annualise(
+            expected / (1. + (1. / (4. * lookback * self.bars_per_day))),
+            self.bars_per_day)
+
+        ntest.assert_allclose(expected, result)
+
+    def test_first_exit_multiple_deltas(self):
+        deltas = [0.001, 0.002, 0.004]
+        result = vol.first_exit(self.prices, deltas, 5, self.day_count,
+                                self.bars_per_day)
+        self.assertEqual((3, self.day_count), result.shape)
+        for i, delta in enumerate(deltas):
+            ntest.assert_array_equal(
+                vol.first_exit(self.prices, delta, 5, self.day_count,
+                               self.bars_per_day),
+                result[i])
+
+    def test_exit_events_leading_nan(self):
+        prices = np.array([np.NAN, 1., 1.5, 2., 0.9, 1., 1.2])
+        exit_idx, exit_times = vol._exit_events(prices, 1.)
+        ntest.assert_array_equal([3, 4], exit_idx)
+        ntest.assert_array_equal([2, 1], exit_times)
+
+    def _exit_events(self, delta):
+        events = []
+        reference = self.prices[0]
+        count = 0
+        for i in range(1, len(self.prices)):
+            count += 1
+            price = self.prices[i]
+            if price >= reference + delta or price <= reference - delta:
+                events.append((i, count))
+                count = 0
+                reference = price
+        return events
+
+
+class TestIntradaySeries(unittest.TestCase):
+
+    def setUp(self):
+        random = np.random.RandomState(3)
+        self.bar_counts = [4, 4, 3]
+        self.daily_prices = {}
+        for i, count in enumerate(self.bar_counts):
+            self.daily_prices['2014081{}'.format(i + 1)] = pd.DataFrame(
+                {'close': 100. + random.normal(0, 1, count)})
+
+    def test_intraday_prices(self):
+        expected = np.hstack([self.daily_prices[date]['close'].values
+                              for date in sorted(self.daily_prices)])
+        ntest.assert_array_equal(expected,
+                                 vol.intraday_prices(self.daily_prices))
+
+    def test_intraday_returns(self):
+        prices = vol.intraday_prices(self.daily_prices)
+        returns = vol.intraday_returns(self.daily_prices)
+
+        self.assertTrue(np.isnan(returns[0]))
+        ntest.assert_allclose(np.log(prices[1:] / prices[:-1]), returns[1:])
+
+    def test_by_day(self):
+        result, boundaries = vol.intraday_prices(self.daily_prices,
+                                                 by_day=True)
+        prices = vol.intraday_prices(self.daily_prices)
+
+        ntest.assert_array_equal([0, 4, 8, 11], boundaries)
+        ntest.assert_array_equal(boundaries,
+                                 vol.day_boundaries(self.daily_prices))
+        self.assertEqual((3, 4), result.shape)
+        ntest.assert_array_equal(prices[4:8], result[1])
+        ntest.assert_array_equal(prices[8:], result[2, :3])
+        self.assertTrue(np.isnan(result[2, 3]))
+
+    def test_by_day_uniform_is_view(self):
+        values = np.arange(12.)
+        result = vol._by_day(values, np.array([0, 4, 8, 12]))
+        self.assertEqual((3, 4), result.shape)
+        self.assertTrue(np.may_share_memory(values, result))
+
+    def test_first_exit_boundaries(self):
+        random = np.random.RandomState(4)
+        prices = np.cumsum(random.normal(0, 0.001, 200))
+        boundaries = np.arange(0, 201, 20)
+        ntest.assert_array_equal(
+            vol.first_exit(prices, 0.002, 3, 10, 20),
+            vol.first_exit(prices, 0.002, 3, 10, 20, boundaries=boundaries))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,157 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import numpy.testing as ntest
+import pandas as pd
+
+from datatypes import OptionType
+import option
+import volatility_surface as vs
+
+
+DATE = '20140908'
+EXPIRIES = {'20141008': 30, '20141207': 90, '20150908': 365}
+UNDERLYING_PRICE = 100.0
+STRIKES = np.arange(60.0, 141.0, 5.0)
+
+
+def skew(strike, time_to_expiry):
+    return 0.2 + 0.1 * (1 - strike / UNDERLYING_PRICE) + 0.05 * time_to_expiry
+
+
+def create_chain(volatility=skew):
+    chain = {}
+    for expiry, days in EXPIRIES.items():
+        chain[expiry] = {}
+        time_to_expiry = days / vs.DAYS_IN_YEAR
+        for type in [OptionType.CALL, OptionType.PUT]:
+            prices = option.calc_option_values(
+                type, STRIKES, UNDERLYING_PRICE,
+                volatility(STRIKES, time_to_expiry), time_to_expiry).price
+            last_prices = np.array(['{:.17g}'.format(price)
+                                    for price in prices])
+            # Unquoted contracts should be ignored
+            last_prices[0] = '-'
+            chain[expiry][type] = pd.DataFrame(
+                {'BID': '-', 'ASK': '-', 'LAST_PRICE': last_prices},
+                index=pd.Index(STRIKES, name='STRIKE'))
+    return chain
+
+
+class TestVolatilitySurface(unittest.TestCase):
+
+    def setUp(self):
+        self.chain = create_chain()
+        self.surface = vs.build_surface(self.chain, UNDERLYING_PRICE, DATE)
+
+    def test_grid(self):
+        ntest.assert_allclose(sorted(EXPIRIES.values()),
+                              self.surface.expiries * vs.DAYS_IN_YEAR)
+        self.assertEqual((3, len(vs.MONEYNESS)),
+                         self.surface.volatilities.shape)
+
+    def test_volatility_at_grid_points(self):
+        for time_to_expiry in self.surface.expiries:
+            strikes = np.array([70.0, 95.0, 100.0, 105.0, 130.0])
+            ntest.assert_allclose(
+                skew(strikes, time_to_expiry),
+                self.surface.volatility(strikes, time_to_expiry), rtol=1e-6)
+
+    def test_volatility_between_expiries(self):
+        time_to_expiry = 180 / vs.DAYS_IN_YEAR
+        result = self.surface.volatility(100.0, time_to_expiry)
+
+        expiries = self.surface.expiries
+        weight = (time_to_expiry - expiries[1]) / (expiries[2] - expiries[1])
+        expected = np.sqrt(
+            ((1 - weight) * skew(100.0, expiries[1])**2 * expiries[1] +
+             weight * skew(100.0, expiries[2])**2 * expiries[2]) /
+            time_to_expiry)
+        self.assertAlmostEqual(expected, result, places=6)
+
+    def test_flat_extrapolation(self):
+        expiries = self.surface.expiries
+        self.assertAlmostEqual(self.surface.volatility(100.0, expiries[0]),
+                               self.surface.volatility(100.0, 1 / 365.0))
+        self.assertAlmostEqual(self.surface.volatility(150.0, expiries[0]),
+                               self.surface.volatility(400.0, expiries[0]))
+
+    def test_no_solvable_contracts(self):
+        chain = create_chain()
+        for expiry in chain:
+            for type in chain[expiry]:
+                chain[expiry][type]['LAST_PRICE'] = '-'
+        self.assertIsNone(vs.build_surface(chain, UNDERLYING_PRICE, DATE))
+
+    def test_build_surfaces(self):
+        directory = tempfile.mkdtemp()
+        try:
+            option_data = {'TEST': {DATE: self.chain}}
+            underlying_prices = {
+                'TEST': pd.Series([UNDERLYING_PRICE],
+                                  index=[pd.Timestamp(DATE)])}
+
+            surfaces = vs.build_surfaces(option_data, underlying_prices,
+                                         directory)
+            self.assertTrue(os.path.exists(
+                vs.get_surface_file(directory, 'TEST', DATE)))
+            ntest.assert_array_equal(self.surface.volatilities,
+                                     surfaces['TEST'][DATE].volatilities)
+
+            # Stored surfaces are used for the same inputs
+            filename = vs.get_surface_file(directory, 'TEST', DATE)
+            stored = vs.VolatilitySurface.load(filename)
+            stored.volatilities = stored.volatilities + 0.01
+            stored.save(filename)
+            surfaces = vs.build_surfaces(option_data, underlying_prices,
+                                         directory)
+            ntest.assert_array_equal(stored.volatilities,
+                                     surfaces['TEST'][DATE].volatilities)
+
+            loaded = vs.load_surface(directory, 'TEST', DATE)
+            self.assertEqual(stored.volatility(95.0, 0.5),
+                             loaded.volatility(95.0, 0.5))
+            self.assertIsNone(vs.load_surface(directory, 'TEST', '20140909'))
+        finally:
+            shutil.rmtree(directory)
+
+    def test_build_surfaces_rebuilds_stale(self):
+        directory = tempfile.mkdtemp()
+        try:
+            option_data = {'TEST': {DATE: self.chain}}
+            underlying_prices = {
+                'TEST': pd.Series([UNDERLYING_PRICE],
+                                  index=[pd.Timestamp(DATE)])}
+            vs.build_surfaces(option_data, underlying_prices, directory)
+
+            surfaces = vs.build_surfaces(option_data, underlying_prices,
+                                         directory, risk_free_rate=0.05)
+            self.assertEqual(0.05, surfaces['TEST'][DATE].risk_free_rate)
+            self.assertFalse(np.array_equal(
+                self.surface.volatilities,
+                surfaces['TEST'][DATE].volatilities))
+
+            moneyness = np.linspace(0.8, 1.2, 5)
+            surfaces = vs.build_surfaces(option_data, underlying_prices,
+                                         directory, moneyness=moneyness)
+            ntest.assert_array_equal(moneyness,
+                                     surfaces['TEST'][DATE].moneyness)
+
+            # Quotes change
+            option_data['TEST'][DATE] = create_chain(lambda strike, time: 0.3)
+            surfaces = vs.build_surfaces(option_data, underlying_prices,
+                                         directory)
+            ntest.assert_allclose(0.3, surfaces['TEST'][DATE].volatilities,
+                                  rtol=1e-6)
+            ntest.assert_array_equal(
+                surfaces['TEST'][DATE].volatilities,
+                vs.load_surface(directory, 'TEST', DATE).volatilities)
+        finally:
+            shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+"""
+Volatility cones summarise the distribution of an estimator's volatility at
+a number of lookbacks, i.e. min, max & percentiles of the 20 day, 40 day,
+60 day etc. volatility over the history of a price series
+"""
+
+import numpy as np
+import pandas as pd
+
+import volatility_models as vm
+
+
+LOOKBACKS = [20, 40, 60, 120, 250]
+# Names of volatility_models.ESTIMATORS shown in a cone
+CONE_ESTIMATORS = ['std_dev', 'parkinson', 'garman_klass', 'rogers_satchell',
+                   'yang_zhang']
+# 0 and 1 give the min and max
+QUANTILES = [0., 0.25, 0.5, 0.75, 1.]
+
+PRICE_FIELDS = ('Close', 'Open', 'High', 'Low')
+
+
+def calc_cones(close_prices, open_prices=None, high_prices=None,
+               low_prices=None, lookbacks=LOOKBACKS,
+               estimators=CONE_ESTIMATORS, quantiles=QUANTILES):
+    """
+    Volatility cone for each lookback and estimator in a single pass over
+    the prices. The log price ratios and their prefix sums are computed once
+    and shared across all lookbacks and estimators.
+
+    :param estimators: names of estimators in volatility_models.ESTIMATORS
+    :return DataFrame indexed by (lookback, estimator) with a column of
+    annualised volatility for each quantile
+    """
+    terms = vm.LogTerms(close_prices, open_prices, high_prices, low_prices)
+
+    index = []
+    results = np.zeros((len(lookbacks) * len(estimators), len(quantiles)))
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for lookback in lookbacks:
+            for estimator in estimators:
+                volatility = vm.annualise(
+                    vm.ESTIMATORS[estimator](terms, lookback))
+                results[len(index)] = _calc_quantiles(volatility, quantiles)
+                index.append((lookback, estimator))
+
+    return pd.DataFrame(
+        results,
+        index=pd.MultiIndex.from_tuples(index,
+                                        names=['lookback', 'estimator']),
+        columns=pd.Index(quantiles, name='quantile'))
+
+
+def calc_universe_cones(price_data, symbols=None, lookbacks=LOOKBACKS,
+                        estimators=CONE_ESTIMATORS, quantiles=QUANTILES,
+                        fields=PRICE_FIELDS):
+    """
+    Volatility cones for a universe of symbols, as loaded by
+    data_loader.load_price_data
+
+    :param fields: names of the close, open, high and low columns
+    :return DataFrame indexed by (symbol, lookback, estimator)
+    """
+    if symbols is None:
+        symbols = sorted(price_data.keys())
+
+    close, open, high, low = fields
+
+    cones = []
+    for symbol in symbols:
+        df = price_data[symbol]
+        cones.append(calc_cones(df[close].values, df[open].values,
+                                df[high].values, df[low].values,
+                                lookbacks, estimators, quantiles))
+
+    return pd.concat(cones, keys=symbols, names=['symbol'])
+
+
+def _calc_quantiles(volatility, quantiles):
+    volatility = volatility[np.isfinite(volatility)]
+    if len(volatility) == 0:
+        return np.NAN
+    return np.percentile(volatility, np.asarray(quantiles) * 100.)
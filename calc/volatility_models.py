@@ -21,22 +21,148 @@ def population_variance(returns):
     return (N / (N - 1)) * sample_variance(returns)
 
 
+def _prefix_sums(values):
+    """
+    Cumulative sums of values, along with a cumulative count of non-finite
+    values. Non-finite values contribute zero to the sums.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    finite = np.isfinite(values)
+    sums = np.concatenate(([0.], np.cumsum(np.where(finite, values, 0.))))
+    invalid = np.concatenate(([0], np.cumsum(~finite)))
+    return sums, invalid
+
+
+def _window_sums(prefix_sums, lookback):
+    """
+    Sums over the trailing lookback values from prefix sums, where the
+    result at index i covers values [i - (lookback - 1), i]. Windows which
+    are incomplete or contain non-finite values are NaN.
+    """
+    sums, invalid = prefix_sums
+    size = len(sums) - 1
+
+    results = np.zeros(size)
+    results[:] = np.NAN
+
+    if 0 < lookback <= size:
+        window_sums = sums[lookback:] - sums[:-lookback]
+        window_sums[(invalid[lookback:] - invalid[:-lookback]) > 0] = np.NAN
+        results[lookback - 1:] = window_sums
+    return results
+
+
+def _rolling_sum(values, lookback):
+    return _window_sums(_prefix_sums(values), lookback)
+
+
+def _rolling_variance(values, lookback):
+    """
+    Unbiased variance over trailing windows, using the sum and sum of squares
+    of each window
+    """
+    values = _centre(values)
+    return _variance_from_sums(_rolling_sum(values, lookback),
+                               _rolling_sum(values**2, lookback),
+                               lookback)
+
+
+def _centre(values):
+    # Variance is unaffected by a shift, so centre the values first to
+    # avoid cancellation in the sum of squares
+    values = np.asarray(values, dtype=np.float64)
+    finite = np.isfinite(values)
+    if finite.any():
+        values = values - values[finite].mean()
+    return values
+
+
+def _variance_from_sums(sums, sum_squares, lookback):
+    N = float(lookback)
+    return np.maximum((sum_squares - sums**2 / N) / (N - 1), 0.)
+
+
+class LogTerms(object):
+    """
+    Log price ratios used by the estimators, computed once for a price
+    series. Prefix sums of each term are cached, so rolling sums and
+    variances can be taken at any number of lookbacks in O(N) each, without
+    rescanning the prices.
+
+    Only the prices required by the terms that are used need be provided.
+    """
+    def __init__(self, close_prices=None, open_prices=None, high_prices=None,
+                 low_prices=None):
+        self.close = _as_array(close_prices)
+        self.open = _as_array(open_prices)
+        self.high = _as_array(high_prices)
+        self.low = _as_array(low_prices)
+
+        self._terms = {}
+        self._prefix_sums = {}
+
+    def __getitem__(self, name):
+        if name not in self._terms:
+            self._terms[name] = _TERMS[name](self)
+        return self._terms[name]
+
+    def rolling_sum(self, name, lookback):
+        if name not in self._prefix_sums:
+            self._prefix_sums[name] = _prefix_sums(self[name])
+        return _window_sums(self._prefix_sums[name], lookback)
+
+    def rolling_variance(self, name, lookback):
+        centred = name + '_centred'
+        if centred not in self._prefix_sums:
+            values = _centre(self[name])
+            self._prefix_sums[centred] = _prefix_sums(values)
+            self._prefix_sums[centred + '_squared'] = _prefix_sums(values**2)
+
+        return _variance_from_sums(
+            _window_sums(self._prefix_sums[centred], lookback),
+            _window_sums(self._prefix_sums[centred + '_squared'], lookback),
+            lookback)
+
+
+_TERMS = {
+    # The first lagged value is 0, so these terms are infinite at index 0
+    'CC': lambda t: log(t.close / utils.lag(t.close)),
+    'OC': lambda t: log(t.open / utils.lag(t.close)),
+
+    'CO': lambda t: log(t.close / t.open),
+    'HL': lambda t: log(t.high / t.low),
+    'HC': lambda t: log(t.high / t.close),
+    'HO': lambda t: log(t.high / t.open),
+    'LC': lambda t: log(t.low / t.close),
+    'LO': lambda t: log(t.low / t.open),
+
+    'CC2': lambda t: t['CC']**2,
+    'OC2': lambda t: t['OC']**2,
+    'CO2': lambda t: t['CO']**2,
+    'HL2': lambda t: t['HL']**2,
+
+    # Rogers Satchell
+    'RS': lambda t: (t['HC'] * t['HO']) + (t['LC'] * t['LO']),
+    'SRS': lambda t: (t['HO'] * (t['HO'] - t['CO'])) +
+                     (t['LO'] * (t['LO'] - t['CO'])),
+}
+
+
 def population_std_dev(close_prices, lookback, unbiased=False):
     N = float(lookback)
 
-    prices = log(close_prices / utils.lag(close_prices))
-    results = np.zeros(np.size(prices))
-    results[:] = np.NAN
-    for i in range(lookback, len(prices)):
-        bounds = range(i-(lookback-1), i+1)
-        results[i] = sqrt(
-            ((prices[bounds] - prices[bounds].sum() / N)**2).sum() / (N - 1))
+    results = _std_dev(LogTerms(close_prices), lookback)
     if unbiased:
         results = unbias_std_dev(results, N)
 
     return annualise(results)
 
 
+def _std_dev(terms, lookback):
+    # The first window contains no lagged price, so results start at lookback
+    return sqrt(terms.rolling_variance('CC', lookback))
+
+
 def unbias_std_dev(std_dev):
     N = float(len(std_dev))
     bias = sqrt(2 / N) * (gamma(N / 2) / gamma((N - 1) / 2))
@@ -47,109 +173,75 @@ def parkinson_std_dev(high_prices, low_prices, lookback):
     """
     Requires high and low prices during trading period
     """
-    N = float(lookback)
-
-    prices = log(high_prices / low_prices)**2
-    results = np.zeros(np.size(prices))
-    results[:] = np.NAN
-    for i in range(lookback-1, len(high_prices)):
-        bounds = range(i-(lookback-1), i+1)
-        results[i] = sqrt((1 / (4 * N * log(2))) *
-                          (prices[bounds]).sum())
-    return annualise(results)
+    terms = LogTerms(high_prices=high_prices, low_prices=low_prices)
+    return annualise(_parkinson(terms, lookback))
 
     # Sinclair's implementation produces the same result
     # prices = (1 / (4 * log(2))) * log(high_prices / low_prices)**2
-    # results = np.zeros(np.size(prices))
-    # results[:] = np.NAN
-    # for i in range(lookback-1, len(high_prices)):
-    #     bounds = range(i-(lookback-1), i+1)
-    #     results[i] = sqrt((prices[bounds]).sum() / N)
+    # results = sqrt(_rolling_sum(prices, lookback) / N)
     # return annualise(results)
 
 
+def _parkinson(terms, lookback):
+    N = float(lookback)
+    return sqrt((1 / (4 * N * log(2))) * terms.rolling_sum('HL2', lookback))
+
+
 def garman_klass_std_dev(close_prices, open_prices, high_prices, low_prices, lookback):
+    terms = LogTerms(close_prices, open_prices, high_prices, low_prices)
+    return annualise(_garman_klass(terms, lookback))
+
+
+def _garman_klass(terms, lookback):
     N = float(lookback)
-    # lagged_close_prices = utils.lag(close_prices)
 
-    mids = 0.5 * log(high_prices / low_prices)**2
+    mids = 0.5 * terms.rolling_sum('HL2', lookback)
     # The original paper uses open prices, not lagged close
-    closes = (2 * log(2) - 1) * log(close_prices / open_prices)**2
-    # closes = (2 * log(2) - 1) * log(close_prices / lagged_close_prices)**2
-
-    results = np.zeros(np.size(close_prices))
-    results[:] = np.NAN
+    closes = (2 * log(2) - 1) * terms.rolling_sum('CO2', lookback)
+    # closes = (2 * log(2) - 1) * terms.rolling_sum('CC2', lookback)
 
-    for i in range(lookback-1, len(high_prices)):
-        bounds = range(i-(lookback-1), i+1)
-        results[i] = sqrt((mids[bounds].sum() / N) -
-                          (closes[bounds].sum() / N))
-    return annualise(results)
+    return sqrt((mids / N) - (closes / N))
 
 
 def sinclair_garman_klass_std_dev(close_prices, open_prices, high_prices,
                                   low_prices, lookback):
+    terms = LogTerms(close_prices, open_prices, high_prices, low_prices)
+    return annualise(_sinclair_garman_klass(terms, lookback))
+
+
+def _sinclair_garman_klass(terms, lookback):
     N = float(lookback)
-    lagged_close_prices = utils.lag(close_prices, 0.)
 
-    logHL = 0.5 * log(high_prices / low_prices)**2
-    logCO = (2 * log(2) - 1) * log(close_prices / open_prices)**2
+    logHL = 0.5 * terms.rolling_sum('HL2', lookback)
+    logCO = (2 * log(2) - 1) * terms.rolling_sum('CO2', lookback)
     # Sinclair's implementation includes overnight price changes as a factor
-    logOC = log(open_prices / lagged_close_prices)**2
+    # Results start at lookback, as we require a drift term
+    logOC = terms.rolling_sum('OC2', lookback)
 
-    results = np.zeros(np.size(close_prices))
-    results[:] = np.NAN
-
-    # Start at lookback, as we require a drift term
-    for i in range(lookback, len(high_prices)):
-        bounds = range(i-(lookback-1), i+1)
-        results[i] = sqrt((logOC[bounds].sum() +
-                          logHL[bounds].sum() -
-                          logCO[bounds].sum()) / N)
-    return annualise(results)
+    return sqrt((logOC + logHL - logCO) / N)
 
 
 def rogers_satchell_std_dev(close_prices, open_prices, high_prices,
                     low_prices, lookback):
-    N = float(lookback)
-
-    logHC = log(high_prices / close_prices)
-    logHO = log(high_prices / open_prices)
-    logLC = log(low_prices / close_prices)
-    logLO = log(low_prices / open_prices)
+    terms = LogTerms(close_prices, open_prices, high_prices, low_prices)
+    return annualise(_rogers_satchell(terms, lookback))
 
-    results = np.zeros(np.size(close_prices))
-    results[:] = np.NAN
 
-    for i in range(lookback-1, len(results)):
-        bounds = range(i-(lookback-1), i+1)
-        results[i] = sqrt(
-            ((logHC[bounds] * logHO[bounds]) +
-            (logLC[bounds] * logLO[bounds])).sum() / N)
-    return annualise(results)
+def _rogers_satchell(terms, lookback):
+    N = float(lookback)
+    return sqrt(terms.rolling_sum('RS', lookback) / N)
 
 
 """Alternative, but valid implementation"""
 def sinclair_rogers_satchell_std_dev(close_prices, open_prices, high_prices,
                             low_prices, lookback):
-    N = float(lookback)
+    terms = LogTerms(close_prices, open_prices, high_prices, low_prices)
+    return annualise(_sinclair_rogers_satchell(terms, lookback))
 
-    logHO = log(high_prices / open_prices)
-    logLO = log(low_prices / open_prices)
-    logCO = log(close_prices / open_prices)
 
-    results = np.zeros(np.size(close_prices))
-    results[:] = np.NAN
-
-    for i in range(lookback-1, len(results)):
-        bounds = range(i-(lookback-1), i+1)
-        results[i] = sqrt(
-            ((logHO[bounds] *
-              (logHO[bounds] - logCO[bounds])) +
-             (logLO[bounds] *
-              (logLO[bounds] - logCO[bounds]))).sum()
-            / N)
-    return annualise(results)
+def _sinclair_rogers_satchell(terms, lookback):
+    N = float(lookback)
+    return sqrt(terms.rolling_sum('SRS', lookback) / N)
 
 
 def yang_zhang_std_dev(close_prices, open_prices, high_prices,
@@ -157,33 +249,21 @@ def yang_zhang_std_dev(close_prices, open_prices, high_prices,
     """
     Implementation as per Yhang Zang 2000
     """
-    N = float(lookback)
-
-    k = 0.34 / (1.34 + ((N + 1) / (N - 1)))
+    terms = LogTerms(close_prices, open_prices, high_prices, low_prices)
+    return annualise(_yang_zhang(terms, lookback))
 
-    logOC = log(open_prices / utils.lag(close_prices))
-    logCO = log(close_prices / open_prices)
-    logHC = log(high_prices / close_prices)
-    logHO = log(high_prices / open_prices)
-    logLC = log(low_prices / close_prices)
-    logLO = log(low_prices / open_prices)
 
-    results = np.zeros(np.size(close_prices))
-    results[:] = np.NAN
+def _yang_zhang(terms, lookback):
+    N = float(lookback)
 
-    # Start at lookback, as we require a lag term
-    for i in range(lookback, len(results)):
-        bounds = range(i - (lookback - 1), i + 1)
-        open_var = ((logOC[bounds] - (logOC[bounds].sum() / N))**2).sum() / \
-                   (N - 1)
-        close_var = ((logCO[bounds] - (logCO[bounds].sum() / N))**2).sum() / \
-                    (N - 1)
-        rs_var = ((logHC[bounds] * logHO[bounds]) +
-                  (logLC[bounds] * logLO[bounds])).sum() / N
+    k = 0.34 / (1.34 + ((N + 1) / (N - 1)))
 
-        results[i] = sqrt(open_var + k * close_var + (1 - k) * rs_var)
+    # Results start at lookback, as we require a lag term
+    open_var = terms.rolling_variance('OC', lookback)
+    close_var = terms.rolling_variance('CO', lookback)
+    rs_var = terms.rolling_sum('RS', lookback) / N
 
-    return annualise(results)
+    return sqrt(open_var + k * close_var + (1 - k) * rs_var)
 
 
 def sinclair_yang_zhang_std_dev(close_prices, open_prices, high_prices,
@@ -193,31 +273,43 @@ def sinclair_yang_zhang_std_dev(close_prices, open_prices, high_prices,
     Additionally uses open/close for open variance, & close/close for close
     std_dev, as opposed to the same for both
     """
+    terms = LogTerms(close_prices, open_prices, high_prices, low_prices)
+    return annualise(_sinclair_yang_zhang(terms, lookback))
+
+
+def _sinclair_yang_zhang(terms, lookback):
     N = float(lookback)
 
     k = 0.34 / (1.34 + ((N + 1) / (N - 1)))
 
-    logOC = log(open_prices / utils.lag(close_prices))
-    logCC = log(close_prices / utils.lag(close_prices))
-    logHC = log(high_prices / close_prices)
-    logHO = log(high_prices / open_prices)
-    logLC = log(low_prices / close_prices)
-    logLO = log(low_prices / open_prices)
+    # Results start at lookback, as we require a lag term
+    open_var = terms.rolling_sum('OC2', lookback) / (N - 1)
+    close_var = terms.rolling_sum('CC2', lookback) / (N - 1)
+    rs_var = terms.rolling_sum('RS', lookback) / N
 
-    results = np.zeros(np.size(close_prices))
-    results[:] = np.NAN
+    return sqrt(open_var + k * close_var + (1 - k) * rs_var)
 
-    # Start at lookback, as we require a lag term
-    for i in range(lookback, len(results)):
-        bounds = range(i - (lookback - 1), i + 1)
-        open_var = (logOC[bounds]**2).sum() / (N - 1)
-        close_var = (logCC[bounds]**2).sum() / (N - 1)
-        rs_var = ((logHC[bounds] * logHO[bounds]) +
-                  (logLC[bounds] * logLO[bounds])).sum() / N
 
-        results[i] = sqrt(open_var + k * close_var + (1 - k) * rs_var)
+"""
+Estimators by name, each taking LogTerms and a lookback and returning
+non-annualised volatility
+"""
+ESTIMATORS = {
+    'std_dev': _std_dev,
+    'parkinson': _parkinson,
+    'garman_klass': _garman_klass,
+    'sinclair_garman_klass': _sinclair_garman_klass,
+    'rogers_satchell': _rogers_satchell,
+    'sinclair_rogers_satchell': _sinclair_rogers_satchell,
+    'yang_zhang': _yang_zhang,
+    'sinclair_yang_zhang': _sinclair_yang_zhang,
+}
 
-    return annualise(results)
+
+def _as_array(prices):
+    if prices is None:
+        return None
+    return np.asarray(prices, dtype=np.float64)
 
 
 def first_exit(price_series, delta, lookback):
@@ -225,74 +317,186 @@ def first_exit(price_series, delta, lookback):
     return first_exit(prices, delta, lookback, np.size(price_series))
 
 
-def first_exit(prices, delta, lookback, day_count):
+def first_exit(prices, delta, lookback, day_count, bars_per_day=391,
+               boundaries=None):
     """
-    :param delta: our observation_barrier:
+    First exit time volatility, from the mean time taken for intraday log
+    prices to move delta from the price at the previous exit, over the
+    trailing lookback days
+
+    Exit events are found in a single pass over the prices, then grouped by
+    the day in which they occur, so each minute is visited once regardless
+    of lookback.
+
+    :param delta: our observation_barrier, or a list of barriers which are
+    evaluated together
+    :param bars_per_day: number of intraday prices in each day
+    :param boundaries: offsets of the first price of each day, as returned
+    by intraday_prices, for days of differing length
+    :return: annualised volatility for each day, of shape
+    (len(delta), day_count) if a list of barriers is provided
     """
+    prices = np.asarray(prices, dtype=np.float64)
+    deltas = np.atleast_1d(np.asarray(delta, dtype=np.float64))
 
-    # Our exit_times
-    exit_times = []
+    results = np.zeros((len(deltas), day_count))
 
-    results = np.zeros(day_count)
-    results[:] = np.NAN
+    for i, barrier in enumerate(deltas):
+        exit_idx, exit_times = _exit_events(prices, barrier)
+
+        if boundaries is None:
+            days = exit_idx // bars_per_day
+        else:
+            days = np.searchsorted(boundaries, exit_idx, side='right') - 1
+        in_range = days < day_count
+        tau_sums = np.bincount(days[in_range], weights=exit_times[in_range],
+                               minlength=day_count)
+        tau_counts = np.bincount(days[in_range], minlength=day_count)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            tau = _rolling_sum(tau_sums, lookback) / \
+                _rolling_sum(tau_counts, lookback)
+            results[i] = barrier / sqrt(tau)
 
-    offset = 0
+    corrected_results = results / \
+        (1. + (1. / (4. * (float(lookback) * bars_per_day))))
 
-    # TODO: Do we need to support < 1 day trading periods
+    annualised = annualise(corrected_results, bars_per_day)
+    if np.ndim(delta) == 0:
+        return annualised[0]
+    return annualised
 
-    # TODO: We should perform a single loop over all data
 
-    for day in range(lookback-1, len(results)):
+def _exit_events(prices, delta, chunk_size=64):
+    """
+    Indices at which prices first reach delta above or below the price at
+    the previous exit, along with the number of bars each exit took
 
-        upper_barrier = prices[offset] + delta
-        lower_barrier = prices[offset] - delta
-        count = 0.
+    Each search for the next exit scans forward in vectorised chunks, which
+    grow while no exit is found.
+    """
+    exit_idx = []
+    exit_times = []
 
-        for i in range(offset+1, offset + (391 * lookback)):
-            count += 1.
-            price = prices[i]
-            if price >= upper_barrier or price <= lower_barrier:
-                exit_times.append(count)
-                count = 0.
-                upper_barrier = price + delta
-                lower_barrier = price - delta
+    size = len(prices)
+    finite_idx = np.flatnonzero(np.isfinite(prices))
+    if len(finite_idx) == 0:
+        return np.array(exit_idx, dtype=int), np.array(exit_times)
 
-        tau = np.array(exit_times)
-        results[day] = delta / (sqrt(tau.mean()))
+    start = finite_idx[0]
 
-        offset += 391
+    while start < size - 1:
+        upper_barrier = prices[start] + delta
+        lower_barrier = prices[start] - delta
 
-    corrected_results = results / (1. + (1. / (4. * (float(lookback) * 391.))))
+        position = start + 1
+        chunk = chunk_size
+        exit = None
 
-    return annualise(corrected_results, 391)
+        while position < size and exit is None:
+            end = min(position + chunk, size)
+            window = prices[position:end]
+            hits = np.flatnonzero((window >= upper_barrier) |
+                                  (window <= lower_barrier))
+            if len(hits) > 0:
+                exit = position + hits[0]
+            position = end
+            chunk *= 2
 
+        if exit is None:
+            break
 
-def intraday_returns(daily_prices):
+        exit_idx.append(exit)
+        exit_times.append(exit - start)
+        start = exit
 
-    results = np.array([])
-    # result = np.array(np.zeros(391 * len(dates)))
-    # offset = 0
+    return np.array(exit_idx, dtype=int), \
+        np.array(exit_times, dtype=np.float64)
+
+
+def intraday_returns(daily_prices, by_day=False):
+    """
+    Intraday log returns for a dictionary of per-date price DataFrames, as
+    returned by data_loader.load_intraday_data. The first return of each day
+    is taken from the previous day's close.
+
+    :param by_day: return a (days x bars) array, with a row for each day,
+    along with the day boundaries
+    :return: returns, or (returns by day, boundaries) where boundaries[i] is
+    the offset of the first bar of day i and boundaries[-1] the bar count
+    """
+    prices, boundaries = _intraday_series(daily_prices)
 
     # We have no previous close for first iteration
-    close_price = np.NaN
+    returns = log(prices / utils.lag(prices, np.NaN))
+    # TODO: Work out factor to apply to overnight return
 
-    for date in sorted(daily_prices.keys()):
-        prices = daily_prices[date]['close'].values
-        returns = log(prices / utils.lag(prices, close_price))
-        results = np.hstack((results, returns))
-        close_price = prices[-1]
-        # TODO: Work out factor to apply to overnight return
+    if by_day:
+        return _by_day(returns, boundaries), boundaries
+    return returns
 
-    # np.trim_zeros(results, trim='b')
 
-    return results
+def intraday_prices(daily_prices, by_day=False):
+    """
+    Intraday close prices for a dictionary of per-date price DataFrames
+
+    :param by_day: as for intraday_returns
+    """
+    prices, boundaries = _intraday_series(daily_prices)
+
+    if by_day:
+        return _by_day(prices, boundaries), boundaries
+    return prices
+
+
+def day_boundaries(daily_prices):
+    """
+    Offset of the first bar of each day in the intraday series, followed by
+    the total number of bars
+    """
+    return _boundaries([len(daily_prices[date])
+                        for date in sorted(daily_prices.keys())])
 
 
-def intraday_prices(daily_prices):
-    results = np.array([])
+def _boundaries(bar_counts):
+    boundaries = np.zeros(len(bar_counts) + 1, dtype=int)
+    boundaries[1:] = np.cumsum(bar_counts)
+    return boundaries
 
-    for date in sorted(daily_prices.keys()):
-        prices = daily_prices[date]['close'].values
-        results = np.hstack((results, prices))
 
+def _intraday_series(daily_prices, column='close'):
+    """
+    Prices for all dates in a single preallocated array, along with the
+    offset of the start of each day
+    """
+    dates = sorted(daily_prices.keys())
+
+    day_prices = [daily_prices[date][column].values for date in dates]
+    boundaries = _boundaries([len(prices) for prices in day_prices])
+
+    results = np.empty(boundaries[-1])
+    for i, prices in enumerate(day_prices):
+        results[boundaries[i]:boundaries[i + 1]] = prices
+
+    return results, boundaries
+
+
+def _by_day(values, boundaries):
+    """
+    Reshape a series into a (days x bars) array. This is a view onto values
+    when all days have the same number of bars, otherwise shorter days are
+    padded with NaN at the end.
+    """
+    bar_counts = np.diff(boundaries)
+    if len(bar_counts) == 0:
+        return values.reshape(0, 0)
+
+    bars = bar_counts.max()
+    if (bar_counts == bars).all():
+        return values.reshape(len(bar_counts), bars)
+
+    results = np.empty((len(bar_counts), bars))
+    results[:] = np.NAN
+    for i, count in enumerate(bar_counts):
+        results[i, :count] = values[boundaries[i]:boundaries[i + 1]]
     return results
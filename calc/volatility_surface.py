@@ -0,0 +1,315 @@
+"""
+Implied volatility surfaces built from option chains.
+
+A surface holds implied volatility on a fixed moneyness (strike /
+underlying) x expiry grid for a single symbol and date. All contracts in a
+chain are solved in one call to option.implied_volatilities, then each
+expiry's smile is interpolated onto the moneyness grid. Lookups between
+grid points interpolate linearly in moneyness and in total variance
+(volatility^2 x time) across expiries, so no solver calls are needed once
+a surface has been built.
+
+Surfaces can be persisted as .npz files in a directory per symbol, and are
+reused by later runs rather than rebuilt. Each file holds the rates the
+surface was built with and a digest of the quotes and underlying price, and
+is rebuilt if any of these or the moneyness grid change.
+"""
+
+import hashlib
+import logging
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from datatypes import OptionType
+import option
+
+
+MONEYNESS = np.linspace(0.5, 1.5, 21)
+DAYS_IN_YEAR = 365.0
+EXPIRY_FORMAT = '%Y%m%d'
+
+
+class VolatilitySurface(object):
+    def __init__(self, underlying_price, moneyness, expiries, volatilities,
+                 risk_free_rate=0.0, dividend_rate=0.0, source=''):
+        """
+        :param moneyness: increasing grid of strike / underlying price
+        :param expiries: increasing times to expiry in years
+        :param volatilities: array of shape (len(expiries), len(moneyness))
+        :param source: digest of the quotes the surface was built from, as
+        returned by get_source_stamp
+        """
+        self.underlying_price = float(underlying_price)
+        self.moneyness = np.asarray(moneyness, dtype=np.float64)
+        self.expiries = np.asarray(expiries, dtype=np.float64)
+        self.volatilities = np.asarray(volatilities, dtype=np.float64)
+        self.risk_free_rate = float(risk_free_rate)
+        self.dividend_rate = float(dividend_rate)
+        self.source = source
+
+    def is_built_with(self, moneyness, risk_free_rate, dividend_rate, source):
+        """
+        Whether the surface was built from the given inputs, so that a stored
+        surface can be reused
+        """
+        moneyness = np.asarray(moneyness, dtype=np.float64)
+        return self.source == source and \
+            self.risk_free_rate == risk_free_rate and \
+            self.dividend_rate == dividend_rate and \
+            self.moneyness.shape == moneyness.shape and \
+            np.array_equal(self.moneyness, moneyness)
+
+    def volatility(self, strike_price, time_to_expiry):
+        """
+        Implied volatility at the given strikes and times to expiry in years,
+        which are broadcast against each other. Values beyond the edges of
+        the grid are extrapolated flat.
+        """
+        moneyness = np.asarray(strike_price, dtype=np.float64) / \
+            self.underlying_price
+        time_to_expiry = np.clip(np.asarray(time_to_expiry, dtype=np.float64),
+                                 self.expiries[0], self.expiries[-1])
+        moneyness, time_to_expiry = np.broadcast_arrays(moneyness,
+                                                        time_to_expiry)
+
+        i, i_next, i_weight = _interp_index(self.moneyness, moneyness)
+        j, j_next, j_weight = _interp_index(self.expiries, time_to_expiry)
+
+        total_variance = \
+            (1 - j_weight) * self._total_variance(j, i, i_next, i_weight) + \
+            j_weight * self._total_variance(j_next, i, i_next, i_weight)
+
+        result = np.sqrt(total_variance / time_to_expiry)
+        if result.ndim == 0:
+            return float(result)
+        return result
+
+    def _total_variance(self, j, i, i_next, i_weight):
+        volatility = (1 - i_weight) * self.volatilities[j, i] + \
+            i_weight * self.volatilities[j, i_next]
+        return volatility**2 * self.expiries[j]
+
+    def save(self, filename):
+        tmp_file = filename + '.tmp'
+        with open(tmp_file, 'wb') as f:
+            np.savez(f, underlying_price=self.underlying_price,
+                     moneyness=self.moneyness, expiries=self.expiries,
+                     volatilities=self.volatilities,
+                     risk_free_rate=self.risk_free_rate,
+                     dividend_rate=self.dividend_rate,
+                     source=np.array(self.source))
+        os.rename(tmp_file, filename)
+
+    @classmethod
+    def load(cls, filename):
+        with np.load(filename, allow_pickle=False) as surface:
+            return cls(float(surface['underlying_price']),
+                       surface['moneyness'], surface['expiries'],
+                       surface['volatilities'],
+                       float(surface['risk_free_rate']),
+                       float(surface['dividend_rate']),
+                       str(surface['source']))
+
+
+def build_surface(chain, underlying_price, date, moneyness=MONEYNESS,
+                  risk_free_rate=0.0, dividend_rate=0.0):
+    """
+    Build a surface from a single date's chain, as returned by
+    data_loader.load_option_data, i.e. data[symbol][date]
+
+    Out of the money calls and puts are used, priced at the bid/ask mid
+    where both are quoted, otherwise at the last price.
+
+    :return: VolatilitySurface, or None if no contracts could be solved
+    """
+    return _build_surface(_get_quotes(chain, underlying_price, date),
+                          underlying_price, moneyness, risk_free_rate,
+                          dividend_rate)
+
+
+def get_source_stamp(quotes, underlying_price):
+    """
+    :param quotes: type, strike, time to expiry & price arrays of the
+    contracts used, or None if there are none
+    :return: hex digest of the quotes and underlying price
+    """
+    digest = hashlib.sha256()
+    digest.update(np.array(underlying_price, dtype=np.float64).tobytes())
+    if quotes is not None:
+        types, strikes, expiries, prices = quotes
+        digest.update(','.join(types.astype(str)).encode('utf-8'))
+        for values in [strikes, expiries, prices]:
+            digest.update(np.ascontiguousarray(values,
+                                               dtype=np.float64).tobytes())
+    return digest.hexdigest()
+
+
+def build_surfaces(option_data, underlying_prices, directory=None,
+                   moneyness=MONEYNESS, risk_free_rate=0.0,
+                   dividend_rate=0.0):
+    """
+    Surfaces for every symbol and date in option_data
+
+    :param underlying_prices: dictionary of price Series indexed by date for
+    each symbol, e.g. price_data[symbol]['Adj Close']
+    :param directory: if provided, surfaces are read from or written to
+    <directory>/<symbol>/<date>.npz, so they are only built once for the
+    same quotes, underlying price, moneyness and rates
+    :return: dictionary of surfaces in format surfaces[<symbol>][<date>]
+    """
+    surfaces = {}
+    for symbol in option_data.keys():
+        surfaces[symbol] = {}
+        for date, chain in option_data[symbol].items():
+            underlying_price = \
+                underlying_prices[symbol][pd.Timestamp(date)]
+            quotes = _get_quotes(chain, underlying_price, date)
+
+            filename = None
+            if directory is not None:
+                filename = get_surface_file(directory, symbol, date)
+                if os.path.exists(filename):
+                    surface = VolatilitySurface.load(filename)
+                    if surface.is_built_with(
+                            moneyness, risk_free_rate, dividend_rate,
+                            get_source_stamp(quotes, underlying_price)):
+                        surfaces[symbol][date] = surface
+                        continue
+                    logging.debug('Stale surface: {}'.format(filename))
+
+            surface = _build_surface(quotes, underlying_price, moneyness,
+                                     risk_free_rate, dividend_rate)
+            if surface is None:
+                logging.warning('No implied volatilities for {} on {}'
+                                .format(symbol, date))
+                continue
+
+            if filename is not None:
+                _make_dirs(os.path.dirname(filename))
+                surface.save(filename)
+            surfaces[symbol][date] = surface
+
+    return surfaces
+
+
+def load_surface(directory, symbol, date):
+    """
+    Load a stored surface, returning None if it has not been built
+    """
+    filename = get_surface_file(directory, symbol, date)
+    if not os.path.exists(filename):
+        return None
+    return VolatilitySurface.load(filename)
+
+
+def get_surface_file(directory, symbol, date):
+    return os.path.join(directory, symbol, '{}.npz'.format(date))
+
+
+def _build_surface(quotes, underlying_price, moneyness, risk_free_rate,
+                   dividend_rate):
+    if quotes is None:
+        return None
+    types, strikes, expiries, prices = quotes
+
+    volatilities, status = option.implied_volatilities(
+        types, strikes, underlying_price, prices, expiries,
+        risk_free_rate=risk_free_rate, dividend_rate=dividend_rate)
+    solved = status == option.SolverStatus.CONVERGED
+
+    grid_expiries = []
+    grid_volatilities = []
+    for expiry in np.unique(expiries[solved]):
+        contracts = solved & (expiries == expiry)
+        order = np.argsort(strikes[contracts])
+        grid_expiries.append(expiry)
+        grid_volatilities.append(np.interp(
+            moneyness, strikes[contracts][order] / underlying_price,
+            volatilities[contracts][order]))
+
+    if len(grid_expiries) == 0:
+        return None
+
+    return VolatilitySurface(underlying_price, moneyness, grid_expiries,
+                             grid_volatilities, risk_free_rate,
+                             dividend_rate,
+                             get_source_stamp(quotes, underlying_price))
+
+
+def _get_quotes(chain, underlying_price, date):
+    """
+    Arrays of type, strike, time to expiry and price for the out of the
+    money contracts in chain
+    """
+    start = datetime.strptime(date, EXPIRY_FORMAT)
+
+    types = []
+    strikes = []
+    expiries = []
+    prices = []
+
+    for expiry, contracts in chain.items():
+        time_to_expiry = \
+            (datetime.strptime(expiry, EXPIRY_FORMAT) - start).days / \
+            DAYS_IN_YEAR
+
+        for type, df in contracts.items():
+            strike = df.index.values.astype(np.float64)
+            if type == OptionType.CALL:
+                out_of_money = strike >= underlying_price
+            else:
+                out_of_money = strike < underlying_price
+
+            price = _get_prices(df)[out_of_money]
+            types.append(np.repeat(type, len(price)))
+            strikes.append(strike[out_of_money])
+            expiries.append(np.repeat(time_to_expiry, len(price)))
+            prices.append(price)
+
+    if len(prices) == 0:
+        return None
+
+    return np.concatenate(types), np.concatenate(strikes), \
+        np.concatenate(expiries), np.concatenate(prices)
+
+
+def _get_prices(df):
+    # Missing values are recorded as '-'
+    bid = _to_numeric(df, 'BID')
+    ask = _to_numeric(df, 'ASK')
+    last = _to_numeric(df, 'LAST_PRICE')
+
+    with np.errstate(invalid='ignore'):
+        quoted = (bid > 0) & (ask > 0)
+    return np.where(quoted, (bid + ask) / 2., last)
+
+
+def _to_numeric(df, column):
+    if column not in df.columns:
+        return np.zeros(len(df)) + np.NAN
+    return pd.to_numeric(df[column], errors='coerce').values.astype(
+        np.float64)
+
+
+def _interp_index(grid, values):
+    """
+    Index of the grid point at or below each value, the following index and
+    the weight of the following point for linear interpolation
+    """
+    if len(grid) == 1:
+        index = np.zeros(np.shape(values), dtype=int)
+        return index, index, np.zeros(np.shape(values))
+
+    values = np.clip(values, grid[0], grid[-1])
+    index = np.clip(np.searchsorted(grid, values, side='right') - 1, 0,
+                    len(grid) - 2)
+    weight = (values - grid[index]) / (grid[index + 1] - grid[index])
+    return index, index + 1, weight
+
+
+def _make_dirs(directory):
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
@@ -1,22 +1,64 @@
 import logging
 import glob
+import multiprocessing
 import os
 
 import pandas as pd
 
 from datatypes import OptionType, FUTURES_MONTHS
+import price_cache
 
 
-def load_price_data(data_dir, symbols, range=[]):
+def load_price_data(data_dir, symbols, range=[], use_cache=True,
+                    cache_dir=None, workers=1, report=None):
+    """
+    Dictionary of dataframe price data in format data[<symbol>]
+
+    Parsed files are stored in a binary cache (by default in a .price_cache
+    directory within data_dir), which is used in place of the CSV file on
+    subsequent loads provided the CSV has not since been modified.
+
+    :param workers: number of processes to spread symbol loads across
+    :param report: LoadReport to record failed symbols in, if not provided
+    the first failure is raised
+    """
+    if cache_dir is None:
+        cache_dir = price_cache.get_cache_dir(data_dir)
+
+    tasks = [(symbol, _get_price_file(symbol, data_dir), use_cache,
+              cache_dir) for symbol in symbols]
+
     price_data = {}
 
-    for symbol in symbols:
-        symbol_file = _get_price_file(symbol, data_dir)
-        price_data[symbol] = load_symbol_data(symbol_file)
+    for symbol, df, error in _map_tasks(_load_price_task, tasks, workers):
+        if error is not None:
+            _handle_error(report, symbol, error)
+        else:
+            price_data[symbol] = df
 
     return price_data
 
 
+def _load_price_task(task):
+    symbol, symbol_file, use_cache, cache_dir = task
+    try:
+        if use_cache:
+            df = _load_cached_symbol_data(symbol_file, cache_dir)
+        else:
+            df = load_symbol_data(symbol_file)
+        return symbol, df, None
+    except Exception as e:
+        return symbol, None, e
+
+
+def _load_cached_symbol_data(filename, cache_dir):
+    df = price_cache.load(filename, cache_dir)
+    if df is None:
+        df = load_symbol_data(filename)
+        price_cache.save(filename, cache_dir, df)
+    return df
+
+
 def load_symbol_list(filename):
     try:
         logging.debug('Loading symbol list from {}'.format(filename))
@@ -75,10 +117,14 @@ def _process_intraday_price_files(symbol, files):
 
 
 def load_option_data(index, directory, symbols=[],
-                     start_date=None, end_date=None):
+                     start_date=None, end_date=None, workers=1, report=None):
     """
     Dictionary of dataframe price data in format
     data[<symbol>][<date>][<expiry>][P|C]
+
+    :param workers: number of processes to spread symbol/date loads across
+    :param report: LoadReport to record failed files in, if not provided
+    the first failure is raised
     """
     basedir = os.path.join(directory, index)
     dates = get_dates(basedir, start_date, end_date)
@@ -86,16 +132,17 @@ def load_option_data(index, directory, symbols=[],
     data = {}
 
     if len(symbols) > 0:
+        tasks = [(symbol, date, basedir)
+                 for symbol in symbols for date in dates]
+
         for symbol in symbols:
             data[symbol] = {}
 
-            for date in dates:
-                data[symbol][date] = {}
-
-                prices_dir = os.path.join(basedir, date,
-                                         '{}[0-9]*[PC].csv'.format(symbol))
-                files = glob.glob(prices_dir)
-                data[symbol][date] = _process_option_price_files(symbol, files)
+        for symbol, date, expiries, errors in \
+                _map_tasks(_load_option_task, tasks, workers):
+            for filename, error in errors:
+                _handle_error(report, filename, error)
+            data[symbol][date] = expiries
 
     else:
         raise LoadingException('No symbols specified')
@@ -103,32 +150,56 @@ def load_option_data(index, directory, symbols=[],
     return data
 
 
-def _process_option_price_files(symbol, files):
+def _load_option_task(task):
+    symbol, date, basedir = task
+    prices_dir = os.path.join(basedir, date,
+                              '{}[0-9]*[PC].csv'.format(symbol))
+    files = glob.glob(prices_dir)
+
+    errors = []
+    expiries = _process_option_price_files(symbol, files, errors)
+    return symbol, date, expiries, errors
+
+
+def _process_option_price_files(symbol, files, errors=None):
+    """
+    :param errors: list to append (filename, exception) tuples to for any
+    files which could not be loaded, if not provided the exception is raised
+    """
 
     expiries = {}
 
     for filename in files:
-
-        logging.debug('Loading price file: {}'.format(filename))
-        detail = filename.lstrip(symbol).rstrip('.csv')
-        type = detail[-1]
-        expiry = detail[-9:-1]
-        # Some files contain an extra column
-        # For example, see line 41 of 20140908/COST20140920C.csv
-        df = pd.read_csv(filename, index_col='STRIKE', thousands=',',
-                         error_bad_lines=False, warn_bad_lines=True)
+        try:
+            type, expiry, df = _process_option_price_file(symbol, filename)
+        except Exception as e:
+            if errors is None:
+                raise
+            errors.append((filename, e))
+            continue
 
         if expiry not in expiries:
             expiries[expiry] = {}
+        expiries[expiry][type] = df
 
-        if type is OptionType.CALL or type is OptionType.PUT:
-            expiries[expiry][type] = df
+    return expiries
 
-        else:
-            raise LoadingException(
-                'Unable to determine option type {}'.format(type))
 
-    return expiries
+def _process_option_price_file(symbol, filename):
+    logging.debug('Loading price file: {}'.format(filename))
+    detail = filename.lstrip(symbol).rstrip('.csv')
+    type = detail[-1]
+    expiry = detail[-9:-1]
+
+    if type not in (OptionType.CALL, OptionType.PUT):
+        raise LoadingException(
+            'Unable to determine option type {}'.format(type))
+
+    # Some files contain an extra column
+    # For example, see line 41 of 20140908/COST20140920C.csv
+    df = pd.read_csv(filename, index_col='STRIKE', thousands=',',
+                     error_bad_lines=False, warn_bad_lines=True)
+    return type, expiry, df
 
 
 def get_dates(directory, start_date=None, end_date=None):
@@ -183,5 +254,50 @@ def load_vix_futures_prices(source_dir, price='Close',
     return data
 
 
+def _map_tasks(func, tasks, workers=1):
+    """
+    Apply func to each task, across a pool of worker processes if more than
+    one worker is requested. Results are returned in task order.
+    """
+    if workers is None or workers <= 1 or len(tasks) <= 1:
+        return [func(task) for task in tasks]
+
+    pool = multiprocessing.Pool(min(workers, len(tasks)))
+    try:
+        return pool.map(func, tasks)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def _handle_error(report, source, error):
+    if report is None:
+        raise error
+    logging.warning('Unable to load {}: {}'.format(source, error))
+    report.add_error(source, error)
+
+
+class LoadReport(object):
+    """
+    Errors encountered while loading individual files, in load order
+    """
+    def __init__(self):
+        self.errors = []
+
+    def add_error(self, source, error):
+        self.errors.append((source, error))
+
+    @property
+    def failed(self):
+        return [source for source, error in self.errors]
+
+    def __len__(self):
+        return len(self.errors)
+
+    def __str__(self):
+        return '\n'.join('{}: {}'.format(source, error)
+                         for source, error in self.errors)
+
+
 class LoadingException(Exception):
     pass
@@ -0,0 +1,258 @@
+"""
+Typed columnar store for option chains.
+
+The chains/<INDEX>/<YYYYMMDD>/<SYMBOL><EXPIRY><C|P>.csv tree is ingested
+once into flat arrays, with one row per contract per capture date. Prices
+are floats with NaN where the CSV has '-'. Rows are sorted by symbol,
+capture date, expiry, type and strike, so a chain is a contiguous slice
+found by binary search, and queries return NumPy arrays without reparsing
+any CSVs.
+
+The store is saved as a single .npz file holding one array per column.
+"""
+
+import logging
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+import data_loader
+
+
+PRICE_COLUMNS = ['BID', 'ASK', 'LAST_PRICE', 'CHANGE', 'PERCENT_CHANGE',
+                 'VOLUME', 'OPEN_INTEREST']
+
+SYMBOL = 'SYMBOL'
+DATE = 'DATE'
+EXPIRY = 'EXPIRY'
+TYPE = 'TYPE'
+STRIKE = 'STRIKE'
+
+_KEY_COLUMNS = [SYMBOL, DATE, EXPIRY, TYPE, STRIKE]
+_SYMBOLS = '__symbols__'
+_FILENAME_PATTERN = re.compile(r'^(.+?)(\d{8})([CP])\.csv$')
+
+
+class OptionStore(object):
+    def __init__(self, symbols, columns):
+        """
+        :param symbols: sorted list of symbols, which the SYMBOL column
+        indexes into
+        :param columns: dictionary of equal length arrays, sorted by SYMBOL,
+        DATE, EXPIRY, TYPE & STRIKE, where dates and expiries are
+        integers in YYYYMMDD format
+        """
+        self.symbols = list(symbols)
+        self.columns = columns
+
+        self._symbol_idx = dict((s, i) for i, s in enumerate(self.symbols))
+        # A chain is identified by symbol & capture date
+        self._chain_keys = _chain_key(columns[SYMBOL], columns[DATE])
+
+    def __len__(self):
+        return len(self.columns[STRIKE])
+
+    @classmethod
+    def from_option_data(cls, option_data):
+        """
+        Build a store from the nested dictionary returned by
+        data_loader.load_option_data
+        """
+        symbols = sorted(option_data.keys())
+
+        parts = dict((column, []) for column in _KEY_COLUMNS + PRICE_COLUMNS)
+
+        for i, symbol in enumerate(symbols):
+            for date, expiries in option_data[symbol].items():
+                for expiry, types in expiries.items():
+                    for type, df in types.items():
+                        size = len(df)
+                        parts[SYMBOL].append(np.repeat(i, size))
+                        parts[DATE].append(np.repeat(int(date), size))
+                        parts[EXPIRY].append(np.repeat(int(expiry), size))
+                        parts[TYPE].append(np.repeat(type, size))
+                        parts[STRIKE].append(
+                            _to_float(pd.Series(df.index.values)))
+                        for column in PRICE_COLUMNS:
+                            parts[column].append(_get_column(df, column))
+
+        columns = {}
+        for column in _KEY_COLUMNS + PRICE_COLUMNS:
+            if len(parts[column]) > 0:
+                columns[column] = np.concatenate(parts[column])
+            else:
+                columns[column] = np.array([])
+        columns[SYMBOL] = columns[SYMBOL].astype(np.int32)
+        columns[DATE] = columns[DATE].astype(np.int32)
+        columns[EXPIRY] = columns[EXPIRY].astype(np.int32)
+        columns[TYPE] = columns[TYPE].astype('S1')
+        columns[STRIKE] = columns[STRIKE].astype(np.float64)
+
+        order = np.lexsort([columns[column]
+                            for column in reversed(_KEY_COLUMNS)])
+        for column in columns:
+            columns[column] = columns[column][order]
+
+        return cls(symbols, columns)
+
+    @classmethod
+    def load(cls, filename):
+        with np.load(filename, allow_pickle=False) as store:
+            symbols = [str(symbol) for symbol in store[_SYMBOLS]]
+            columns = dict((column, store[column])
+                           for column in _KEY_COLUMNS + PRICE_COLUMNS)
+        return cls(symbols, columns)
+
+    def save(self, filename):
+        tmp_file = filename + '.tmp'
+        with open(tmp_file, 'wb') as f:
+            arrays = dict(self.columns)
+            arrays[_SYMBOLS] = np.array(self.symbols)
+            np.savez(f, **arrays)
+        os.rename(tmp_file, filename)
+
+    def get_dates(self, symbol):
+        rows = self._get_symbol_rows(symbol)
+        return np.unique(self.columns[DATE][rows])
+
+    def get_expiries(self, symbol, date):
+        rows = self._get_chain_rows(symbol, date)
+        return np.unique(self.columns[EXPIRY][rows])
+
+    def get_chain(self, symbol, date, expiry=None, type=None):
+        """
+        All contracts for symbol captured on date, optionally limited to a
+        single expiry and/or type
+
+        :return: dictionary of arrays for each column, sorted by expiry, type
+        and strike
+        """
+        rows = self._get_chain_rows(symbol, date)
+        return self._select(rows, expiry=expiry, type=type)
+
+    def get_history(self, symbol, expiry=None, type=None, strike=None,
+                    start_date=None, end_date=None):
+        """
+        Contracts for symbol across capture dates between start_date and
+        end_date inclusive, e.g. the price history of a single strike
+
+        :return: dictionary of arrays for each column, sorted by date, expiry,
+        type and strike
+        """
+        rows = self._get_symbol_rows(symbol)
+        # Rows for a symbol are sorted by date
+        dates = self.columns[DATE][rows]
+        start, end = rows.start, rows.stop
+        if start_date is not None:
+            start = rows.start + np.searchsorted(dates, int(start_date),
+                                                 side='left')
+        if end_date is not None:
+            end = rows.start + np.searchsorted(dates, int(end_date),
+                                               side='right')
+
+        return self._select(slice(start, end), expiry=expiry, type=type,
+                            strike=strike)
+
+    def _get_symbol_rows(self, symbol):
+        if symbol not in self._symbol_idx:
+            return slice(0, 0)
+        code = self._symbol_idx[symbol]
+        codes = self.columns[SYMBOL]
+        return slice(np.searchsorted(codes, code, side='left'),
+                     np.searchsorted(codes, code, side='right'))
+
+    def _get_chain_rows(self, symbol, date):
+        if symbol not in self._symbol_idx:
+            return slice(0, 0)
+        key = _chain_key(self._symbol_idx[symbol], int(date))
+        return slice(np.searchsorted(self._chain_keys, key, side='left'),
+                     np.searchsorted(self._chain_keys, key, side='right'))
+
+    def _select(self, rows, expiry=None, type=None, strike=None):
+        mask = None
+        for column, value in [(EXPIRY, expiry), (TYPE, type),
+                              (STRIKE, strike)]:
+            if value is None:
+                continue
+            if column == EXPIRY:
+                value = int(value)
+            elif column == TYPE:
+                value = np.asarray(value).astype('S1')
+            matches = self.columns[column][rows] == value
+            mask = matches if mask is None else mask & matches
+
+        result = {}
+        for column in _KEY_COLUMNS + PRICE_COLUMNS:
+            values = self.columns[column][rows]
+            result[column] = values if mask is None else values[mask]
+
+        result[TYPE] = result[TYPE].astype(str)
+        result[SYMBOL] = np.array(self.symbols, dtype=str)[result[SYMBOL]]
+        return result
+
+
+def ingest(index, directory, filename, symbols=None, start_date=None,
+           end_date=None, workers=1, report=None):
+    """
+    Parse the chains for index once into a store saved to filename
+
+    :param symbols: symbols to ingest, by default all symbols with chains
+    in the directory
+    :param report: data_loader.LoadReport to record failed files in, if not
+    provided the first failure is raised
+    """
+    if symbols is None:
+        symbols = get_symbols(index, directory, start_date, end_date)
+
+    option_data = data_loader.load_option_data(index, directory, symbols,
+                                               start_date, end_date,
+                                               workers, report)
+    store = OptionStore.from_option_data(option_data)
+    store.save(filename)
+    logging.info('Stored {} contracts for {} symbols in {}'
+                 .format(len(store), len(store.symbols), filename))
+    return store
+
+
+def get_symbols(index, directory, start_date=None, end_date=None):
+    """
+    Symbols with at least one chain file in the directory
+    """
+    basedir = os.path.join(directory, index)
+    symbols = set()
+    for date in data_loader.get_dates(basedir, start_date, end_date):
+        for name in os.listdir(os.path.join(basedir, date)):
+            match = _FILENAME_PATTERN.match(name)
+            if match:
+                symbols.add(match.group(1))
+    return sorted(symbols)
+
+
+def to_numeric(df):
+    """
+    Copy of a chain DataFrame as returned by data_loader.load_option_data,
+    with prices converted to floats and missing values as NaN
+    """
+    result = pd.DataFrame(index=df.index)
+    for column in PRICE_COLUMNS:
+        result[column] = _get_column(df, column)
+    return result
+
+
+def _get_column(df, column):
+    if column not in df.columns:
+        return np.zeros(len(df)) + np.NAN
+    return _to_float(df[column])
+
+
+def _to_float(values):
+    # Missing values are recorded as '-'
+    if values.dtype == object:
+        values = values.astype(str).str.replace(',', '')
+    return pd.to_numeric(values, errors='coerce').values.astype(np.float64)
+
+
+def _chain_key(symbol, date):
+    return np.asarray(symbol, dtype=np.int64) * 100000000 + date
@@ -0,0 +1,119 @@
+"""
+Binary columnar cache for daily price files.
+
+Each symbol's DataFrame is stored as an .npz file holding one array per
+column, alongside the date index and the size and modification time of the
+source CSV. A cache entry is only used while the source file is unchanged,
+otherwise it is rebuilt from the CSV.
+"""
+
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+
+
+CACHE_DIR_NAME = '.price_cache'
+
+_INDEX = '__index__'
+_INDEX_NAME = '__index_name__'
+_COLUMNS = '__columns__'
+_SOURCE_MTIME = '__source_mtime__'
+_SOURCE_SIZE = '__source_size__'
+
+
+def get_cache_dir(data_dir):
+    return os.path.join(data_dir, CACHE_DIR_NAME)
+
+
+def get_cache_file(filename, cache_dir):
+    name = os.path.splitext(os.path.basename(filename))[0]
+    return os.path.join(cache_dir, name + '.npz')
+
+
+def load(filename, cache_dir):
+    """
+    Load the cached DataFrame for filename, returning None if no valid
+    cache entry exists
+    """
+    cache_file = get_cache_file(filename, cache_dir)
+    if not os.path.exists(cache_file):
+        return None
+
+    try:
+        with np.load(cache_file, allow_pickle=False) as cached:
+            mtime, size = _get_source_stats(filename)
+            if cached[_SOURCE_MTIME] != mtime or \
+                    cached[_SOURCE_SIZE] != size:
+                logging.debug('Stale cache entry: {}'.format(cache_file))
+                return None
+
+            columns = [str(column) for column in cached[_COLUMNS]]
+            index_name = str(cached[_INDEX_NAME])
+            index = pd.DatetimeIndex(cached[_INDEX],
+                                     name=index_name if index_name else None)
+            data = pd.DataFrame(
+                dict((column, cached[_column_key(i)])
+                     for i, column in enumerate(columns)),
+                index=index, columns=columns)
+            return data
+
+    except (IOError, OSError, ValueError, KeyError) as e:
+        logging.warning('Unable to read cache entry {}: {}'
+                        .format(cache_file, e))
+        return None
+
+
+def save(filename, cache_dir, df):
+    """
+    Write df to the cache for filename. Frames which cannot be stored in a
+    columnar format (non-date index or object columns) are not cached.
+    """
+    if not _is_cacheable(df):
+        logging.debug('Not caching {}, unsupported types'.format(filename))
+        return False
+
+    cache_file = get_cache_file(filename, cache_dir)
+    tmp_file = cache_file + '.tmp'
+
+    try:
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+
+        mtime, size = _get_source_stats(filename)
+        arrays = {
+            _INDEX: df.index.values,
+            _INDEX_NAME: np.array(df.index.name or ''),
+            _COLUMNS: np.array([str(column) for column in df.columns]),
+            _SOURCE_MTIME: np.array(mtime),
+            _SOURCE_SIZE: np.array(size),
+        }
+        for i, column in enumerate(df.columns):
+            arrays[_column_key(i)] = df[column].values
+
+        with open(tmp_file, 'wb') as f:
+            np.savez(f, **arrays)
+        # Rename is atomic, so readers never see a partially written file
+        os.rename(tmp_file, cache_file)
+        return True
+
+    except (IOError, OSError) as e:
+        logging.warning('Unable to write cache entry {}: {}'
+                        .format(cache_file, e))
+        return False
+
+
+def _is_cacheable(df):
+    if not isinstance(df.index, pd.DatetimeIndex) or df.index.tz is not None:
+        return False
+    return all(dtype != np.object_ for dtype in df.dtypes)
+
+
+def _get_source_stats(filename):
+    stat = os.stat(filename)
+    return float(stat.st_mtime), int(stat.st_size)
+
+
+def _column_key(i):
+    return 'column_{}'.format(i)
@@ -50,6 +50,27 @@ class TestDataLoader(unittest.TestCase):
         self.assertEqual(pd.DataFrame, type(price_data['TEST2']))
         self.assertEqual(pd.DataFrame, type(price_data['TEST3']))
 
+    def test_load_price_data_workers(self):
+        symbols = self._get_symbol_list()
+        expected = dl.load_price_data(DATA_DIR, symbols)
+        price_data = dl.load_price_data(DATA_DIR, symbols, workers=2)
+        self.assertListEqual(sorted(expected.keys()),
+                             sorted(price_data.keys()))
+        for symbol in symbols:
+            assert_frame_equal(expected[symbol], price_data[symbol])
+
+    def test_load_price_data_report(self):
+        symbols = ['TEST', 'MISSING', 'TEST2']
+        report = dl.LoadReport()
+        price_data = dl.load_price_data(DATA_DIR, symbols, workers=2,
+                                        report=report)
+        self.assertListEqual(['TEST', 'TEST2'], sorted(price_data.keys()))
+        self.assertListEqual(['MISSING'], report.failed)
+
+    def test_load_price_data_missing(self):
+        self.assertRaises(IOError, dl.load_price_data, DATA_DIR,
+                          ['MISSING'])
+
     def test_load_option_data(self):
         symbols = ['AAPL', 'MSFT']
         option_data = dl.load_option_data('SP500', CHAINS_DIR, symbols)
@@ -68,6 +89,22 @@ class TestDataLoader(unittest.TestCase):
         self.assertEqual(17, len(msft_put))
         self.assert_frame_different(msft_call, msft_put)
 
+    def test_load_option_data_workers(self):
+        symbols = ['AAPL', 'MSFT']
+        expected = dl.load_option_data('SP500', CHAINS_DIR, symbols)
+        report = dl.LoadReport()
+        option_data = dl.load_option_data('SP500', CHAINS_DIR, symbols,
+                                          workers=3, report=report)
+        self.assertEqual(0, len(report))
+
+        for symbol in symbols:
+            for date in expected[symbol]:
+                for expiry in expected[symbol][date]:
+                    for type in ['C', 'P']:
+                        assert_frame_equal(
+                            expected[symbol][date][expiry][type],
+                            option_data[symbol][date][expiry][type])
+
     def assert_frame_different(self, left, right):
         try:
             assert_frame_equal(left, right)
@@ -0,0 +1,92 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+import data_loader as dl
+import option_store
+from option_store import OptionStore
+from test_sources import CHAINS_DIR
+
+
+SYMBOLS = ['AAPL', 'MSFT']
+
+
+class TestOptionStore(unittest.TestCase):
+    def setUp(self):
+        self.option_data = dl.load_option_data('SP500', CHAINS_DIR, SYMBOLS)
+        self.store = OptionStore.from_option_data(self.option_data)
+
+    def test_get_symbols(self):
+        self.assertListEqual(SYMBOLS,
+                             option_store.get_symbols('SP500', CHAINS_DIR))
+
+    def test_size(self):
+        expected = sum(len(df)
+                       for symbol in self.option_data.values()
+                       for expiries in symbol.values()
+                       for types in expiries.values()
+                       for df in types.values())
+        self.assertEqual(expected, len(self.store))
+
+    def test_get_chain(self):
+        chain = self.store.get_chain('AAPL', '20140908', '20140912', 'P')
+        df = option_store.to_numeric(
+            self.option_data['AAPL']['20140908']['20140912']['P'])
+
+        self.assertEqual(49, len(chain['STRIKE']))
+        self.assertTrue((chain['TYPE'] == 'P').all())
+        self.assertTrue((chain['SYMBOL'] == 'AAPL').all())
+        self.assertTrue((np.diff(chain['STRIKE']) > 0).all())
+
+        df = df.sort_index()
+        np.testing.assert_array_equal(df.index.values.astype(float),
+                                      chain['STRIKE'])
+        for column in option_store.PRICE_COLUMNS:
+            np.testing.assert_array_equal(df[column].values, chain[column])
+
+    def test_missing_prices_are_nan(self):
+        chain = self.store.get_chain('AAPL', '20140908')
+        self.assertEqual(np.float64, chain['LAST_PRICE'].dtype)
+        self.assertTrue(np.isnan(chain['LAST_PRICE']).any())
+        self.assertFalse(np.isnan(chain['BID']).all())
+
+    def test_get_expiries(self):
+        np.testing.assert_array_equal(
+            [20140912], self.store.get_expiries('AAPL', '20140908'))
+        self.assertEqual(0, len(self.store.get_expiries('IBM', '20140908')))
+
+    def test_get_history(self):
+        history = self.store.get_history('MSFT', '20160115', 'C', 45.0)
+
+        np.testing.assert_array_equal(
+            self.store.get_dates('MSFT'), history['DATE'])
+        self.assertTrue((history['STRIKE'] == 45.0).all())
+
+        history = self.store.get_history('MSFT', start_date='20140909',
+                                         end_date='20140909')
+        self.assertTrue((history['DATE'] == 20140909).all())
+        self.assertEqual(len(self.store.get_chain('MSFT', '20140909')['DATE']),
+                         len(history['DATE']))
+
+    def test_ingest_and_load(self):
+        directory = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(directory, 'chains.npz')
+            option_store.ingest('SP500', CHAINS_DIR, filename)
+            loaded = OptionStore.load(filename)
+
+            self.assertListEqual(self.store.symbols, loaded.symbols)
+            expected = self.store.get_chain('MSFT', '20140909')
+            result = loaded.get_chain('MSFT', '20140909')
+            for column in expected:
+                np.testing.assert_array_equal(expected[column],
+                                              result[column])
+        finally:
+            shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    unittest.main()
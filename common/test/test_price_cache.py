@@ -0,0 +1,65 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from pandas.util.testing import assert_frame_equal
+
+import data_loader as dl
+import price_cache
+from test_sources import DATA_DIR, SYMBOL_LIST, TEST_REVERSED_CSV_FILE
+
+
+class TestPriceCache(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def test_load_price_data_cached(self):
+        expected = dl.load_price_data(DATA_DIR, SYMBOL_LIST, use_cache=False)
+
+        cold = dl.load_price_data(DATA_DIR, SYMBOL_LIST,
+                                  cache_dir=self.cache_dir)
+        for symbol in SYMBOL_LIST:
+            self.assertTrue(os.path.exists(price_cache.get_cache_file(
+                dl._get_price_file(symbol, DATA_DIR), self.cache_dir)))
+
+        warm = dl.load_price_data(DATA_DIR, SYMBOL_LIST,
+                                  cache_dir=self.cache_dir)
+
+        for symbol in SYMBOL_LIST:
+            assert_frame_equal(expected[symbol], cold[symbol])
+            assert_frame_equal(expected[symbol], warm[symbol])
+
+    def test_load_reversed_data_cached(self):
+        expected = dl.load_symbol_data(TEST_REVERSED_CSV_FILE)
+        dl._load_cached_symbol_data(TEST_REVERSED_CSV_FILE, self.cache_dir)
+        cached = price_cache.load(TEST_REVERSED_CSV_FILE, self.cache_dir)
+        assert_frame_equal(expected, cached)
+
+    def test_load_missing_entry(self):
+        self.assertIsNone(price_cache.load(TEST_REVERSED_CSV_FILE,
+                                           self.cache_dir))
+
+    def test_stale_entry(self):
+        data_file = os.path.join(self.cache_dir, 'TEST.csv')
+        shutil.copy(os.path.join(DATA_DIR, 'TEST.csv'), data_file)
+
+        initial = dl._load_cached_symbol_data(data_file, self.cache_dir)
+        self.assertEqual(3, len(initial))
+
+        with open(data_file, 'a') as f:
+            f.write('\n2012-08-31,13002.72,13108.63,12981.74,13090.84,'
+                    '444800000,13090.84')
+
+        self.assertIsNone(price_cache.load(data_file, self.cache_dir))
+        updated = dl._load_cached_symbol_data(data_file, self.cache_dir)
+        self.assertEqual(4, len(updated))
+        assert_frame_equal(updated,
+                           price_cache.load(data_file, self.cache_dir))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -59,6 +59,11 @@ class TestUtils(unittest.TestCase):
             np.array([[0, 0], [1, 4], [2, 5]]),
             utils.lag(np.array([[1, 4], [2, 5], [3, 6]])))
 
+    def test_lag_axis(self):
+        np_utils.assert_array_equal(
+            np.array([[0, 1, 2], [0, 4, 5]]),
+            utils.lag(np.array([[1, 2, 3], [4, 5, 6]]), axis=1))
+
     def test_calculate_returns(self):
         positions = np.array(
             [0., 15., 15., 27.5, 27.5, 17.5, 32.5, 32.5, 10., -7.5])
@@ -69,6 +74,11 @@ class TestUtils(unittest.TestCase):
              0.85714286, 0., -0.69230769, -1.75],
             returns, rtol=1e-7)
 
+        np_utils.assert_array_equal(
+            np.array([returns, returns * 0.]),
+            utils.calculate_returns(np.array([positions, positions * 0.]),
+                                    axis=1))
+
 
     def test_calculate_log_returns(self):
         positions = np.array(
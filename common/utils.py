@@ -62,12 +62,14 @@ def ffill(data):
 
 def lag(data, empty_term=0., axis=0):
     lagged = np.roll(data, 1, axis=axis)
-    lagged[0] = empty_term
+    first = [slice(None)] * lagged.ndim
+    first[axis] = 0
+    lagged[tuple(first)] = empty_term
     return lagged
 
 
-def calculate_returns(prices):
-    lagged_pnl = lag(prices)
+def calculate_returns(prices, axis=0):
+    lagged_pnl = lag(prices, axis=axis)
     returns = (prices - lagged_pnl) / lagged_pnl
 
     # All values prior to our position opening in pnl will have a